@@ -1,14 +1,39 @@
 # assistant.py
-
+"""
+Голосовий асистент: подієвий цикл на asyncio.
+
+- гарячі клавіші — через callback-и keyboard (без опитування is_pressed):
+  вони лише кладуть подію в asyncio-чергу;
+- кожен хід (запис → розпізнавання → LLM → озвучка) — об'єкт Turn, що працює
+  в окремому потоці (asyncio.to_thread), бо всі етапи блокуючі;
+- поки асистент думає і говорить, BargeInMonitor слухає мікрофон: якщо
+  користувач заговорив (або натиснув F9), поточний хід скасовується —
+  HTTP-стрім до Ollama закривається, переклад і озвучка зупиняються —
+  і одразу стартує новий запис (з уже почутим початком фрази).
+"""
+
+import asyncio
+import sys
+import threading
 import time
 import keyboard
 import atexit
 import subprocess
 
 import config
-from stt import record_audio, transcribe_audio
-from tts import speak
-from llm import ask_ollama_smart as ask_ollama
+import tracing
+from models import load_all, register, startup_phase, startup_report, wait_all
+
+with startup_phase("import stt"):
+    from audio_capture import BargeInMonitor
+    from stt import normalize_lang, record_audio, record_and_transcribe, transcribe_audio
+with startup_phase("import tts"):
+    from tts import prewarm_speech_cache, speak, start_speech, start_voices, stop_speaking
+with startup_phase("import llm"):
+    from llm import CancelToken
+    from llm import ask_ollama_smart as ask_ollama
+    from llm import ask_ollama_smart_stream as ask_ollama_stream
+    from llm import preload_models
 
 import warnings
 warnings.filterwarnings(
@@ -20,54 +45,84 @@ warnings.filterwarnings(
 
 
 
-def normalize_lang(text: str, detected_lang: str | None) -> str:
+class Turn:
     """
-    Нормалізуємо мову:
-    - якщо є кирилиця → 'uk'
-    - інакше використовуємо detected_lang або 'en'
+    Один хід розмови. Працює у власному потоці (run()), cancel() — з будь-якого:
+    обриває запис, генерацію (CancelToken закриває HTTP-стрім), переклад і озвучку.
     """
-    text = text or ""
-    detected = (detected_lang or "").lower()
-
-    uk_chars = "абвгґдеєжзиіїйклмнопрстуфхцчшщьюяАБВГҐДЕЄЖЗИІЇЙКЛМНОПРСТУФХЦЧШЩЬЮЯ"
-    has_cyrillic = any(ch in uk_chars for ch in text)
-
-    if has_cyrillic:
-        if detected != "uk":
-            print(f"🔤 Whisper визначив мову як '{detected_lang}', але знайдена кирилиця → вважаю 'uk'.")
-        return "uk"
-
-    if not detected:
-        print("⚠ Whisper не повернув код мови, вважаю 'en'.")
-        return "en"
-
-    return detected
-
-
-def handle_interaction():
-    """Один цикл: запис → розпізнавання → LLM → TTS."""
-    t0 = time.perf_counter()
-
-    # 1) Запис
-    audio = record_audio()
-    t1 = time.perf_counter()
-    print(f"⏱ Запис зайняв: {t1 - t0:.2f} с")
 
-    # 2) Розпізнавання
-    text, lang = transcribe_audio(audio)
-    t2 = time.perf_counter()
-    print(f"⏱ Розпізнавання зайняло: {t2 - t1:.2f} с")
-
-    if not text:
-        print("⚠ Нічого не розпізнано, спробуй ще раз.")
-        return
+    def __init__(self, preroll=None, on_barge_in=None):
+        self.preroll = preroll              # вже почутий початок фрази (barge-in голосом)
+        self.on_barge_in = on_barge_in      # callback(turn, audio) від BargeInMonitor
+        self.cancel_token = CancelToken()
+        self.record_cancel = threading.Event()
+        self.cancel_token.on_cancel(self.record_cancel.set)
+        self.phase = "record"
+        self.trace = None
+        self._monitor: BargeInMonitor | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    @property
+    def superseded(self) -> bool:
+        return self.cancel_token.superseded
+
+    def supersede(self) -> None:
+        """Новий хід уже почався, а цей ще не вийшов: більше ніяких записів у пам'ять/БД/траси."""
+        self.cancel()
+        self.cancel_token.supersede()
+
+    def cancel(self) -> None:
+        if self.cancelled:
+            return
+        if self.trace is not None:
+            self.trace.meta["interrupted"] = True
+        self.cancel_token.cancel()
+        stop_speaking()
+        self.stop_monitor()
+
+    def start_monitor(self) -> None:
+        """Слухаємо користувача, поки думаємо й говоримо (BARGE_IN_ENABLED)."""
+        if not getattr(config, "BARGE_IN_ENABLED", True) or self.on_barge_in is None or self.cancelled:
+            return
+        try:
+            self._monitor = BargeInMonitor(lambda audio: self.on_barge_in(self, audio)).start()
+        except Exception as e:
+            print(f"⚠️ Barge-in голосом недоступний: {e}")
+            self._monitor = None
 
-    original_lang = normalize_lang(text, lang)
+    def stop_monitor(self) -> None:
+        monitor, self._monitor = self._monitor, None
+        if monitor is not None:
+            monitor.stop()
 
-    # 3) Відповідь моделі (з контекстом, всередині ask_ollama)
-    reply = ask_ollama(text, user_lang=original_lang)
+    def run(self) -> None:
+        """Запис → розпізнавання → LLM → TTS (у траси ходу)."""
+        self.trace = tracing.start_turn()
+        try:
+            _interaction(self)
+        except Exception as e:
+            if not self.cancelled:
+                print("❌ Сталася помилка в циклі взаємодії:", e)
+        finally:
+            self.stop_monitor()
+            self.phase = "done"
+            if self.superseded:
+                tracing.discard_turn(self.trace)
+            else:
+                tracing.end_turn(trace=self.trace)
+
+
+def _answer_blocking(text: str, original_lang: str, t2: float, turn: Turn) -> None:
+    """Стара схема: чекаємо повну відповідь моделі, потім озвучуємо її цілком."""
+    # 3) Відповідь моделі (історія розмови підмішується в промпт, див. memory.py)
+    reply = ask_ollama(text, user_lang=original_lang, cancel=turn.cancel_token)
     t3 = time.perf_counter()
     print(f"⏱ Відповідь моделі зайняла: {t3 - t2:.2f} с")
+    if turn.cancelled:
+        return
 
     # 4) Вивід
     print("\n=============================")
@@ -78,7 +133,7 @@ def handle_interaction():
     print(reply)
     print("=============================\n")
 
-    # 5) Озвучка
+    # 5) Озвучка (перериває Turn.cancel() через stop_speaking())
     if config.TTS_ENABLED:
         print("🔊 Озвучую відповідь...")
         t4_start = time.perf_counter()
@@ -88,8 +143,100 @@ def handle_interaction():
             print("⚠️ Помилка на етапі TTS:", e)
         t4_end = time.perf_counter()
         print(f"⏱ Озвучка зайняла: {t4_end - t4_start:.2f} с")
+
+
+def _answer_streaming(text: str, original_lang: str, t2: float, turn: Turn) -> None:
+    """
+    Потокова схема: кожне готове речення відповіді одразу друкуємо і віддаємо
+    в конвеєр озвучки — синтез і відтворення йдуть паралельно з генерацією.
+    """
+    print("\n=============================")
+    print("Ти сказав:")
+    print(text)
+    print(f"(Мова: {original_lang})")
+    print("\nАсистент (фінальна відповідь):")
+
+    pipeline = None
+    if config.TTS_ENABLED and not turn.cancelled:
+        print("🔊 Озвучую відповідь по реченнях...")
+        try:
+            pipeline = start_speech(original_lang)
+            turn.cancel_token.on_cancel(pipeline.stop)
+        except Exception as e:
+            print("⚠️ Помилка на етапі TTS:", e)
+
+    reply_parts: list[str] = []
+    t_first = None
+    for sentence in ask_ollama_stream(text, user_lang=original_lang, cancel=turn.cancel_token):
+        if t_first is None:
+            t_first = time.perf_counter()
+            print(f"⏱ Перше речення відповіді через: {t_first - t2:.2f} с")
+
+        print(sentence)
+        reply_parts.append(sentence)
+
+        if pipeline is not None:
+            pipeline.say(sentence)
+
+    t3 = time.perf_counter()
+    print("=============================\n")
+    print(f"⏱ Відповідь моделі зайняла: {t3 - t2:.2f} с")
+
+    if pipeline is not None:
+        pipeline.close()
+        if not pipeline.wait() and reply_parts and not turn.cancelled:
+            # Piper не впорався — озвучуємо цілком через fallback
+            speak(" ".join(reply_parts), lang=original_lang)
+        print(f"⏱ Озвучка завершилась через: {time.perf_counter() - t3:.2f} с після відповіді")
+
+
+def _interaction(turn: Turn) -> None:
+    """Тіло Turn.run (усередині траси ходу)."""
+    t0 = time.perf_counter()
+
+    if getattr(config, "STT_STREAMING", True):
+        # 1+2) Запис і потокове розпізнавання одночасно
+        _, text, lang = record_and_transcribe(cancel=turn.record_cancel, preroll=turn.preroll)
+        t2 = time.perf_counter()
+        print(f"⏱ Запис + розпізнавання зайняли: {t2 - t0:.2f} с")
     else:
-        t4_end = t3
+        # 1) Запис
+        audio = record_audio(cancel=turn.record_cancel, preroll=turn.preroll)
+        t1 = time.perf_counter()
+        print(f"⏱ Запис зайняв: {t1 - t0:.2f} с")
+
+        # 2) Розпізнавання
+        text, lang = transcribe_audio(audio)
+        t2 = time.perf_counter()
+        print(f"⏱ Розпізнавання зайняло: {t2 - t1:.2f} с")
+
+    if turn.cancelled:
+        tracing.discard_turn(turn.trace)
+        turn.trace = None
+        return
+
+    if not text:
+        print("⚠ Нічого не розпізнано, спробуй ще раз.")
+        tracing.discard_turn(turn.trace)
+        turn.trace = None
+        return
+
+    original_lang = normalize_lang(text, lang)
+    tracing.set_meta(lang=original_lang)
+    if turn.cancelled:
+        return
+
+    # далі асистент думає і говорить — а мікрофон слухає, чи не перебивають
+    turn.phase = "answer"
+    turn.start_monitor()
+
+    if getattr(config, "LLM_STREAMING", True):
+        _answer_streaming(text, original_lang, t2, turn)
+    else:
+        _answer_blocking(text, original_lang, t2, turn)
+
+    if turn.cancelled:
+        return
 
     total = time.perf_counter() - t0
     print(f"✅ Повний цикл зайняв: {total:.2f} с")
@@ -99,43 +246,138 @@ def handle_interaction():
 def cleanup_ollama_model():
     """
     Викликається автоматично при завершенні програми.
-    Пробує зупинити (вивантажити) поточну модель з пам'яті через `ollama stop`.
+    Пробує зупинити (вивантажити) основну й router-модель з пам'яті через `ollama stop`
+    (з keep_alive вони інакше лишаються завантаженими).
     """
-    model = getattr(config, "OLLAMA_MODEL", None)
-    if not model:
-        return
+    models = [getattr(config, "OLLAMA_MODEL", None), getattr(config, "OLLAMA_ROUTER_MODEL", None)]
 
-    try:
-        print(f"[cleanup] Пробую зупинити модель {model} через 'ollama stop'...")
-        subprocess.run(["ollama", "stop", model], check=False)
-        print(f"[cleanup] Модель {model} зупинена (якщо була запущена).")
-    except Exception as e:
-        print(f"[cleanup] Не вдалося зупинити модель {model}: {e}")
+    for model in dict.fromkeys(m for m in models if m):
+        try:
+            print(f"[cleanup] Пробую зупинити модель {model} через 'ollama stop'...")
+            subprocess.run(["ollama", "stop", model], check=False)
+            print(f"[cleanup] Модель {model} зупинена (якщо була запущена).")
+        except Exception as e:
+            print(f"[cleanup] Не вдалося зупинити модель {model}: {e}")
 
 
 # Реєструємо хук очищення при виході
 atexit.register(cleanup_ollama_model)
 
+class VoiceAssistant:
+    """
+    Подієвий цикл: події "record" (F9), "barge_in" (голос під час відповіді)
+    і "exit" приходять з потоків keyboard / BargeInMonitor через asyncio-чергу.
+    Новий хід завжди спершу скасовує попередній.
+    """
+
+    # автоповтор затиснутої клавіші не повинен перезапускати хід
+    DEBOUNCE_SECONDS = 0.3
+
+    def __init__(self):
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.events: asyncio.Queue | None = None
+        self.turn: Turn | None = None
+        self.task: asyncio.Future | None = None
+        # перервані ходи, чиї потоки ще не вийшли (висять у розпізнаванні/перекладі)
+        self.orphans: set[asyncio.Future] = set()
+        self._last_press = 0.0
+
+    def post(self, kind: str, payload=None) -> None:
+        """Подія з будь-якого потоку."""
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (kind, payload, time.perf_counter()))
+
+    def _on_record_key(self, _event) -> None:
+        now = time.monotonic()
+        if now - self._last_press < self.DEBOUNCE_SECONDS:
+            return
+        self._last_press = now
+        self.post("record")
+
+    def _on_barge_in(self, turn: Turn, audio) -> None:
+        self.post("barge_in", (turn, audio))
+
+    def _turn_active(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def _start_turn(self, preroll=None, t_event: float | None = None) -> None:
+        previous = self.turn
+        if previous is not None and self._turn_active():
+            previous.cancel()
+            # потік старого ходу виходить за мілісекунди (стрім закрито, озвучку зупинено);
+            # якщо він зайнятий розпізнаванням чи перекладом — не чекаємо довше за таймаут
+            await asyncio.wait({self.task}, timeout=getattr(config, "BARGE_IN_JOIN_TIMEOUT", 0.3))
+            if not self.task.done():
+                # не чекаємо далі, але й писати щось після старту нового ходу йому не можна
+                previous.supersede()
+                self.orphans.add(self.task)
+                self.task.add_done_callback(self.orphans.discard)
+            if t_event is not None:
+                print(f"⏹ Попередній хід перервано, новий запис через {(time.perf_counter() - t_event) * 1000:.0f} мс.")
+
+        self.turn = Turn(preroll=preroll, on_barge_in=self._on_barge_in)
+        self.task = asyncio.ensure_future(asyncio.to_thread(self.turn.run))
+
+    async def run(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.events = asyncio.Queue()
+
+        keyboard.on_press_key(config.HOTKEY_RECORD, self._on_record_key)
+        keyboard.on_press_key(config.HOTKEY_EXIT, lambda _event: self.post("exit"))
+        try:
+            while True:
+                kind, payload, t_event = await self.events.get()
+
+                if kind == "exit":
+                    print("👋 Вихід.")
+                    break
+
+                if kind == "record":
+                    if self._turn_active() and self.turn.phase == "record":
+                        continue  # уже слухаємо
+                    await self._start_turn(t_event=t_event)
+
+                elif kind == "barge_in":
+                    turn, audio = payload
+                    # і якщо хід щойно закінчився сам — почуте все одно початок нової фрази
+                    if turn is self.turn:
+                        await self._start_turn(preroll=audio, t_event=t_event)
+        finally:
+            keyboard.unhook_all()
+            if self.turn is not None and self._turn_active():
+                self.turn.cancel()
+            pending = {t for t in (self.task, *self.orphans) if t is not None and not t.done()}
+            if pending:
+                await asyncio.wait(pending, timeout=1.0)
+
 
 def main():
     print("Голосовий ассистент запущений.")
     print(f"Натисни {config.HOTKEY_RECORD.upper()}, щоб записати голос (≈{config.RECORD_SECONDS} сек).")
     print(f"Натисни {config.HOTKEY_EXIT.upper()}, щоб вийти.\n")
 
-    while True:
-        if keyboard.is_pressed(config.HOTKEY_EXIT):
-            print("👋 Вихід.")
-            break
-
-        if keyboard.is_pressed(config.HOTKEY_RECORD):
-            # невелика затримка, щоб уникнути дублювань натискань
-            time.sleep(0.2)
-            try:
-                handle_interaction()
-            except Exception as e:
-                print("❌ Сталася помилка в циклі взаємодії:", e)
+    if getattr(config, "OLLAMA_PRELOAD", True):
+        register("ollama", lambda: preload_models(background=False))
+
+    if config.TTS_ENABLED:
+        # голоси Piper тримаються в пам'яті між репліками,
+        # а часті фрази заздалегідь синтезуються в кеш
+        def _warm_tts():
+            start_voices()
+            prewarm_speech_cache()
+
+        register("tts", _warm_tts)
+
+    # Whisper, переклад, Ollama і TTS вантажаться паралельно у фоні, hotkey-цикл
+    # стартує одразу; якщо модель знадобиться раніше — чекаємо лише на неї
+    load_all()
+
+    if "--profile-startup" in sys.argv:
+        wait_all()
+        print("\n⏱ Профіль запуску:")
+        print(startup_report())
+        return
 
-        time.sleep(0.05)  # щоб не грузити CPU
+    asyncio.run(VoiceAssistant().run())
 
 
 if __name__ == "__main__":
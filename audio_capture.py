@@ -0,0 +1,390 @@
+# audio_capture.py
+"""
+Захоплення звуку через callback sounddevice.InputStream у заздалегідь виділений
+float32 кільцевий буфер (розмір — з MAX_RECORD_SECONDS + pre-roll).
+
+- поки голосу немає, буфер крутиться по колу і тримає останні VAD_PREROLL_MS,
+  щоб не обрізати початок слова;
+- щойно VAD побачив голос, pre-roll один раз переноситься на початок буфера,
+  і далі запис іде лінійно — результат віддається як view без копіювання;
+- VAD (див. vad.py) працює дрібними фреймами (VAD_FRAME_MS) і отримує одразу
+  весь накопичений блок, тож кінець фрази ловиться точніше.
+
+Замість мікрофона можна підставити ArraySource (синтетичний/файловий сигнал).
+
+BargeInMonitor слухає мікрофон, поки асистент відповідає: щойно користувач
+заговорив, він віддає вже почуте (з pre-roll) — новий запис починається з нього,
+тож перші слова не губляться.
+"""
+
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+import config
+import tracing
+from vad import VAD, EnergyVAD, Endpointer, create_vad
+
+AudioCallback = Callable[[np.ndarray], None]
+
+
+class CaptureBuffer:
+    """
+    Кільцевий float32-буфер фіксованого розміру.
+    write() викликається з аудіо-callback-а, read()/view() — зі споживача.
+    Індекси в read() абсолютні (номер семпла від старту запису).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = np.zeros(capacity, dtype="float32")
+        self._cond = threading.Condition()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._cond:
+            self._written = 0      # скільки семплів записано від старту
+            self._base = 0         # абсолютний індекс семпла в _buf[0] (лінійний режим)
+            self._linear = False
+            self.full = False
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    def write(self, block: np.ndarray) -> None:
+        block = block.reshape(-1)
+        n = block.size
+        with self._cond:
+            if self._linear:
+                pos = self._written - self._base
+                room = self.capacity - pos
+                if n >= room:
+                    n = room
+                    self.full = True
+                self._buf[pos:pos + n] = block[:n]
+            else:
+                pos = self._written % self.capacity
+                first = min(n, self.capacity - pos)
+                self._buf[pos:pos + first] = block[:first]
+                if first < n:
+                    self._buf[:n - first] = block[first:]
+            self._written += n
+            self._cond.notify_all()
+
+    def wait_for(self, end: int, timeout: float) -> bool:
+        """Чекає, поки буде записано щонайменше end семплів."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._written >= end or self.full, timeout=timeout)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """
+        Семпли [start, end). Без копії, якщо діапазон не перетинає край кільця
+        (у лінійному режимі — завжди без копії).
+        """
+        with self._cond:
+            if self._linear:
+                return self._buf[start - self._base:end - self._base]
+
+            s = start % self.capacity
+            e = s + (end - start)
+            if e <= self.capacity:
+                return self._buf[s:e]
+            return np.concatenate((self._buf[s:], self._buf[:e - self.capacity]))
+
+    def start_linear(self, start: int) -> None:
+        """
+        Переходить у лінійний режим: семпли з start (pre-roll + вже записане)
+        переносяться на початок буфера, далі запис іде без обертання.
+        """
+        with self._cond:
+            start = max(start, 0, self._written - self.capacity)
+            head = self._read_ring_copy(start, self._written)
+            self._buf[:head.size] = head
+            self._base = start
+            self._linear = True
+
+    def _read_ring_copy(self, start: int, end: int) -> np.ndarray:
+        s = start % self.capacity
+        e = s + (end - start)
+        if e <= self.capacity:
+            return self._buf[s:e].copy()
+        return np.concatenate((self._buf[s:], self._buf[:e - self.capacity]))
+
+    def view(self, end: int | None = None) -> np.ndarray:
+        """Все записане з початку фрази (лінійний режим) — view без копії."""
+        with self._cond:
+            if end is None:
+                end = self._written
+            return self._buf[:end - self._base]
+
+
+class MicrophoneSource:
+    """Мікрофон через callback sounddevice.InputStream."""
+
+    def __init__(self, sample_rate: int, block_size: int):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self._stream = None
+
+    @property
+    def finished(self) -> bool:
+        return False
+
+    def start(self, callback: AudioCallback) -> None:
+        import sounddevice as sd
+
+        def _on_audio(indata, frames, time_info, status):
+            callback(indata[:, 0])
+
+        self._stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.block_size,
+            callback=_on_audio,
+        )
+        self._stream.start()
+
+    def stop(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class ArraySource:
+    """
+    Синтетичне джерело: віддає готовий масив блоками з фонового потоку,
+    як це робив би мікрофон. Після сигналу дописує tail_silence секунд тиші.
+    realtime=False — без пауз між блоками (для тестів і бенчмарків).
+    """
+
+    def __init__(
+        self,
+        audio: np.ndarray,
+        sample_rate: int,
+        block_size: int,
+        realtime: bool = False,
+        tail_silence: float = 2.0,
+    ):
+        tail = np.zeros(int(sample_rate * tail_silence), dtype="float32")
+        self.audio = np.concatenate((np.asarray(audio, dtype="float32").reshape(-1), tail))
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.realtime = realtime
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def start(self, callback: AudioCallback) -> None:
+        def _run():
+            block_seconds = self.block_size / self.sample_rate
+            for i in range(0, self.audio.size, self.block_size):
+                if self._stop.is_set():
+                    break
+                callback(self.audio[i:i + self.block_size])
+                if self.realtime:
+                    time.sleep(block_seconds)
+            self._done.set()
+
+        self._stop.clear()
+        self._done.clear()
+        self._thread = threading.Thread(target=_run, name="array-source", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class AudioCapture:
+    """
+    Рушій запису однієї репліки з VAD-кінцем фрази.
+    Буфер виділяється один раз; view, який повертає record(),
+    валідний до наступного виклику record().
+    """
+
+    # скільки фреймів максимум віддаємо у VAD за раз
+    MAX_BLOCK_FRAMES = 64
+
+    def __init__(self, source=None, sample_rate: int | None = None, vad: VAD | None = None):
+        self.sample_rate = sample_rate or config.SAMPLE_RATE
+        self.vad = vad or create_vad(sample_rate=self.sample_rate)
+        self.frame_samples = self.vad.frame_samples
+        self.preroll_samples = int(self.sample_rate * getattr(config, "VAD_PREROLL_MS", 300) / 1000)
+        max_samples = int(self.sample_rate * getattr(config, "MAX_RECORD_SECONDS", 20))
+
+        self.source = source or MicrophoneSource(self.sample_rate, self.frame_samples)
+        self.buffer = CaptureBuffer(self.preroll_samples + max_samples)
+
+    def record(
+        self,
+        on_frame: Callable[[np.ndarray], None] | None = None,
+        cancel: threading.Event | None = None,
+        preroll: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Записує одну репліку до паузи.
+        cancel — якщо встановлено (barge-in / вихід), запис одразу обривається і повертається порожній масив;
+        preroll — вже почутий початок фрази (від BargeInMonitor), іде в буфер перед мікрофоном.
+        """
+        frame = self.frame_samples
+        vad_silence_seconds = getattr(config, "VAD_SILENCE_SECONDS", 0.8)
+
+        buf = self.buffer
+        buf.reset()
+        self.vad.reset()
+        endpointer = Endpointer(self.vad.frame_seconds, vad_silence_seconds)
+
+        pos = 0
+        t_last_voice = None  # коли востаннє бачили голос (для затримки кінця фрази)
+
+        if preroll is not None and preroll.size:
+            buf.write(np.asarray(preroll, dtype="float32")[-buf.capacity // 2:])
+
+        self.source.start(buf.write)
+        try:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    print("⏹ Запис скасовано.")
+                    return np.zeros(0, dtype="float32")
+                if not buf.wait_for(pos + frame, timeout=0.1):
+                    if self.source.finished:
+                        break
+                    continue
+                if buf.full:
+                    print("⏹ Досягнуто MAX_RECORD_SECONDS, зупиняю запис.")
+                    break
+
+                # усе, що вже накопичилось, — одним блоком у VAD
+                n = min((buf.written - pos) // frame, self.MAX_BLOCK_FRAMES)
+                end = pos + n * frame
+                block = buf.read(pos, end)
+
+                was_started = endpointer.started
+                flags = self.vad.is_speech(block.reshape(n, frame))
+                if flags.any():
+                    t_last_voice = time.perf_counter()
+                endpointer.update(flags)
+
+                if endpointer.started and not was_started:
+                    print("🎙 Виявив голос, записую...")
+                    buf.start_linear(endpointer.start_frame * frame - self.preroll_samples)
+                    if on_frame is not None:
+                        on_frame(buf.view(end))
+                elif endpointer.started and on_frame is not None:
+                    on_frame(buf.read(pos, end))
+
+                pos = end
+
+                if endpointer.done:
+                    print("⏹ Виявлено паузу, зупиняю запис.")
+                    if t_last_voice is not None:
+                        tracing.mark("speech_end", t_last_voice)
+                        tracing.add("vad_endpoint", time.perf_counter() - t_last_voice)
+                    pos = endpointer.end_frame * frame
+                    break
+        finally:
+            self.source.stop()
+
+        if not endpointer.started:
+            print("⚠ Не отримав жодного звуку.")
+            return np.zeros(0, dtype="float32")
+
+        return buf.view(pos)
+
+
+class BargeInMonitor:
+    """
+    Слухає мікрофон, поки асистент думає і говорить.
+    Якщо голос триває щонайменше BARGE_IN_MIN_SPEECH_MS, викликає on_speech(audio),
+    де audio — почуте від початку голосу (з pre-roll), і зупиняється.
+
+    Поріг BARGE_IN_THRESHOLD вищий за звичайний VAD_THRESHOLD: без ехо-компенсації
+    мікрофон чує й власну озвучку (з навушниками можна знизити).
+    """
+
+    def __init__(
+        self,
+        on_speech: Callable[[np.ndarray], None],
+        source=None,
+        sample_rate: int | None = None,
+        vad: VAD | None = None,
+    ):
+        self.on_speech = on_speech
+        self.sample_rate = sample_rate or config.SAMPLE_RATE
+        self.vad = vad or EnergyVAD(self.sample_rate, threshold=getattr(config, "BARGE_IN_THRESHOLD", 0.03))
+        self.frame_samples = self.vad.frame_samples
+        self.preroll_samples = int(self.sample_rate * getattr(config, "VAD_PREROLL_MS", 300) / 1000)
+        min_ms = getattr(config, "BARGE_IN_MIN_SPEECH_MS", 250)
+        self.min_frames = max(1, int(round(min_ms / 1000 / self.vad.frame_seconds)))
+
+        self.source = source or MicrophoneSource(self.sample_rate, self.frame_samples)
+        # кільце на кілька секунд: pre-roll + саме мовлення до спрацювання
+        self.buffer = CaptureBuffer(self.preroll_samples + self.sample_rate * 3)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.triggered = False
+
+    def start(self) -> "BargeInMonitor":
+        self._stop.clear()
+        self.triggered = False
+        self.buffer.reset()
+        self.vad.reset()
+        self.source.start(self.buffer.write)
+        self._thread = threading.Thread(target=self._run, name="barge-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Зупиняє прослуховування (можна викликати з on_speech і повторно)."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+            self._thread = None
+        self.source.stop()
+
+    def _run(self) -> None:
+        frame = self.frame_samples
+        buf = self.buffer
+        pos = 0
+        run = 0             # скільки фреймів голосу підряд
+        run_start = 0       # абсолютний номер першого фрейму серії
+        while not self._stop.is_set():
+            if not buf.wait_for(pos + frame, timeout=0.1):
+                if self.source.finished:
+                    return
+                continue
+
+            n = min((buf.written - pos) // frame, AudioCapture.MAX_BLOCK_FRAMES)
+            if n <= 0:
+                continue
+            end = pos + n * frame
+            flags = self.vad.is_speech(buf.read(pos, end).reshape(n, frame))
+
+            for i, voiced in enumerate(flags):
+                if not voiced:
+                    run = 0
+                    continue
+                if run == 0:
+                    run_start = pos // frame + i
+                run += 1
+                if run >= self.min_frames:
+                    start = max(run_start * frame - self.preroll_samples, buf.written - buf.capacity, 0)
+                    audio = buf.read(start, buf.written).copy()
+                    self.triggered = True
+                    self._stop.set()
+                    print("🗣 Користувач заговорив — перериваю відповідь.")
+                    self.on_speech(audio)
+                    return
+            pos = end
@@ -0,0 +1,318 @@
+# bench.py
+"""
+Офлайн-бенчмарк голосового конвеєра — без мікрофона, Ollama, інтернету і колонок.
+
+Замість зовнішнього світу:
+- Ollama  → FakeOllamaServer (fake_ollama.py) з налаштовуваною затримкою токена;
+- DDGS    → web_tools.FixtureBackend: детерміновані результати;
+- колонки → NullOutputStream (TTS_OUTPUT = "null");
+- БД і траси пишуться у тимчасову папку, історія не засмічується.
+
+Етапи (--stages):
+- stt  — transcribe_audio на WAV-корпусі (затримка, x реального часу);
+- mt   — переклад uk→en і en→uk по реченнях (кеш вимкнено);
+- llm  — ask_ollama_smart_stream: час до першого речення і повний хід,
+         скільки токенів промпту сервер реально обчислював (KV-кеш префікса);
+- tts  — синтез речень (x реального часу) + час до першого звуку в конвеєрі;
+- e2e  — повний хід на кожному WAV: розпізнавання → LLM → переклад → озвучка.
+
+Запуск:
+    python bench.py fixtures/utterances --token-delay 0.02 --stages stt mt llm tts e2e
+    python bench.py --stages llm --token-delay 0.01 --repeat 5   # без WAV — вбудовані запити
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import config
+
+_PROMPTS = [
+    ("Привіт! Як справи?", "uk"),
+    ("Скільки буде 12 помножити на 7?", "uk"),
+    ("Яка сьогодні погода в Києві?", "uk"),
+    ("Tell me a short fact about the Moon.", "en"),
+    ("What is the latest news about electric cars?", "en"),
+]
+
+_MT_SENTENCES = {
+    "uk": ["Привіт, як у тебе справи?", "Яка завтра буде погода у Львові?", "Розкажи коротко про історію Києва."],
+    "en": ["Hello! How can I help you today?", "The weather will be sunny tomorrow.", "I could not find anything about that."],
+}
+
+_BENCH_REPLY = (
+    "<think>\nShort answer is enough.\n</think>\n\n"
+    "Here is a short answer from the benchmark server. "
+    "It contains a few sentences so that streaming matters. "
+    "Each sentence goes to translation and speech as soon as it is ready. "
+    "This is the last sentence."
+)
+
+
+def summarize(name: str, latencies: list[float], items: int, elapsed: float, extra: str = "") -> dict:
+    lat = np.asarray(latencies) if latencies else np.asarray([np.nan])
+    return {
+        "stage": name,
+        "n": len(latencies),
+        "p50_ms": float(np.percentile(lat, 50) * 1000),
+        "p95_ms": float(np.percentile(lat, 95) * 1000),
+        "mean_ms": float(np.mean(lat) * 1000),
+        "per_s": items / elapsed if elapsed else float("inf"),
+        "extra": extra,
+    }
+
+
+def print_table(rows: list[dict]) -> None:
+    header = f"{'stage':<22} {'n':>4} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'items/s':>8}  extra"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['stage']:<22} {r['n']:>4} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} "
+            f"{r['mean_ms']:>8.0f} {r['per_s']:>8.2f}  {r['extra']}"
+        )
+
+
+def load_corpus(folder: str | None) -> list[tuple[str, np.ndarray]]:
+    if not folder:
+        return []
+    from vad_bench import load_wav
+
+    return [
+        (name, load_wav(os.path.join(folder, name), config.SAMPLE_RATE))
+        for name in sorted(os.listdir(folder))
+        if name.lower().endswith(".wav")
+    ]
+
+
+def bench_stt(corpus) -> list[dict]:
+    from stt import transcribe_audio, whisper_model
+
+    whisper_model.get()  # завантаження не рахуємо
+    latencies, audio_seconds = [], 0.0
+    t0 = time.perf_counter()
+    for _, audio in corpus:
+        t = time.perf_counter()
+        transcribe_audio(audio)
+        latencies.append(time.perf_counter() - t)
+        audio_seconds += audio.size / config.SAMPLE_RATE
+    elapsed = time.perf_counter() - t0
+    return [summarize("stt transcribe", latencies, len(corpus), elapsed, f"x RT {audio_seconds / elapsed:.1f}")]
+
+
+def bench_mt(repeat: int) -> list[dict]:
+    from translate import translator
+
+    mt = translator.get()
+    rows = []
+    for src, direction in (("uk", "uk_en"), ("en", "en_uk")):
+        sentences = _MT_SENTENCES[src]
+        latencies = []
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for sentence in sentences:
+                t = time.perf_counter()
+                mt._translate_batch([sentence], direction)
+                latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - t0
+        rows.append(summarize(f"mt {direction} sentence", latencies, len(latencies), elapsed))
+
+        t = time.perf_counter()
+        mt._translate_batch(sentences, direction)
+        batch_ms = (time.perf_counter() - t) * 1000
+        rows[-1]["extra"] = f"batch of {len(sentences)}: {batch_ms:.0f} ms"
+    return rows
+
+
+def mt_available() -> bool:
+    """Чи вантажиться перекладач (MarianMT/CTranslate2) — один раз, до етапів."""
+    from translate import translator
+
+    try:
+        translator.get()
+    except Exception as e:
+        print(f"[bench] Перекладач недоступний: {e}")
+        return False
+    return True
+
+
+def bench_llm(prompts: list[tuple[str, str]], repeat: int) -> list[dict]:
+    from llm import ask_ollama_smart_stream, eval_stats
+
+    before = eval_stats().get(config.OLLAMA_MODEL, {})
+    first, full = [], []
+    turns = 0
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text, lang in prompts:
+            t = time.perf_counter()
+            t_first = None
+            try:
+                for _sentence in ask_ollama_smart_stream(text, user_lang=lang):
+                    if t_first is None:
+                        t_first = time.perf_counter()
+            except Exception as e:
+                print(f"[bench] llm: {text!r} не вдався ({e})")
+                continue
+            full.append(time.perf_counter() - t)
+            if t_first is not None:
+                first.append(t_first - t)
+            turns += 1
+    elapsed = time.perf_counter() - t0
+
+    after = eval_stats().get(config.OLLAMA_MODEL, {})
+    requests = after.get("requests", 0) - before.get("requests", 0)
+    prompt_extra = ""
+    if requests:
+        tokens = (after["prompt_eval_count"] - before.get("prompt_eval_count", 0)) / requests
+        seconds = (after["prompt_eval_duration"] - before.get("prompt_eval_duration", 0)) / requests
+        prompt_extra = f"prompt eval {tokens:.0f} ток. / {seconds * 1000:.0f} мс на запит"
+    return [
+        summarize("llm first sentence", first, turns, elapsed, prompt_extra),
+        summarize("llm full turn", full, turns, elapsed, "items/s = ходів/с"),
+    ]
+
+
+def bench_tts(repeat: int) -> list[dict]:
+    from tts import get_voice, start_speech, synthesize_chunks
+
+    rows = []
+    for lang in ("uk", "en"):
+        voice = get_voice(lang)
+        voice.start()
+        latencies, audio_seconds = [], 0.0
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for sentence in _MT_SENTENCES[lang]:
+                t = time.perf_counter()
+                samples = sum(pcm.size for pcm in synthesize_chunks(voice, sentence))
+                latencies.append(time.perf_counter() - t)
+                audio_seconds += samples / voice.sample_rate
+        elapsed = time.perf_counter() - t0
+        rows.append(summarize(f"tts synth {lang}", latencies, len(latencies), elapsed,
+                              f"x RT {audio_seconds / elapsed:.1f}"))
+
+        first_audio = []
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            t = time.perf_counter()
+            pipeline = start_speech(lang)
+            pipeline.say(" ".join(_MT_SENTENCES[lang]))
+            pipeline.close()
+            pipeline.wait()
+            if pipeline.first_audio_at is not None:
+                first_audio.append(pipeline.first_audio_at - t)
+        elapsed = time.perf_counter() - t0
+        rows.append(summarize(f"tts first audio {lang}", first_audio, len(first_audio), elapsed))
+    return rows
+
+
+def bench_e2e(corpus) -> list[dict]:
+    from llm import ask_ollama_smart_stream
+    from stt import normalize_lang, transcribe_audio
+    from tts import start_speech
+
+    first_audio, full = [], []
+    t0 = time.perf_counter()
+    for _, audio in corpus:
+        t = time.perf_counter()
+        text, lang = transcribe_audio(audio)
+        if not text:
+            continue
+        lang = normalize_lang(text, lang)
+        pipeline = start_speech(lang)
+        for sentence in ask_ollama_smart_stream(text, user_lang=lang):
+            pipeline.say(sentence)
+        pipeline.close()
+        pipeline.wait()
+        full.append(time.perf_counter() - t)
+        if pipeline.first_audio_at is not None:
+            first_audio.append(pipeline.first_audio_at - t)
+    elapsed = time.perf_counter() - t0
+    return [
+        summarize("e2e first audio", first_audio, len(full), elapsed),
+        summarize("e2e full turn", full, len(full), elapsed, "items/s = ходів/с"),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк: STT, переклад, LLM, TTS і повний хід.")
+    parser.add_argument("corpus", nargs="?", help="папка з WAV-репліками (для stt і e2e)")
+    parser.add_argument("--stages", nargs="+", default=["stt", "mt", "llm", "tts", "e2e"],
+                        choices=["stt", "mt", "llm", "tts", "e2e"])
+    parser.add_argument("--token-delay", type=float, default=0.02, help="секунд на токен фейкової моделі")
+    parser.add_argument("--first-token-delay", type=float, default=0.1, help="секунд на обробку промпту")
+    parser.add_argument("--prompt-token-delay", type=float, default=0.0,
+                        help="секунд на токен промпту поза KV-кешем фейкової моделі")
+    parser.add_argument("--search-delay", type=float, default=0.3, help="секунд на фейковий веб-пошук")
+    parser.add_argument("--realtime-audio", action="store_true", help="null-колонки грають у темпі реального часу")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from fake_ollama import FakeOllamaServer
+
+    router_model = getattr(config, "OLLAMA_ROUTER_MODEL", config.OLLAMA_MODEL)
+    server = FakeOllamaServer(
+        reply=_BENCH_REPLY,
+        replies={router_model: '{"need_web": false, "search_query": ""}'},
+        token_delay=args.token_delay,
+        first_token_delay=args.first_token_delay,
+        prompt_token_delay=args.prompt_token_delay,
+    ).start()
+
+    # усе налаштовуємо ДО імпорту llm/db/tts — вони читають config при імпорті
+    tmp_dir = tempfile.mkdtemp(prefix="assistant-bench-")
+    config.OLLAMA_BASE_URL = server.base_url
+    config.OLLAMA_PRELOAD = False
+    config.DB_PATH = os.path.join(tmp_dir, "bench.sqlite3")
+    config.TRACE_PATH = os.path.join(tmp_dir, "traces.jsonl")
+    config.TTS_OUTPUT = "null"
+    config.TTS_NULL_SPEED = 1.0 if args.realtime_audio else 0.0
+    config.TTS_CACHE_ENABLED = False
+    config.MT_CACHE_SIZE = 1
+
+    config.WEB_CACHE_TTL = 0  # кожен пошук "холодний", щоб повтори були порівнянні
+
+    import web_tools
+
+    web_tools.set_search_backend(web_tools.FixtureBackend(delay=args.search_delay))
+
+    corpus = load_corpus(args.corpus)
+    prompts = list(_PROMPTS)
+    if "llm" in args.stages and not mt_available():
+        # без перекладача uk-хід неможливий, але en-запити все одно міряють LLM
+        prompts = [(text, lang) for text, lang in prompts if lang != "uk"]
+        print("[bench] llm: переклад недоступний, лишаю тільки англійські запити")
+
+    print(f"[bench] WAV: {len(corpus)}, токен {args.token_delay * 1000:.0f} мс, "
+          f"промпт {args.first_token_delay * 1000:.0f} мс, пошук {args.search_delay * 1000:.0f} мс, "
+          f"тимчасові файли: {tmp_dir}\n")
+
+    stages = {
+        "stt": lambda: bench_stt(corpus) if corpus else [],
+        "mt": lambda: bench_mt(args.repeat),
+        "llm": lambda: bench_llm(prompts, args.repeat),
+        "tts": lambda: bench_tts(args.repeat),
+        "e2e": lambda: bench_e2e(corpus) if corpus else [],
+    }
+
+    rows: list[dict] = []
+    try:
+        for name in args.stages:
+            try:
+                rows.extend(stages[name]())
+            except (ImportError, FileNotFoundError) as e:
+                print(f"[bench] {name}: пропускаю ({e})")
+    finally:
+        server.stop()
+
+    print()
+    print_table(rows)
+    print(f"\n[bench] fake-ollama: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ RECORD_SECONDS = 5         # тривалість запису (секунди)
 WHISPER_MODEL_NAME = "large-v3"   # швидка й достатньо точна small, medium, large
 WHISPER_DEVICE = "cpu"         # працюємо на CPU
 WHISPER_COMPUTE_TYPE = "int8"  # оптимально для CPU
+WHISPER_NUM_WORKERS = 1        # паралельних розпізнавань однією моделлю (server.py піднімає до SERVER_STT_WORKERS)
 
 # ---------- Ollama ----------
 # базовий URL Ollama (локально)
@@ -20,6 +21,60 @@ OLLAMA_MODEL = "qwen3:8b"
 # Легка router-модель для сортування запитів / вибору інструментів
 OLLAMA_ROUTER_MODEL = "qwen3:0.6b"
 
+# Кеш вердиктів router-а (чи потрібен веб) — ключ: нормалізоване питання
+ROUTER_CACHE_SIZE = 512
+ROUTER_CACHE_TTL = 600        # секунд
+
+# Скільки Ollama тримає моделі в пам'яті між запитами (-1 — завжди)
+OLLAMA_KEEP_ALIVE = "30m"
+# Завантажити основну й router-модель одразу при старті асистента
+OLLAMA_PRELOAD = True
+
+# Потокова відповідь: озвучуємо кожне речення, щойно модель його дописала
+LLM_STREAMING = True
+# Router, переклад і основна генерація стартують одночасно (no-web відповідь "наперед")
+LLM_SPECULATIVE = True
+# Потоків для паралельних етапів ходу (router + переклад: 2 на хід); server.py піднімає до 2 × SERVER_MAX_ACTIVE_TURNS
+LLM_PIPELINE_WORKERS = 4
+
+# ---------- Переклад (MarianMT) ----------
+# "marian" — PyTorch, "ct2" — CTranslate2 int8 (pip install ctranslate2), "auto" — ct2, якщо встановлено
+MT_BACKEND = "auto"
+MT_CT2_DIR = "mt_ct2"          # куди кешувати сконвертовані моделі
+MT_CT2_COMPUTE_TYPE = "int8"
+MT_NUM_BEAMS = 2        # більше — трохи якісніше, але повільніше
+MT_NUM_THREADS = 0      # потоки torch/ct2 для перекладу (0 — як є за замовчуванням)
+MT_BATCH_SIZE = 8       # скільки речень перекладати одним батчем
+MT_CACHE_SIZE = 2048    # скільки перекладених речень пам'ятати (на кожен напрямок)
+
+# ---------- Завантаження моделей ----------
+MODELS_LOAD_WORKERS = 4  # скільки моделей (Whisper, переклад, Ollama, TTS) вантажити паралельно
+
+# ---------- База даних ----------
+DB_QUEUE_SIZE = 1000    # скільки ходів може чекати на запис (далі save_turn чекає)
+DB_BATCH_SIZE = 64      # скільки ходів писати однією транзакцією
+
+# ---------- Пам'ять розмови ----------
+MEMORY_ENABLED = True
+MEMORY_RECENT_TURNS = 4       # останні ходи в промпті: від N до 2N-1 (вікно зсувається стрибками заради KV-кешу)
+MEMORY_RETRIEVED_TURNS = 3    # скільки старих релевантних ходів шукати в історії (FTS)
+MEMORY_TOKEN_BUDGET = 800     # загальний ліміт токенів на історію (~4 символи = 1 токен)
+MEMORY_TURN_TOKENS = 200      # ліміт на одну репліку в історії
+
+# ---------- Веб-пошук ----------
+WEB_SEARCH_BACKEND = "ddgs"     # "ddgs" — DuckDuckGo, "fixture" — локальні результати без мережі
+WEB_FIXTURE_PATH = None         # JSON {"запит": [{title, href, body}]} для "fixture"
+WEB_SEARCH_DEADLINE = 3.0       # секунд максимум на пошук; що не встигло — без нього
+WEB_CACHE_TTL = 900             # секунд, скільки результати пошуку вважаються свіжими
+WEB_CACHE_SIZE = 256            # записів у кеші в пам'яті
+WEB_CACHE_PERSIST = True        # кеш також у SQLite (переживає перезапуск)
+WEB_CONTEXT_TOKENS = 350        # бюджет токенів на результати пошуку в промпті (0 — без стиснення)
+WEB_CONTEXT_NUMBER_BOOST = 0.5  # наскільки підняти речення з числами (температура, курс тощо)
+
+# ---------- Трасування затримок ----------
+TRACE_ENABLED = True            # писати час етапів кожного ходу
+TRACE_PATH = "traces.jsonl"     # звіт: python tracing.py
+
 # ---------- Hotkeys ----------
 HOTKEY_RECORD = "f9"
 HOTKEY_EXIT = "esc"
@@ -28,11 +83,62 @@ HOTKEY_EXIT = "esc"
 TTS_ENABLED = True          # щоб вимкнути озвучку — постав False
 TTS_RATE = 190              # швидкість мовлення (збільшити — швидше)
 
+# Рушій Piper: "auto" / "onnx" (onnxruntime у процесі, працює й на Linux) / "piper_cli" (piper.exe)
+TTS_BACKEND = "auto"
+TTS_OUTPUT = "device"       # "device" — колонки, "null" — без звуку (бенчмарки, сервер без аудіо)
+TTS_NULL_SPEED = 1.0        # для "null": 1 — темп реального часу, 0 — без пауз
+TTS_ONNX_INTRA_THREADS = 2  # потоки ORT всередині операції (щоб не відбирати ядра у Whisper/Ollama)
+TTS_ONNX_INTER_THREADS = 1
+
+# Кеш синтезованого звуку (однакові фрази не синтезуються вдруге)
+TTS_CACHE_ENABLED = True
+TTS_CACHE_DIR = "tts_cache"   # відносно папки проєкту
+TTS_CACHE_MEMORY_MB = 64
+TTS_CACHE_DISK_MB = 512
+# Що синтезувати в кеш одразу при старті
+TTS_PREWARM_PHRASES = {
+    "uk": [
+        "Привіт! Чим можу допомогти?",
+        "Вибач, я не зрозумів. Повтори, будь ласка.",
+        "Сталася помилка, спробуй ще раз.",
+    ],
+    "en": [
+        "Hello! How can I help you?",
+        "Sorry, I did not catch that. Please repeat.",
+        "I could not find exact current values, only general information.",
+    ],
+}
+
 # ---------- VAD (авто-кінець фрази) ----------
 MAX_RECORD_SECONDS = 20       # максимум тривалості однієї репліки
 VAD_THRESHOLD = 0.01          # чутливість до голосу (чим менше, тим чутливіше)
 VAD_SILENCE_SECONDS = 1.2     # скільки секунди тиші вважати кінцем фрази
+VAD_ENGINE = "energy"         # energy (NumPy) / silero / webrtc — див. vad.py
+VAD_FRAME_MS = 30             # розмір VAD-фрейму (менше — точніше ловимо кінець фрази)
+VAD_PREROLL_MS = 300          # скільки звуку до початку голосу зберігати (щоб не обрізати слово)
+
+# ---------- Barge-in (перебити асистента) ----------
+BARGE_IN_ENABLED = True       # слухати мікрофон, поки асистент думає і говорить; голос перериває відповідь
+BARGE_IN_THRESHOLD = 0.03     # поріг гучності для barge-in (вищий за VAD_THRESHOLD — щоб не реагувати на власну озвучку; з навушниками можна знизити)
+BARGE_IN_MIN_SPEECH_MS = 250  # скільки мовлення підряд потрібно, щоб перервати
+BARGE_IN_JOIN_TIMEOUT = 0.3   # секунд максимум чекати, поки перерваний хід звільнить мікрофон
+
+# ---------- Потокове розпізнавання ----------
+STT_STREAMING = True          # розпізнавати вже під час запису (після паузи — лише хвіст)
+STT_STREAM_STEP_SECONDS = 1.0 # як часто робити проміжний прохід Whisper
+STT_LANG_LOCK_PROB = 0.8      # з якої впевненості Whisper фіксувати мову для наступних проходів
+
 
 
 
 
+# ---------- Сервер (server.py) ----------
+SERVER_HOST = "127.0.0.1"     # лише локально; 0.0.0.0 — відкрити в мережу
+SERVER_PORT = 8765
+SERVER_MAX_SESSIONS = 32      # одночасно відкритих сесій (клієнтів)
+SERVER_SESSION_TTL = 900      # секунд без активності, після яких сесія закривається
+SERVER_MAX_ACTIVE_TURNS = 4   # ходів, що обробляються одночасно
+SERVER_MAX_QUEUED_TURNS = 8   # ходів, що можуть чекати; решта одразу отримує 503 + Retry-After
+SERVER_QUEUE_TIMEOUT = 10.0   # секунд максимум чекати в черзі
+SERVER_STT_WORKERS = 2        # паралельних розпізнавань Whisper
+SERVER_TTS_WORKERS = 2        # паралельних синтезів Piper
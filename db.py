@@ -1,36 +1,223 @@
 # db.py
+"""
+Історія розмов у SQLite.
 
+- одне постійне з'єднання в режимі WAL (synchronous=NORMAL, кеш і temp у пам'яті);
+- save_turn() лише кладе рядок у обмежену чергу — мікросекунди на шляху відповіді;
+- окремий потік-записувач забирає з черги все, що накопичилось, і пише
+  одним executemany в одній транзакції (батчами до DB_BATCH_SIZE);
+- flush() чекає, поки все записано; при виході (atexit) черга дописується;
+- повнотекстовий пошук: FTS5-таблиця conversations_fts (external content,
+  синхронізується тригерами) + індекси на ts і user_lang; search_turns()
+  повертає ходи за словами (bm25) і/або діапазоном дат з пагінацією;
+- схема версіонується через PRAGMA user_version, старі assistant.sqlite3
+  мігруються при першому запуску; FTS5-індекс — необов'язковий крок поза
+  версіями (SQLite без FTS5 не блокує інші міграції, пошук іде через LIKE).
+"""
+
+import atexit
 import os
+import queue
+import re
 import sqlite3
 import threading
-from datetime import datetime
+from datetime import datetime, timezone
 
 import config
 
 # шлях до файлу БД (можеш змінити в config.py, якщо хочеш інший)
 DB_PATH = getattr(config, "DB_PATH", "assistant.sqlite3")
 
+_INSERT_TURN = """
+    INSERT INTO conversations
+        (ts, user_lang, user_text, assistant_think, assistant_reply)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",   # у WAL цього достатньо: при збої губиться лише остання транзакція
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",    # ~16 МБ
+    "PRAGMA busy_timeout=5000",
+)
+
 _lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_queue: queue.Queue = queue.Queue(maxsize=getattr(config, "DB_QUEUE_SIZE", 1000))
+_writer: threading.Thread | None = None
 
+_STOP = object()
 
-def init_db() -> None:
-    """Створює таблицю, якщо її ще немає."""
-    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
-
-    with _lock, sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts TEXT NOT NULL,
-                user_lang TEXT,
-                user_text TEXT NOT NULL,
-                assistant_think TEXT,
-                assistant_reply TEXT NOT NULL
-            );
-            """
+
+def connect(path: str | None = None) -> sqlite3.Connection:
+    """Нове з'єднання з налаштованими pragma (для читання з інших потоків)."""
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False, cached_statements=64)
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+        _conn = connect()
+    return _conn
+
+
+_CREATE_CONVERSATIONS = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TEXT NOT NULL,
+        user_lang TEXT,
+        user_text TEXT NOT NULL,
+        assistant_think TEXT,
+        assistant_reply TEXT NOT NULL
+    );
+"""
+
+# Міграції: індекс у списку + 1 = user_version після неї
+_MIGRATIONS: list[tuple[str, ...]] = [
+    # 1: базова таблиця
+    (_CREATE_CONVERSATIONS,),
+    # 2: індекси (FTS5 — окремо, див. _FTS_SCHEMA)
+    (
+        "CREATE INDEX IF NOT EXISTS idx_conversations_ts ON conversations(ts)",
+        "CREATE INDEX IF NOT EXISTS idx_conversations_lang_ts ON conversations(user_lang, ts)",
+    ),
+    # 3: кеш веб-пошуку (web_tools.SearchCache)
+    (
+        """
+        CREATE TABLE IF NOT EXISTS web_cache (
+            key TEXT PRIMARY KEY,
+            ts REAL NOT NULL,
+            results TEXT NOT NULL
         )
-        conn.commit()
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_web_cache_ts ON web_cache(ts)",
+    ),
+]
+
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+# FTS5 з тригерами — не версіонується: SQLite може бути зібраний без FTS5, і тоді
+# решта схеми (web_cache тощо) все одно має застосуватись. Створюється, щойно
+# FTS5 доступний; наявні ходи одразу індексуються.
+_FTS_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+        user_text, assistant_reply, assistant_think,
+        content='conversations', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_ai AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversations_fts(rowid, user_text, assistant_reply, assistant_think)
+        VALUES (new.id, new.user_text, new.assistant_reply, new.assistant_think);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_ad AFTER DELETE ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, user_text, assistant_reply, assistant_think)
+        VALUES ('delete', old.id, old.user_text, old.assistant_reply, old.assistant_think);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_au AFTER UPDATE ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, user_text, assistant_reply, assistant_think)
+        VALUES ('delete', old.id, old.user_text, old.assistant_reply, old.assistant_think);
+        INSERT INTO conversations_fts(rowid, user_text, assistant_reply, assistant_think)
+        VALUES (new.id, new.user_text, new.assistant_reply, new.assistant_think);
+    END
+    """,
+    "INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild')",
+)
+
+_fts_ready = False
+
+
+def init_db() -> None:
+    """Створює/мігрує схему до SCHEMA_VERSION (PRAGMA user_version)."""
+    with _lock:
+        conn = _get_conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            if target > 1:
+                print(f"[db] Міграція схеми {target - 1} → {target}...")
+            try:
+                with conn:
+                    for statement in _MIGRATIONS[target - 1]:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {target}")
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ [db] Міграція {target} не вдалася: {e}")
+                break
+        _ensure_fts(conn)
+
+
+def _ensure_fts(conn: sqlite3.Connection) -> None:
+    """Створює FTS5-індекс, якщо його ще немає (під _lock)."""
+    global _fts_ready
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'conversations_fts'").fetchone():
+        _fts_ready = True
+        return
+    try:
+        with conn:
+            for statement in _FTS_SCHEMA:
+                conn.execute(statement)
+        _fts_ready = True
+    except sqlite3.OperationalError as e:
+        # напр. SQLite без FTS5 — пошук по історії піде через LIKE
+        print(f"⚠️ [db] FTS5 недоступний ({e}), пошук по історії — через LIKE")
+
+
+def _write_batch(rows: list[tuple]) -> None:
+    with _lock:
+        conn = _get_conn()
+        try:
+            with conn:  # одна транзакція на батч
+                conn.executemany(_INSERT_TURN, rows)
+        except sqlite3.Error as e:
+            print(f"⚠️ Не вдалося зберегти {len(rows)} ход(ів) у БД: {e}")
+
+
+def _writer_loop() -> None:
+    batch_size = getattr(config, "DB_BATCH_SIZE", 64)
+    while True:
+        item = _queue.get()
+        items = [item]
+        while len(items) < batch_size:
+            try:
+                items.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        rows = [i for i in items if isinstance(i, tuple)]
+        if rows:
+            _write_batch(rows)
+
+        # маркери flush() (Event) і зупинки — після того, як попередні рядки записані
+        stop = False
+        for i in items:
+            if isinstance(i, threading.Event):
+                i.set()
+            elif i is _STOP:
+                stop = True
+        for _ in items:
+            _queue.task_done()
+        if stop:
+            return
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _lock:
+            if _writer is None or not _writer.is_alive():
+                _writer = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+                _writer.start()
 
 
 def save_turn(
@@ -39,21 +226,128 @@ def save_turn(
     assistant_think: str | None,
     assistant_reply: str,
 ) -> None:
-    """Записує один крок діалогу в БД."""
+    """Ставить один крок діалогу в чергу на запис (сам запис — у фоновому потоці)."""
     ts = datetime.utcnow().isoformat(timespec="seconds") + "Z"
     lang = (user_lang or "").lower()
 
-    with _lock, sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
-            """
-            INSERT INTO conversations
-                (ts, user_lang, user_text, assistant_think, assistant_reply)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (ts, lang, user_text, assistant_think or "", assistant_reply),
+    _ensure_writer()
+    # черга обмежена: якщо записувач не встигає — тут чекаємо (backpressure), а не ростемо без меж
+    _queue.put((ts, lang, user_text, assistant_think or "", assistant_reply))
+
+
+def flush(timeout: float | None = 10.0) -> bool:
+    """Чекає, поки все, що вже в черзі, буде записано. True — встигли."""
+    if _writer is None or not _writer.is_alive():
+        return True
+    done = threading.Event()
+    _queue.put(done)
+    return done.wait(timeout)
+
+
+_readers = threading.local()
+
+
+def _reader() -> sqlite3.Connection:
+    """Окреме з'єднання для читання на кожен потік (WAL: читачі не блокують записувача)."""
+    conn = getattr(_readers, "conn", None)
+    if conn is None:
+        conn = _readers.conn = connect()
+    return conn
+
+
+def _fts_query(text: str, any_word: bool = False) -> str:
+    """Слова запиту → безпечний FTS5-вираз: "слово1" "слово2" (або через OR)."""
+    words = re.findall(r"\w+", text or "")
+    return (" OR " if any_word else " ").join(f'"{w}"' for w in words)
+
+
+def _has_fts() -> bool:
+    return _fts_ready
+
+
+def search_turns(
+    query: str | None = None,
+    since: datetime | str | None = None,
+    until: datetime | str | None = None,
+    lang: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    any_word: bool = False,
+) -> list[dict]:
+    """
+    Пошук по історії.
+    - query: слова (усі мають бути в ході; any_word=True — хоча б одне), сортування bm25;
+    - since/until: діапазон ts (datetime або ISO-рядок), lang: мова користувача;
+      ts зберігаються в UTC: aware-datetime переводиться в UTC, naive вважається
+      вже UTC (як datetime.utcnow()), рядок має бути у форматі "YYYY-MM-DDTHH:MM:SSZ";
+    - без query — найновіші ходи в діапазоні.
+    Бачить лише вже записане (див. flush()).
+    """
+    def _iso(value):
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value.isoformat(timespec="seconds") + "Z"
+        return value
+
+    where, params = [], []
+    if since is not None:
+        where.append("c.ts >= ?")
+        params.append(_iso(since))
+    if until is not None:
+        where.append("c.ts < ?")
+        params.append(_iso(until))
+    if lang:
+        where.append("c.user_lang = ?")
+        params.append(lang.lower())
+
+    conn = _reader()
+    columns = "c.id, c.ts, c.user_lang, c.user_text, c.assistant_think, c.assistant_reply"
+    fts = _fts_query(query, any_word) if query else ""
+
+    if fts and _has_fts():
+        # bm25: менше = краще; reasoning (think) важить менше за сам діалог
+        sql = (
+            f"SELECT {columns}, bm25(conversations_fts, 1.0, 1.0, 0.3) AS score "
+            "FROM conversations_fts JOIN conversations c ON c.id = conversations_fts.rowid "
+            "WHERE conversations_fts MATCH ?"
+            + "".join(f" AND {w}" for w in where)
+            + " ORDER BY score LIMIT ? OFFSET ?"
         )
-        conn.commit()
+        params = [fts, *params]
+    elif fts:
+        like = [f"%{w}%" for w in re.findall(r"\w+", query)]
+        joiner = " OR " if any_word else " AND "
+        where.append("(" + joiner.join("(c.user_text LIKE ? OR c.assistant_reply LIKE ?)" for _ in like) + ")")
+        params.extend(p for w in like for p in (w, w))
+        sql = f"SELECT {columns}, 0.0 AS score FROM conversations c WHERE {' AND '.join(where)} " \
+              "ORDER BY c.ts DESC LIMIT ? OFFSET ?"
+    else:
+        sql = (
+            f"SELECT {columns}, 0.0 AS score FROM conversations c"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY c.ts DESC, c.id DESC LIMIT ? OFFSET ?"
+        )
+
+    rows = conn.execute(sql, (*params, limit, offset)).fetchall()
+    keys = ("id", "ts", "user_lang", "user_text", "assistant_think", "assistant_reply", "score")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def close() -> None:
+    """Дописує чергу, зупиняє записувач і закриває з'єднання."""
+    global _conn, _writer
+    if _writer is not None and _writer.is_alive():
+        _queue.put(_STOP)
+        _writer.join(timeout=10.0)
+    _writer = None
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
 
+atexit.register(close)
 
 # ініціалізуємо БД при імпорті модуля
 init_db()
@@ -0,0 +1,282 @@
+# fake_ollama.py
+"""
+Локальний фейковий Ollama-сервер для перевірок і бенчмарків без справжньої моделі.
+
+- /api/generate і /api/chat (stream і non-stream), /api/tags
+- рахує TCP-з'єднання та запити (щоб бачити, чи працює keep-alive пул)
+- імітує завантаження моделі (load_delay) з урахуванням keep_alive
+- імітує швидкість генерації (first_token_delay на промпт + token_delay на токен)
+- імітує KV-кеш префікса: prompt_token_delay платиться лише за токени промпту
+  після спільного початку з попереднім запитом до цієї моделі; у фінальній
+  відповіді — prompt_eval_count/_duration і eval_count/_duration, як у Ollama
+
+Запуск окремо:
+    python fake_ollama.py --port 11435 --token-delay 0.02
+і в config.py: OLLAMA_BASE_URL = "http://127.0.0.1:11435"
+
+Автоматична перевірка keep-alive пулу llm.py на цьому сервері — pool_check.py.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "<think>\nThe user asks something simple, answer briefly.\n</think>\n\n"
+    "This is a fake answer from the local test server. "
+    "It has a second sentence, too."
+)
+
+
+def _tokenize(text: str) -> list[str]:
+    """Грубо ділимо текст на "токени" (слова з пробілами), як це робить стрімінг Ollama."""
+    tokens: list[str] = []
+    word = ""
+    for ch in text:
+        word += ch
+        if ch.isspace():
+            tokens.append(word)
+            word = ""
+    if word:
+        tokens.append(word)
+    return tokens
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        reply: str | None = None,
+        token_delay: float = 0.0,
+        load_delay: float = 0.0,
+        replies: dict[str, str] | None = None,
+        first_token_delay: float = 0.0,
+        prompt_token_delay: float = 0.0,
+    ):
+        super().__init__((host, port), _Handler)
+        self.reply = reply or DEFAULT_REPLY
+        self.replies = replies or {}  # model -> відповідь (наприклад, JSON для router-а)
+        self.token_delay = token_delay
+        self.load_delay = load_delay
+        self.first_token_delay = first_token_delay  # імітація обробки промпту
+        self.prompt_token_delay = prompt_token_delay  # секунд на НЕкешований токен промпту
+        self.kv_cache: dict[str, list[str]] = {}  # model -> токени останнього промпту
+
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.loads = 0
+        self.loaded_until: dict[str, float] = {}
+        self.payloads: list[dict] = []
+        self._thread: threading.Thread | None = None
+
+    # кожен accept() = нове TCP-з'єднання
+    def get_request(self):
+        request = super().get_request()
+        with self.lock:
+            self.connections += 1
+        return request
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "connections": self.connections,
+                "requests": self.requests,
+                "loads": self.loads,
+            }
+
+    def reply_for(self, model: str) -> str:
+        return self.replies.get(model, self.reply)
+
+    def ensure_loaded(self, model: str, keep_alive) -> None:
+        """Імітує завантаження моделі, якщо вона не в пам'яті (або keep_alive вийшов)."""
+        now = time.monotonic()
+        with self.lock:
+            loaded = self.loaded_until.get(model, 0.0) > now
+            if not loaded:
+                self.loads += 1
+            self.loaded_until[model] = now + _parse_keep_alive(keep_alive)
+            if not loaded:
+                self.kv_cache.pop(model, None)  # вивантажена модель втратила кеш
+        if not loaded and self.load_delay:
+            time.sleep(self.load_delay)
+
+    def eval_prompt(self, model: str, prompt: str) -> tuple[int, float]:
+        """Скільки токенів промпту довелось обчислити (без спільного префікса) і скільки це тривало."""
+        tokens = _tokenize(prompt)
+        with self.lock:
+            cached = self.kv_cache.get(model, [])
+            self.kv_cache[model] = tokens
+        reused = 0
+        for a, b in zip(cached, tokens):
+            if a != b:
+                break
+            reused += 1
+        evaluated = max(1, len(tokens) - reused)
+        seconds = self.first_token_delay + self.prompt_token_delay * evaluated
+        if seconds:
+            time.sleep(seconds)
+        return evaluated, seconds
+
+
+def _render_chat(messages: list[dict]) -> str:
+    """Приблизно як chat-шаблон моделі: повідомлення одне за одним з ролями."""
+    return "".join(f"<|{m.get('role')}|>\n{m.get('content') or ''}\n" for m in messages) + "<|assistant|>\n"
+
+
+def _parse_keep_alive(value) -> float:
+    """'30m' / '10s' / '1h' / число секунд / -1 (назавжди) → секунди."""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    text = str(value).strip()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    number = float(text)
+    return float("inf") if number < 0 else number
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # щоб працював keep-alive
+    server: FakeOllamaServer
+
+    def log_message(self, format, *args):  # тихо
+        pass
+
+    def _send_json(self, data: dict, status: int = 200) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: dict) -> None:
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            with self.server.lock:
+                models = list(self.server.loaded_until)
+            self._send_json({"models": [{"name": m} for m in models]})
+            return
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.payloads.append(payload)
+
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+        chat = self.path == "/api/chat"
+
+        model = payload.get("model") or ""
+        self.server.ensure_loaded(model, payload.get("keep_alive"))
+
+        # preload: запит без prompt/messages лише завантажує модель
+        prompt = _render_chat(payload["messages"]) if chat and payload.get("messages") else payload.get("prompt")
+        if not prompt:
+            empty = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+            self._send_json({"model": model, **empty, "done": True})
+            return
+
+        reply = self.server.reply_for(model)
+        tokens = _tokenize(reply)
+
+        prompt_tokens, prompt_seconds = self.server.eval_prompt(model, prompt)
+
+        def _piece(text: str) -> dict:
+            return {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+
+        def _final(eval_seconds: float) -> dict:
+            return {
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prompt_seconds * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(eval_seconds * 1e9),
+            }
+
+        if not payload.get("stream", True):
+            t0 = time.perf_counter()
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json({"model": model, **_piece(reply), "done": True, **_final(time.perf_counter() - t0)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            t0 = time.perf_counter()
+            for token in tokens:
+                if self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+                self._send_chunk({"model": model, **_piece(token), "done": False})
+            self._send_chunk({"model": model, **_piece(""), "done": True, **_final(time.perf_counter() - t0)})
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # клієнт скасував генерацію — як і справжня Ollama, просто зупиняємось
+            self.close_connection = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковий Ollama-сервер для локальних перевірок.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="секунд на токен")
+    parser.add_argument("--load-delay", type=float, default=1.0, help="секунд на 'завантаження' моделі")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="секунд на обробку промпту")
+    parser.add_argument("--prompt-token-delay", type=float, default=0.0,
+                        help="секунд на кожен токен промпту поза KV-кешем")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        host=args.host,
+        port=args.port,
+        token_delay=args.token_delay,
+        load_delay=args.load_delay,
+        first_token_delay=args.first_token_delay,
+        prompt_token_delay=args.prompt_token_delay,
+    )
+    print(f"[fake-ollama] Слухаю на {server.base_url} (Ctrl+C — вихід)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[fake-ollama] Статистика: {server.stats()}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
 # llm.py
 
+import asyncio
+import atexit
+import queue
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import AsyncIterator, Callable, Iterator
+
 import httpx
 import config
 from db import save_turn
-from translate import translate as mt_translate
-from web_tools import web_search, format_results_for_llm
+from memory import ConversationMemory, get_memory
+from router import LayeredRouter
+import tracing
+from translate import translate as mt_translate, translate_sentences as mt_translate_sentences
+from web_tools import web_search
+from web_context import build_web_context
 import json
 
 
@@ -14,6 +29,147 @@ import json
 ROUTER_MODEL = getattr(config, "OLLAMA_ROUTER_MODEL", config.OLLAMA_MODEL)
 
 OLLAMA_GENERATE_URL = config.OLLAMA_BASE_URL.rstrip("/") + "/api/generate"
+# Основні запити йдуть через /api/chat: system-промпт і попередні ходи — незмінний
+# префікс, змінне (знайдене в історії, веб, питання) — в останньому повідомленні,
+# тож Ollama перевикористовує KV-кеш префікса між ходами.
+OLLAMA_CHAT_URL = config.OLLAMA_BASE_URL.rstrip("/") + "/api/chat"
+
+# Скільки Ollama тримає модель у пам'яті після запиту ("30m", "-1" = завжди)
+OLLAMA_KEEP_ALIVE = getattr(config, "OLLAMA_KEEP_ALIVE", "30m")
+
+_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=8,
+    max_keepalive_connections=4,
+    keepalive_expiry=300.0,
+)
+
+# Один пул з'єднань на весь процес: router і основна модель
+# ходять через те саме keep-alive TCP-з'єднання.
+_client: httpx.Client | None = None
+# AsyncClient прив'язаний до event loop, у якому відкрив з'єднання, —
+# тому свій на кожен loop (asyncio.run у бенчмарку, сервері тощо)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """Повертає спільний httpx.Client (створюється при першому виклику)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS)
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Повертає httpx.AsyncClient поточного event loop (спільний для всього asyncio-коду в ньому)."""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = _async_clients[loop] = httpx.AsyncClient(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS)
+    return client
+
+
+async def aclose_async_client() -> None:
+    """Закриває AsyncClient поточного event loop — викликати перед виходом з asyncio.run()."""
+    with _client_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_clients() -> None:
+    """Закриває пули з'єднань (викликається при виході)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        # AsyncClient-и закриваються через aclose_async_client() у своєму event loop;
+        # при виході просто відпускаємо посилання
+        _async_clients.clear()
+
+
+atexit.register(close_clients)
+
+
+class CancelToken:
+    """
+    Прапорець скасування, який можна передати в потокову генерацію.
+    cancel() з будь-якого потоку одразу закриває активний HTTP-стрім,
+    тож Ollama перестає генерувати, а читач виходить з циклу.
+    supersede() — хід уже замінено новішим: скасувати і нічого не зберігати,
+    навіть частину відповіді (потік ходу міг ще висіти в розпізнаванні чи перекладі).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.superseded = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def supersede(self) -> None:
+        self.superseded = True
+        self.cancel()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Реєструє дію при скасуванні (якщо вже скасовано — виконує одразу)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+def preload_models(models: list[str] | None = None, background: bool = True) -> threading.Thread | None:
+    """
+    Просить Ollama завантажити моделі заздалегідь (POST /api/generate без prompt),
+    щоб перший хід не платив за завантаження моделі.
+    За замовчуванням — основна модель і router-модель, у фоновому потоці.
+    """
+    if models is None:
+        models = list(dict.fromkeys([config.OLLAMA_MODEL, ROUTER_MODEL]))
+
+    def _load() -> None:
+        client = get_client()
+        for model in models:
+            try:
+                print(f"🤖 Preload моделі {model} (keep_alive={OLLAMA_KEEP_ALIVE})...")
+                resp = client.post(
+                    OLLAMA_GENERATE_URL,
+                    json={"model": model, "keep_alive": OLLAMA_KEEP_ALIVE},
+                )
+                resp.raise_for_status()
+                print(f"🤖 Модель {model} завантажена.")
+            except Exception as e:
+                print(f"⚠️ Не вдалося завантажити модель {model}: {e}")
+
+    if not background:
+        _load()
+        return None
+
+    thread = threading.Thread(target=_load, name="ollama-preload", daemon=True)
+    thread.start()
+    return thread
 
 
 
@@ -56,30 +212,325 @@ def _split_think_and_answer(text: str) -> tuple[str, str]:
     return think, answer
 
 
-def _generate_ollama(prompt: str, model: str | None = None) -> str:
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+# кінець речення: .!?… (можливо з лапками/дужкою) + пробіл, або перенос рядка
+_SENTENCE_BOUNDARY_RE = re.compile(r"[.!?…]+[\"'»)\]]*\s+|\n\s*")
+
+
+class _ThinkFilter:
     """
-    Виклик /api/generate до Ollama, повертає СИРИЙ текст відповіді (може містити <think>).
+    Інкрементальний аналог _split_think_and_answer для потоку токенів:
+    все, що всередині <think>...</think>, складаємо в think,
+    а текст після </think> віддаємо назовні шматками, щойно він приходить.
     """
-    if model is None:
-        model = config.OLLAMA_MODEL
 
-    payload = {
+    def __init__(self):
+        self._state = "start"  # start -> think -> answer  (або start -> answer)
+        self._buf = ""
+        self._think: list[str] = []
+
+    @property
+    def think(self) -> str:
+        return "".join(self._think).strip()
+
+    def feed(self, chunk: str) -> str:
+        """Приймає черговий шматок сирого тексту, повертає готовий шматок відповіді."""
+        self._buf += chunk
+
+        while True:
+            if self._state == "start":
+                head = self._buf.lstrip()
+                if head.startswith(_THINK_OPEN):
+                    self._buf = head[len(_THINK_OPEN):]
+                    self._state = "think"
+                    continue
+                if _THINK_OPEN.startswith(head):
+                    # ще не зрозуміло, чи буде <think> — чекаємо наступний токен
+                    return ""
+                self._state = "answer"
+                continue
+
+            if self._state == "think":
+                end = self._buf.find(_THINK_CLOSE)
+                if end == -1:
+                    # тримаємо хвіст, бо тег </think> може бути розірваний між токенами
+                    keep = len(_THINK_CLOSE) - 1
+                    if len(self._buf) > keep:
+                        self._think.append(self._buf[:-keep])
+                        self._buf = self._buf[-keep:]
+                    return ""
+                self._think.append(self._buf[:end])
+                self._buf = self._buf[end + len(_THINK_CLOSE):]
+                self._state = "answer"
+                continue
+
+            out, self._buf = self._buf, ""
+            return out
+
+    def flush(self) -> str:
+        """Кінець потоку: віддає все, що залишилось у буфері."""
+        if self._state == "think":
+            # </think> так і не прийшов — як і в _split_think_and_answer,
+            # вважаємо весь текст відповіддю
+            print("⚠️ Не знайдено явного </think>, використовую всю відповідь як фінальну (EN).")
+            out = "".join(self._think) + self._buf
+            self._think = []
+        else:
+            out = self._buf
+        self._buf = ""
+        self._state = "answer"
+        return out
+
+
+class _SentenceSplitter:
+    """Накопичує текст і віддає завершені речення, щойно вони готові."""
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, text: str) -> list[str]:
+        self._buf += text
+        sentences: list[str] = []
+        while True:
+            m = _SENTENCE_BOUNDARY_RE.search(self._buf)
+            if not m:
+                break
+            sentence = self._buf[:m.end()].strip()
+            self._buf = self._buf[m.end():]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> list[str]:
+        rest, self._buf = self._buf.strip(), ""
+        return [rest] if rest else []
+
+
+def split_sentences(text: str) -> list[str]:
+    """Ділить готовий текст на речення (тими ж правилами, що й потік)."""
+    splitter = _SentenceSplitter()
+    return splitter.feed(text or "") + splitter.flush()
+
+
+class _EvalStats:
+    """
+    Скільки Ollama витратила на обробку промпту (prompt_eval) і на генерацію (eval)
+    — з метаданих фінальної відповіді. Окремо по моделях (основна / router).
+    Якщо KV-кеш префікса спрацював, prompt_eval_count — лише нові токени.
+    """
+
+    _KEYS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: dict[str, dict[str, float]] = {}
+
+    def record(self, model: str, data: dict) -> None:
+        if "eval_count" not in data and "prompt_eval_count" not in data:
+            return
+        prompt_tokens = int(data.get("prompt_eval_count") or 0)
+        prompt_s = (data.get("prompt_eval_duration") or 0) / 1e9
+        eval_tokens = int(data.get("eval_count") or 0)
+        eval_s = (data.get("eval_duration") or 0) / 1e9
+
+        with self._lock:
+            totals = self._totals.setdefault(model, {"requests": 0, **{k: 0 for k in self._KEYS}})
+            totals["requests"] += 1
+            totals["prompt_eval_count"] += prompt_tokens
+            totals["prompt_eval_duration"] += prompt_s
+            totals["eval_count"] += eval_tokens
+            totals["eval_duration"] += eval_s
+
+        print(f"[llm] {model}: промпт {prompt_tokens} ток. за {prompt_s:.2f} с, "
+              f"генерація {eval_tokens} ток. за {eval_s:.2f} с")
+
+        if model == config.OLLAMA_MODEL:
+            tracing.add("prompt_eval", prompt_s)
+            tracing.add("eval", eval_s)
+            tracing.set_meta(prompt_tokens=prompt_tokens, eval_tokens=eval_tokens)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {model: dict(totals) for model, totals in self._totals.items()}
+
+
+_eval_stats = _EvalStats()
+
+
+def eval_stats() -> dict[str, dict[str, float]]:
+    """Сумарні prompt_eval / eval (токени, секунди) по моделях з початку роботи."""
+    return _eval_stats.stats()
+
+
+def _chat_payload(messages: list[dict], model: str, stream: bool) -> dict:
+    return {
         "model": model,
-        "prompt": prompt,
-        "stream": False,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
         # за бажанням можна зафіксувати контекст:
         # "options": {"num_ctx": 2048},
     }
 
-    print("🤖 Запитую модель через Ollama (/api/generate)...")
 
-    with httpx.Client(timeout=120.0) as client:
-        resp = client.post(OLLAMA_GENERATE_URL, json=payload)
+class _ChatChunks:
+    """
+    Повідомлення /api/chat → сирий текст як у /api/generate.
+    Нові версії Ollama віддають роздуми окремо (message.thinking) —
+    загортаємо їх у <think>...</think>, щоб решта коду не змінювалась.
+    """
+
+    def __init__(self):
+        self._thinking = False
+
+    def feed(self, message: dict) -> str:
+        out = ""
+        thinking = message.get("thinking") or ""
+        if thinking:
+            if not self._thinking:
+                out += "<think>"
+                self._thinking = True
+            out += thinking
+        content = message.get("content") or ""
+        if content and self._thinking:
+            out += "</think>"
+            self._thinking = False
+        return out + content
+
+    def flush(self) -> str:
+        if self._thinking:
+            self._thinking = False
+            return "</think>"
+        return ""
+
+
+def _generate_ollama(messages: list[dict], model: str | None = None) -> str:
+    """
+    Виклик /api/chat до Ollama, повертає СИРИЙ текст відповіді (може містити <think>).
+    """
+    if model is None:
+        model = config.OLLAMA_MODEL
+
+    print("🤖 Запитую модель через Ollama (/api/chat)...")
+
+    # router-класифікація рахується в "route" (див. decide_need_web), а не тут
+    with tracing.span("generate") if model == config.OLLAMA_MODEL else nullcontext():
+        resp = get_client().post(OLLAMA_CHAT_URL, json=_chat_payload(messages, model, stream=False))
         resp.raise_for_status()
         data = resp.json()
 
-    raw = (data.get("response") or "").strip()
-    return raw
+    _eval_stats.record(model, data)
+    chunks = _ChatChunks()
+    raw = chunks.feed(data.get("message") or {}) + chunks.flush()
+    return raw.strip()
+
+
+async def _generate_ollama_async(messages: list[dict], model: str | None = None) -> str:
+    """Async-варіант _generate_ollama через спільний httpx.AsyncClient."""
+    if model is None:
+        model = config.OLLAMA_MODEL
+
+    print("🤖 Запитую модель через Ollama (/api/chat, async)...")
+
+    resp = await get_async_client().post(OLLAMA_CHAT_URL, json=_chat_payload(messages, model, stream=False))
+    resp.raise_for_status()
+    data = resp.json()
+
+    _eval_stats.record(model, data)
+    chunks = _ChatChunks()
+    return (chunks.feed(data.get("message") or {}) + chunks.flush()).strip()
+
+
+def _stream_ollama(
+    messages: list[dict],
+    model: str | None = None,
+    cancel: CancelToken | None = None,
+) -> Iterator[str]:
+    """
+    Виклик /api/chat зі "stream": true.
+    Читає NDJSON-потік Ollama і віддає СИРІ шматки тексту (можуть містити <think>).
+    Якщо передано cancel — після cancel.cancel() потік тихо завершується.
+    """
+    if model is None:
+        model = config.OLLAMA_MODEL
+
+    print("🤖 Запитую модель через Ollama (/api/chat, stream)...")
+
+    if cancel is not None and cancel.cancelled:
+        return
+
+    payload = _chat_payload(messages, model, stream=True)
+    chunks = _ChatChunks()
+    t0 = time.perf_counter()
+    t_first = None
+    try:
+        with get_client().stream("POST", OLLAMA_CHAT_URL, json=payload) as resp:
+            resp.raise_for_status()
+            if cancel is not None:
+                cancel.on_cancel(resp.close)
+
+            try:
+                for line in resp.iter_lines():
+                    if cancel is not None and cancel.cancelled:
+                        return
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(f"Ollama error: {data['error']}")
+
+                    chunk = chunks.feed(data.get("message") or {})
+                    if data.get("done"):
+                        chunk += chunks.flush()
+                    if chunk:
+                        if t_first is None:
+                            t_first = time.perf_counter()
+                            tracing.mark("first_token", t_first)
+                        yield chunk
+                    if data.get("done"):
+                        _eval_stats.record(model, data)
+                        break
+            except Exception:
+                # закритий з іншого потоку стрім — це скасування, а не помилка
+                if cancel is not None and cancel.cancelled:
+                    return
+                raise
+    finally:
+        # скасована (спекулятивна) генерація — не частина ходу
+        if model == config.OLLAMA_MODEL and (cancel is None or not cancel.cancelled):
+            if t_first is not None:
+                tracing.add("generate_ttft", t_first - t0)
+            tracing.add("generate", time.perf_counter() - t0)
+
+
+async def _stream_ollama_async(messages: list[dict], model: str | None = None) -> AsyncIterator[str]:
+    """Async-варіант _stream_ollama через спільний httpx.AsyncClient."""
+    if model is None:
+        model = config.OLLAMA_MODEL
+
+    print("🤖 Запитую модель через Ollama (/api/chat, async stream)...")
+
+    payload = _chat_payload(messages, model, stream=True)
+    chunks = _ChatChunks()
+    async with get_async_client().stream("POST", OLLAMA_CHAT_URL, json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise RuntimeError(f"Ollama error: {data['error']}")
+
+            chunk = chunks.feed(data.get("message") or {})
+            if data.get("done"):
+                chunk += chunks.flush()
+            if chunk:
+                yield chunk
+            if data.get("done"):
+                _eval_stats.record(model, data)
+                break
 
 
 def translate_text(text: str, src: str, dst: str) -> str:
@@ -91,81 +542,109 @@ def translate_text(text: str, src: str, dst: str) -> str:
 
 
 
-def ask_ollama(
-    user_text: str,
-    user_lang: str | None = None,
-    web_context: str | None = None,
-) -> str:
+def _prepare_model_input(user_text: str, is_uk: bool) -> tuple[str | None, str]:
     """
-    Головна функція для асистента.
-
-    Якщо web_context не None — він буде доданий до промпту як
-    блок з результатами веб-пошуку, але:
-    - user_text для БД не змінюється,
-    - переклад працює тільки поверх user_text, web_context не перекладаємо.
+    Готує текст для моделі (англійською).
+    Повертає (user_text_en або None, model_input).
     """
-    lang = (user_lang or "unknown").lower()
-    is_uk = lang.startswith("uk")
-
-    # 1. Готуємо текст для моделі (англійською)
-    user_text_en = None
-    model_input = user_text
+    if not is_uk:
+        return None, user_text
 
-    if is_uk:
-        print("🔁 Переклад запиту UK → EN для моделі...")
+    print("🔁 Переклад запиту UK → EN для моделі...")
+    with tracing.span("translate_in"):
         user_text_en = translate_text(user_text, src="uk", dst="en")
-        print(f"🔁 UK → EN: {user_text_en!r}")
-        model_input = user_text_en
-
-    # 2. Основний system-prompt: модель думає і відповідає АНГЛІЙСЬКОЮ
-    web_block = ""
+    print(f"🔁 UK → EN: {user_text_en!r}")
+    return user_text_en, user_text_en
+
+
+# Незмінний між ходами початок розмови — Ollama тримає його в KV-кеші.
+# Нічого змінного (мова, дата, історія, веб) сюди не додавати.
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant.\n"
+    "- You ALWAYS think and answer in English.\n"
+    "- You MAY use <think>...</think> for internal reasoning,\n"
+    "  but the final answer for the user MUST be written AFTER the </think> tag,\n"
+    "  in clean English.\n"
+    "- The final answer should be concise (1–3 sentences) unless the question requires more.\n"
+    "- The user's messages are machine-translated to English when needed;\n"
+    "  the original language code is given at the start of the last message.\n"
+    "- Earlier conversation or web search results may be attached to the last message:\n"
+    "  use them only if they help with the current question, rely primarily on web results\n"
+    "  when they are relevant, and say if something is still uncertain."
+)
+
+
+def _build_messages(
+    model_input: str,
+    lang: str,
+    web_context: str | None = None,
+    memory: ConversationMemory | None = None,
+) -> list[dict]:
+    """
+    Повідомлення для /api/chat у порядку "стабільне → змінне":
+    system-промпт, останні ходи (memory.py, вікно зсувається стрибками),
+    і в кінці одне user-повідомлення з мовою, знайденими старими ходами,
+    веб-результатами і самим питанням (англійською).
+    memory — пам'ять розмови (None — спільна пам'ять асистента, get_memory()).
+    """
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    retrieved_block = ""
+    if getattr(config, "MEMORY_ENABLED", True):
+        recent, retrieved_block = (memory or get_memory()).chat_context(model_input)
+        for user, reply in recent:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": reply})
+
+    parts = [f"(Original user language code: {lang})"]
+    if retrieved_block:
+        parts.append(retrieved_block)
     if web_context:
-        web_block = (
-            "\n\nHere are some web search results that may be relevant:\n"
-            f"{web_context}\n"
-            "When answering, rely primarily on these results if they are relevant,\n"
-            "and say if something is still uncertain.\n"
-        )
+        parts.append(f"Web search results that may be relevant:\n{web_context}")
+    parts.append(f"User message (in English):\n{model_input}")
 
-    system_prompt = (
-        "You are a helpful AI assistant.\n"
-        "- You ALWAYS think and answer in English.\n"
-        f"- The original user language code was: {lang}.\n"
-        "- You MAY use <think>...</think> for internal reasoning,\n"
-        "  but the final answer for the user MUST be written AFTER the </think> tag,\n"
-        "  in clean English.\n"
-        "- The final answer should be concise (1–3 sentences) unless the question requires more.\n\n"
-        f"{web_block}\n"
-        "User message (in English):\n"
-        f"{model_input}\n\n"
-        "Assistant:"
-    )
+    messages.append({"role": "user", "content": "\n\n".join(parts)})
+    return messages
 
-    raw = _generate_ollama(system_prompt)
-    think, answer_en = _split_think_and_answer(raw)
 
-    # ... (далі залишаємо твою логіку THINK, переклад EN→UK, save_turn, return final_reply)
+def _finish_turn(
+    user_text: str,
+    lang: str,
+    user_text_en: str | None,
+    think: str,
+    answer_en: str,
+    answer_uk: str | None = None,
+    memory: ConversationMemory | None = None,
+    cancel: CancelToken | None = None,
+) -> str:
+    """
+    Спільний хвіст для blocking- і stream-варіантів:
+    THINK у консоль, переклад EN→UK, save_turn. Повертає фінальну відповідь.
+    answer_uk — якщо переклад уже зроблено по реченнях під час стріму.
+    memory — чия це розмова (None — спільна); непостійна пам'ять у БД не пишеться.
+    cancel.superseded — хід замінено новим, у пам'ять і БД нічого не йде.
+    """
+    memory = memory or get_memory()
+    is_uk = lang.startswith("uk")
 
-    # 3. THINK MODE в консолі
+    # THINK MODE в консолі
     if think:
         print("\n🧠 THINK MODE (внутрішні роздуми моделі):")
         print(think)
         print("🧠 END THINK\n")
 
-    if not answer_en:
-        answer_en = raw
-        print("⚠️ Не знайдено явного </think>, використовую всю відповідь як фінальну (EN).")
-
     print(f"💬 Відповідь моделі (EN, до перекладу): {answer_en!r}")
 
-    # 4. Формуємо фінальну відповідь мовою користувача + рядки для БД
+    # Формуємо фінальну відповідь мовою користувача + рядки для БД
     final_reply = answer_en
     user_text_to_save = user_text
     assistant_reply_to_save = answer_en
 
     if is_uk:
-        print("🔁 Переклад відповіді EN → UK...")
-        answer_uk = translate_text(answer_en, src="en", dst="uk")
+        if answer_uk is None:
+            print("🔁 Переклад відповіді EN → UK...")
+            with tracing.span("translate_out"):
+                answer_uk = translate_text(answer_en, src="en", dst="uk")
         print(f"🔁 EN → UK: {answer_uk!r}")
         final_reply = answer_uk
 
@@ -177,7 +656,17 @@ def ask_ollama(
 
         assistant_reply_to_save = f"{answer_uk}\n\n[EN]\n{answer_en}"
 
-    # 5. Зберігаємо в базу даних
+    if cancel is not None and cancel.superseded:
+        print("⏹ Хід уже замінено новим — не зберігаю.")
+        return final_reply
+
+    # Короткочасна пам'ять (англійською — модель працює англійською)
+    memory.remember(user_text_en or user_text, answer_en)
+
+    if not memory.persistent:
+        return final_reply
+
+    # Зберігаємо в базу даних
     try:
         save_turn(
             user_text=user_text_to_save,
@@ -188,14 +677,246 @@ def ask_ollama(
     except Exception as e:
         print(f"⚠️ Не вдалося зберегти розмову в БД: {e}")
 
-    # 6. Повертаємо фінальну відповідь (її побачиш у консолі й почуєш у TTS)
     return final_reply
 
 
-def decide_need_web(user_text: str, user_lang: str | None) -> tuple[bool, str]:
+def _complete_turn(
+    user_text: str,
+    lang: str,
+    user_text_en: str | None,
+    raw: str,
+    memory: ConversationMemory | None = None,
+    cancel: CancelToken | None = None,
+) -> str:
+    """Сирий текст моделі → think/answer → _finish_turn (blocking-шлях)."""
+    think, answer_en = _split_think_and_answer(raw)
+
+    if not answer_en:
+        answer_en = raw.strip()
+        print("⚠️ Не знайдено явного </think>, використовую всю відповідь як фінальну (EN).")
+
+    return _finish_turn(user_text, lang, user_text_en, think, answer_en, memory=memory, cancel=cancel)
+
+
+class _SentenceTranslator:
     """
-    Вирішує, чи потрібен веб-пошук.
-    Логіка класифікації винесена в окрему легку router-модель (Qwen3:0.6b).
+    Фоновий переклад EN→UK по реченнях: put() подає англійське речення, щойно
+    модель його дописала, ready() без очікування забирає вже перекладені.
+    Якщо поки йшов переклад набралось кілька речень — вони йдуть одним батчем.
+    Порядок речень зберігається (один потік-перекладач).
+    """
+
+    _CLOSE = object()
+
+    def __init__(self):
+        self._in: queue.Queue = queue.Queue()
+        self._out: queue.Queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=tracing.bind(self._run), name="mt-stream", daemon=True)
+        self._thread.start()
+
+    def put(self, sentence: str) -> None:
+        self._in.put(sentence)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._in.get()]
+            while True:
+                try:
+                    batch.append(self._in.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = self._CLOSE in batch
+            if done:
+                batch = batch[:batch.index(self._CLOSE)]
+
+            if batch:
+                try:
+                    with tracing.span("translate_out"):
+                        translated = mt_translate_sentences(batch, src="en", dst="uk")
+                except Exception as e:
+                    print(f"⚠️ [MT] Не вдалося перекласти речення, лишаю англійською: {e}")
+                    translated = batch
+                for sentence in translated:
+                    self._out.put(sentence)
+
+            if done:
+                self._out.put(self._CLOSE)
+                return
+
+    def ready(self) -> list[str]:
+        """Уже перекладені речення (без очікування)."""
+        sentences: list[str] = []
+        while True:
+            try:
+                item = self._out.get_nowait()
+            except queue.Empty:
+                return sentences
+            if item is self._CLOSE:
+                self._out.put(item)  # лишаємо маркер для close()
+                return sentences
+            sentences.append(item)
+
+    def close(self) -> Iterator[str]:
+        """Більше речень не буде: дочікується і віддає решту перекладів."""
+        self.abort()
+        while True:
+            item = self._out.get()
+            if item is self._CLOSE:
+                return
+            yield item
+
+    def abort(self) -> None:
+        """Зупиняє потік-перекладач (після вже поданих речень)."""
+        if not self._closed:
+            self._closed = True
+            self._in.put(self._CLOSE)
+
+    def cancel(self) -> None:
+        """Barge-in: викидає ще не перекладені речення і зупиняє потік (поточний батч дорахується)."""
+        while True:
+            try:
+                self._in.get_nowait()
+            except queue.Empty:
+                break
+        self._closed = False
+        self.abort()
+
+
+def _stream_turn(
+    user_text: str,
+    lang: str,
+    user_text_en: str | None,
+    raw_chunks: Iterator[str],
+    cancel: CancelToken | None = None,
+    memory: ConversationMemory | None = None,
+) -> Iterator[str]:
+    """
+    Потік сирих шматків моделі → готові речення відповіді (+ _finish_turn в кінці).
+    Для uk кожне англійське речення одразу йде у фоновий переклад, а українські
+    віддаються, щойно перекладені, — генерація і переклад ідуть паралельно.
+    Після cancel.cancel() (barge-in) генерація і переклад зупиняються, у пам'ять
+    і БД іде лише та частина відповіді, яку вже віддали.
+    """
+    is_uk = lang.startswith("uk")
+
+    think_filter = _ThinkFilter()
+    splitter = _SentenceSplitter()
+    sentences_en: list[str] = []
+    sentences_uk: list[str] = []
+    mt = _SentenceTranslator() if is_uk else None
+
+    def _emit(sentences: list[str]) -> Iterator[str]:
+        for sentence in sentences:
+            sentences_en.append(sentence)
+            if mt is None:
+                yield sentence
+            else:
+                mt.put(sentence)
+        if mt is not None:
+            for sentence_uk in mt.ready():
+                sentences_uk.append(sentence_uk)
+                yield sentence_uk
+
+    def _cancelled() -> bool:
+        return cancel is not None and cancel.cancelled
+
+    try:
+        for chunk in raw_chunks:
+            if _cancelled():
+                break
+            yield from _emit(splitter.feed(think_filter.feed(chunk)))
+
+        if not _cancelled():
+            yield from _emit(splitter.feed(think_filter.flush()) + splitter.flush())
+
+        if mt is not None and not _cancelled():
+            for sentence_uk in mt.close():
+                if _cancelled():
+                    break
+                sentences_uk.append(sentence_uk)
+                yield sentence_uk
+    finally:
+        if mt is not None:
+            if _cancelled():
+                mt.cancel()
+            else:
+                mt.abort()
+
+    if _cancelled():
+        print("⏹ Відповідь перервано.")
+        if is_uk:
+            # англійською зберігаємо лише те, що встигли перекласти й віддати
+            sentences_en = sentences_en[:len(sentences_uk)]
+        if not sentences_en:
+            return
+
+    answer_en = " ".join(sentences_en)
+    answer_uk = " ".join(sentences_uk) if is_uk else None
+    _finish_turn(user_text, lang, user_text_en, think_filter.think, answer_en, answer_uk, memory=memory, cancel=cancel)
+
+
+def ask_ollama(
+    user_text: str,
+    user_lang: str | None = None,
+    web_context: str | None = None,
+) -> str:
+    """
+    Головна функція для асистента.
+
+    Якщо web_context не None — він буде доданий до промпту як
+    блок з результатами веб-пошуку, але:
+    - user_text для БД не змінюється,
+    - переклад працює тільки поверх user_text, web_context не перекладаємо.
+    """
+    lang = (user_lang or "unknown").lower()
+    is_uk = lang.startswith("uk")
+
+    # 1. Готуємо текст для моделі (англійською)
+    user_text_en, model_input = _prepare_model_input(user_text, is_uk)
+
+    # 2. Основний system-prompt: модель думає і відповідає АНГЛІЙСЬКОЮ
+    messages = _build_messages(model_input, lang, web_context)
+
+    raw = _generate_ollama(messages)
+
+    # 3. THINK, переклад EN→UK, БД — повертаємо фінальну відповідь
+    #    (її побачиш у консолі й почуєш у TTS)
+    return _complete_turn(user_text, lang, user_text_en, raw)
+
+
+def ask_ollama_stream(
+    user_text: str,
+    user_lang: str | None = None,
+    web_context: str | None = None,
+    cancel: CancelToken | None = None,
+) -> Iterator[str]:
+    """
+    Потоковий варіант ask_ollama: генератор, який віддає готові речення
+    відповіді, щойно модель їх дописала (<think> відрізаємо на льоту).
+    TTS може починати говорити після першого речення.
+
+    Для uk кожне речення перекладається EN→UK, щойно модель його дописала,
+    і віддається вже українською (генерація не чекає на переклад).
+    Після вичерпання генератора хід уже збережено в БД.
+    cancel — CancelToken для barge-in (див. _stream_turn).
+    """
+    lang = (user_lang or "unknown").lower()
+    is_uk = lang.startswith("uk")
+
+    user_text_en, model_input = _prepare_model_input(user_text, is_uk)
+    messages = _build_messages(model_input, lang, web_context)
+
+    yield from _stream_turn(
+        user_text, lang, user_text_en, _stream_ollama(messages, cancel=cancel), cancel=cancel
+    )
+
+
+def _classify_with_llm(user_text: str, user_lang: str | None) -> tuple[bool, str] | None:
+    """
+    Класифікація "чи потрібен веб" окремою легкою router-моделлю (Qwen3:0.6b).
+    Повертає None, якщо модель не повернула JSON.
     """
     system_prompt = """
     You are a classifier that decides whether a web search is needed.
@@ -220,10 +941,14 @@ def decide_need_web(user_text: str, user_lang: str | None) -> tuple[bool, str]:
     Respond with JSON only. Do NOT add any extra text.
     """
     lang = (user_lang or "unknown").lower()
-    prompt = f"{system_prompt}\n\nUser language: {lang}\nUser question:\n{user_text}"
+    # інструкція — в system (однакова щоразу, лишається в KV-кеші), питання — окремо
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"User language: {lang}\nUser question:\n{user_text}"},
+    ]
 
     # Тут ми явно юзаємо ROUTER_MODEL (Qwen3:0.6b), а не основну модель.
-    raw = _generate_ollama(prompt, model=ROUTER_MODEL)
+    raw = _generate_ollama(messages, model=ROUTER_MODEL)
 
     try:
         data = json.loads(raw.strip())
@@ -231,36 +956,220 @@ def decide_need_web(user_text: str, user_lang: str | None) -> tuple[bool, str]:
         search_query = str(data.get("search_query") or "").strip()
         return need_web, search_query
     except Exception:
-        # якщо модель не повернула JSON — просто не робимо веб
         print(f"⚠️ decide_need_web: не вдалося розпарсити JSON: {raw!r}")
-        return False, ""
+        return None
 
-def ask_ollama_smart(user_text: str, user_lang: str | None = None) -> str:
+
+# heuristic → cache → router-модель (див. router.py)
+_router = LayeredRouter(_classify_with_llm)
+
+
+def decide_need_web(user_text: str, user_lang: str | None) -> tuple[bool, str]:
     """
-    Обгортка над ask_ollama, яка:
-    1) вирішує, чи потрібен веб-пошук;
-    2) якщо потрібен — робить пошук і додає web_context у промпт;
-    3) інакше працює як звичайний ask_ollama.
+    Вирішує, чи потрібен веб-пошук.
+    Спочатку дешеві регулярки/лексичний класифікатор, потім кеш вердиктів,
+    і тільки якщо вони не впевнені — router-модель.
     """
-    need_web, search_query = decide_need_web(user_text, user_lang)
+    with tracing.span("route"):
+        return _router.route(user_text, user_lang)
 
-    if not need_web:
-        print("🌐 Веб-пошук не потрібен, відповідаю локально.")
-        return ask_ollama(user_text, user_lang)
 
-    if not search_query:
-        search_query = user_text
+def router_stats() -> dict:
+    """Статистика router-а: скільки рішень на якому рівні і скільки часу зекономлено."""
+    return _router.stats()
+
 
+def _search_web_context(search_query: str, variants: list[str] | None = None) -> str | None:
+    """
+    Робить веб-пошук і повертає web_context для промпту (або None, якщо пусто).
+    variants (напр. оригінальна фраза користувача) шукаються паралельно з search_query.
+    """
     print(f"🌐 Роблю веб-пошук для запиту: {search_query!r}")
-    results = web_search(search_query, max_results=5)
+    with tracing.span("web_search"):
+        results = web_search(search_query, max_results=5, variants=variants)
 
     if not results:
         print("🌐 Веб-пошук нічого не дав, відповідаю як звичайно (без інтернету).")
-        return ask_ollama(user_text, user_lang)
+        return None
+
+    return build_web_context(" ".join([search_query, *(variants or [])]), results)
+
+
+# Пул для паралельних етапів ходу (router і переклад UK→EN — по завданню на хід).
+# Створюється при першому ході, тож server.py встигає підняти LLM_PIPELINE_WORKERS
+# під кількість одночасних ходів.
+_pipeline_pool: ThreadPoolExecutor | None = None
+_pipeline_lock = threading.Lock()
+_pipeline_workers = 0
+_pipeline_pending = 0  # подано, але ще не завершено
+
+
+def _submit(fn: Callable, *args) -> Future:
+    """submit() у пул етапів ходу (у трасі поточного ходу) з лічильником черги."""
+    global _pipeline_pool, _pipeline_workers, _pipeline_pending
+    with _pipeline_lock:
+        if _pipeline_pool is None:
+            _pipeline_workers = max(1, getattr(config, "LLM_PIPELINE_WORKERS", 4))
+            _pipeline_pool = ThreadPoolExecutor(max_workers=_pipeline_workers, thread_name_prefix="llm-pipeline")
+        _pipeline_pending += 1
+        future = _pipeline_pool.submit(tracing.bind(fn), *args)
+    future.add_done_callback(_pipeline_done)
+    return future
+
+
+def _pipeline_done(_future: Future) -> None:
+    global _pipeline_pending
+    with _pipeline_lock:
+        _pipeline_pending -= 1
+
+
+def pipeline_stats() -> dict:
+    """Розмір пулу етапів ходу і скільки завдань у ньому (понад workers — чекають у черзі)."""
+    with _pipeline_lock:
+        return {"pipeline_workers": _pipeline_workers, "pipeline_pending": _pipeline_pending}
+
+_DONE = object()
+
+
+class _SpeculativeGeneration:
+    """
+    Спекулятивна no-web генерація: переклад UK→EN + стрім основної моделі
+    стартують одразу, ще до вердикту router-а. Шматки складаються в чергу.
+    Якщо router вирішить, що потрібен веб — генерацію скасовують (cancel()),
+    інакше споживач просто читає вже згенероване з chunks().
+    """
+
+    def __init__(self, user_text: str, lang: str, memory: ConversationMemory | None = None):
+        self.lang = lang
+        self.memory = memory
+        self.cancel_token = CancelToken()
+        self._chunks: queue.Queue = queue.Queue()
+
+        is_uk = lang.startswith("uk")
+        self.translation: Future = _submit(_prepare_model_input, user_text, is_uk)
+        # окремий потік, а не пул: генерація чекає на переклад з пулу
+        self._thread = threading.Thread(target=tracing.bind(self._run), name="llm-speculative", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            _, model_input = self.translation.result()
+            messages = _build_messages(model_input, self.lang, memory=self.memory)
+            for chunk in _stream_ollama(messages, cancel=self.cancel_token):
+                self._chunks.put(chunk)
+        except Exception as e:
+            self._chunks.put(e)
+        finally:
+            self._chunks.put(_DONE)
+
+    def cancel(self) -> None:
+        self.cancel_token.cancel()
+
+    def chunks(self) -> Iterator[str]:
+        while True:
+            item = self._chunks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+def _smart_pipeline(
+    user_text: str,
+    user_lang: str | None,
+    cancel: CancelToken | None = None,
+    memory: ConversationMemory | None = None,
+) -> tuple[str | None, Iterator[str]]:
+    """
+    Оркестрація ходу для ask_ollama_smart*.
+    Повертає (user_text_en, потік сирих шматків відповіді моделі).
+    cancel (barge-in) зупиняє і спекулятивну, і основну генерацію;
+    memory — пам'ять розмови (сесії server.py), None — спільна.
+
+    LLM_SPECULATIVE=True: router, переклад UK→EN і спекулятивна no-web генерація
+    йдуть одночасно, тож звичайний no-web хід коштує max(router, переклад+генерація),
+    а не їхню суму. Якщо router просить веб — спекуляція триває, поки йде пошук,
+    і скасовується лише тоді, коли з'явився web_context.
+    """
+    lang = (user_lang or "unknown").lower()
+    is_uk = lang.startswith("uk")
 
-    web_context = format_results_for_llm(results)
+    if not getattr(config, "LLM_SPECULATIVE", True):
+        need_web, search_query = decide_need_web(user_text, user_lang)
+        web_context = None
+        if need_web:
+            web_context = _search_web_context(search_query or user_text, variants=[user_text])
+        else:
+            print("🌐 Веб-пошук не потрібен, відповідаю локально.")
+
+        user_text_en, model_input = _prepare_model_input(user_text, is_uk)
+        messages = _build_messages(model_input, lang, web_context, memory)
+        return user_text_en, _stream_ollama(messages, cancel=cancel)
+
+    router = _submit(decide_need_web, user_text, user_lang)
+    speculative = _SpeculativeGeneration(user_text, lang, memory)
+    if cancel is not None:
+        cancel.on_cancel(speculative.cancel)
+
+    try:
+        need_web, search_query = router.result()
+    except Exception:
+        speculative.cancel()
+        raise
+
+    if cancel is not None and cancel.cancelled:
+        return None, iter(())
+
+    if need_web:
+        web_context = _search_web_context(search_query or user_text, variants=[user_text])
+        if web_context is not None:
+            print("🌐 Router попросив веб — скасовую спекулятивну відповідь.")
+            speculative.cancel()
+            # system + історія ті самі, що в спекулятивному запиті, — префікс уже в KV-кеші
+            user_text_en, model_input = speculative.translation.result()
+            messages = _build_messages(model_input, lang, web_context, memory)
+            return user_text_en, _stream_ollama(messages, cancel=cancel)
+    else:
+        print("🌐 Веб-пошук не потрібен, беру спекулятивну відповідь.")
+
+    user_text_en, _ = speculative.translation.result()
+    return user_text_en, speculative.chunks()
+
+
+def ask_ollama_smart(
+    user_text: str,
+    user_lang: str | None = None,
+    cancel: CancelToken | None = None,
+    memory: ConversationMemory | None = None,
+) -> str:
+    """
+    Обгортка над ask_ollama, яка:
+    1) вирішує, чи потрібен веб-пошук;
+    2) якщо потрібен — робить пошук і додає web_context у промпт;
+    3) інакше працює як звичайний ask_ollama.
+    Router, переклад і генерація йдуть паралельно (див. _smart_pipeline).
+    Після cancel.cancel() повертає "" і нічого не зберігає.
+    """
+    lang = (user_lang or "unknown").lower()
+    user_text_en, raw_chunks = _smart_pipeline(user_text, user_lang, cancel, memory)
+    raw = "".join(raw_chunks)
+    if cancel is not None and cancel.cancelled:
+        print("⏹ Відповідь перервано.")
+        return ""
+    return _complete_turn(user_text, lang, user_text_en, raw, memory, cancel)
 
-    return ask_ollama(user_text, user_lang, web_context=web_context)
+
+def ask_ollama_smart_stream(
+    user_text: str,
+    user_lang: str | None = None,
+    cancel: CancelToken | None = None,
+    memory: ConversationMemory | None = None,
+) -> Iterator[str]:
+    """Те саме, що ask_ollama_smart, але віддає відповідь по реченнях (див. ask_ollama_stream)."""
+    lang = (user_lang or "unknown").lower()
+    user_text_en, raw_chunks = _smart_pipeline(user_text, user_lang, cancel, memory)
+    yield from _stream_turn(user_text, lang, user_text_en, raw_chunks, cancel=cancel, memory=memory)
 
 
 def ask_ollama_with_web(user_text: str, user_lang: str | None) -> str:
@@ -283,21 +1192,15 @@ def ask_ollama_with_web(user_text: str, user_lang: str | None) -> str:
         # fallback — звичайний ask_ollama
         return ask_ollama(user_text, user_lang)
 
-    web_context = format_results_for_llm(results)
+    web_context = build_web_context(search_query, results)
 
     # 2. Готуємо інструкцію для моделі
     #    (щоб вона опиралась на результати пошуку)
     target_lang_name = "English"  # бо модель думає англійською
 
-    prompt = f"""
+    system_prompt = f"""
     You are an AI assistant that answers using web search results.
 
-    User question:
-    \"\"\"{user_text}\"\"\"
-
-    Web search results (may contain noise, but also the answer):
-    \"\"\"{web_context}\"\"\"
-
     Your task:
     - Look through the web results and EXTRACT concrete factual information relevant to the question.
     - If the question is about current weather, you MUST try to extract:
@@ -312,9 +1215,22 @@ def ask_ollama_with_web(user_text: str, user_lang: str | None) -> str:
     Give a single, concise paragraph with the extracted data.
     """
 
+    # інструкція — стабільний префікс, питання і результати — в кінці
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": (
+                f"User question:\n\"\"\"{user_text}\"\"\"\n\n"
+                "Web search results (may contain noise, but also the answer):\n"
+                f"\"\"\"{web_context}\"\"\""
+            ),
+        },
+    ]
+
     # 3. Викликаємо “сиру” генерацію через Ollama
     #    (у тебе вже є внутрішня функція _generate_ollama)
-    raw = _generate_ollama(prompt)
+    raw = _generate_ollama(messages)
 
     # 4. Розділяємо think / answer, як ти вже робиш в ask_ollama
     think, answer = _split_think_and_answer(raw)
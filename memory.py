@@ -0,0 +1,201 @@
+# memory.py
+"""
+Пам'ять розмови для промпту.
+
+- останні ходи — з deque у пам'яті процесу (БД пишеться фоновим записувачем,
+  тож свіжого ходу там ще може не бути); вони йдуть в /api/chat окремими
+  повідомленнями user/assistant;
+- плюс до MEMORY_RETRIEVED_TURNS старіших ходів, релевантних поточному запиту, —
+  з FTS5-індексу (db.search_turns, bm25), без сканування таблиці;
+- усе разом обмежено MEMORY_TOKEN_BUDGET (грубо: ~4 символи на токен).
+
+Модель працює англійською, тому в пам'ять ідуть англійські версії реплік
+(для uk-ходів — частина після "[EN]", як її зберігає save_turn).
+
+Вікно останніх ходів зсувається не на кожному ході, а стрибком раз на
+MEMORY_RECENT_TURNS ходів (показуємо від N до 2N-1 ходів), тож між ходами
+початок розмови не змінюється і Ollama перевикористовує KV-кеш префікса.
+Знайдені старі ходи змінюються щоразу — вони йдуть в останнє повідомлення.
+
+persistent=False — пам'ять лише в процесі (сесії server.py): без історії з БД
+і без пошуку по ній, ходи сесії в БД теж не пишуться (див. llm._finish_turn).
+"""
+
+import re
+import threading
+import time
+from collections import deque
+
+import config
+from db import search_turns
+
+_EN_MARKER = "\n\n[EN]\n"
+
+# слова, які нічого не дають пошуку (і роблять bm25 повільним на великій історії)
+_STOPWORDS = {
+    "the", "and", "for", "you", "are", "what", "how", "can", "tell", "about", "this", "that",
+    "with", "from", "have", "your", "please", "there", "which", "when", "where", "who", "why",
+    "does", "did", "was", "were", "will", "would", "could", "should", "some", "any", "me",
+    "як", "що", "це", "чи", "для", "мені", "про", "будь", "ласка", "який", "яка", "яке",
+}
+
+_CHARS_PER_TOKEN = 4
+
+
+def _english_part(text: str) -> str:
+    """'укр\\n\\n[EN]\\nengl' → 'engl' (або весь текст, якщо маркера немає)."""
+    text = text or ""
+    if _EN_MARKER in text:
+        return text.split(_EN_MARKER, 1)[1].strip()
+    return text.strip()
+
+
+def _tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * _CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+def _fmt(turn: tuple[str, str]) -> str:
+    user, reply = turn
+    return f"User: {user}\nAssistant: {reply}"
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        recent_turns: int | None = None,
+        retrieved_turns: int | None = None,
+        token_budget: int | None = None,
+        persistent: bool = True,
+    ):
+        self.recent_turns = recent_turns if recent_turns is not None else getattr(config, "MEMORY_RECENT_TURNS", 4)
+        self.retrieved_turns = (
+            retrieved_turns if retrieved_turns is not None else getattr(config, "MEMORY_RETRIEVED_TURNS", 3)
+        )
+        self.token_budget = token_budget or getattr(config, "MEMORY_TOKEN_BUDGET", 800)
+        self.turn_token_limit = getattr(config, "MEMORY_TURN_TOKENS", 200)
+        self.persistent = persistent
+
+        # 2N: для стабільного вікна chat_context()
+        self._recent: deque[tuple[str, str]] = deque(maxlen=max(1, 2 * self.recent_turns))
+        self._count = 0  # скільки ходів усього бачили (для стрибка вікна)
+        self._lock = threading.Lock()
+        self._seeded = not persistent
+
+    def remember(self, user_en: str, reply_en: str) -> None:
+        """Додає завершений хід (англійською) у короткочасну пам'ять."""
+        with self._lock:
+            self._recent.append((user_en.strip(), reply_en.strip()))
+            self._count += 1
+            self._seeded = True
+
+    def _seed_from_db(self) -> None:
+        """Після перезапуску: останні ходи беремо з БД (один раз)."""
+        with self._lock:
+            if self._seeded:
+                return
+            self._seeded = True
+        try:
+            rows = search_turns(limit=self._recent.maxlen)
+        except Exception as e:
+            print(f"⚠️ [memory] Не вдалося прочитати історію: {e}")
+            return
+        with self._lock:
+            if self._recent:
+                return  # поки читали, вже з'явився свіжий хід
+            # search_turns віддає найновіші першими, а deque — від старих до нових
+            for row in reversed(rows):
+                self._recent.append((_english_part(row["user_text"]), _english_part(row["assistant_reply"])))
+            self._count = len(self._recent)
+
+    def _query(self, text: str) -> str:
+        words = [w for w in re.findall(r"\w+", text.lower()) if len(w) > 2 and w not in _STOPWORDS]
+        # найдовші слова зазвичай найінформативніші; обмежуємо кількість для швидкості
+        return " ".join(sorted(dict.fromkeys(words), key=len, reverse=True)[:8])
+
+    def _retrieve(self, query_text: str, exclude: set[str]) -> list[tuple[str, str]]:
+        query = self._query(query_text)
+        if not query or self.retrieved_turns <= 0 or not self.persistent:
+            return []
+        try:
+            rows = search_turns(query, any_word=True, limit=self.retrieved_turns + len(exclude))
+        except Exception as e:
+            print(f"⚠️ [memory] Пошук в історії не вдався: {e}")
+            return []
+
+        turns = []
+        for row in rows:
+            user_en = _english_part(row["user_text"])
+            if user_en in exclude:
+                continue
+            turns.append((user_en, _english_part(row["assistant_reply"])))
+            if len(turns) >= self.retrieved_turns:
+                break
+        return turns
+
+    def _stable_window(self) -> list[tuple[str, str]]:
+        """Останні ходи, початок яких зсувається раз на recent_turns ходів (від N до 2N-1 ходів)."""
+        n = self.recent_turns
+        with self._lock:
+            turns = list(self._recent)
+            count = self._count
+        if count < n:
+            return turns
+        start = (count - n) // n * n  # номер першого показаного ходу
+        return turns[max(0, len(turns) - (count - start)):]
+
+    def chat_context(self, query_text: str) -> tuple[list[tuple[str, str]], str]:
+        """
+        Для /api/chat: (останні ходи як пари user/assistant — стабільне вікно,
+        блок знайдених старих ходів для останнього повідомлення або "").
+        """
+        if self.recent_turns <= 0 and self.retrieved_turns <= 0:
+            return [], ""
+
+        t0 = time.perf_counter()
+        self._seed_from_db()
+        recent = self._stable_window() if self.recent_turns > 0 else []
+        retrieved = self._retrieve(query_text, exclude={u for u, _ in recent})
+
+        budget = self.token_budget
+        limit = self.turn_token_limit
+        recent = [(_clip(u, limit), _clip(r, limit)) for u, r in recent]
+        retrieved = [(_clip(u, limit), _clip(r, limit)) for u, r in retrieved]
+
+        # спершу найсвіжіші ходи (від кінця), потім релевантні старі — поки вміщаються в бюджет
+        kept_recent: list[tuple[str, str]] = []
+        for turn in reversed(recent):
+            cost = _tokens(_fmt(turn))
+            if cost > budget:
+                break
+            kept_recent.insert(0, turn)
+            budget -= cost
+
+        kept_retrieved: list[tuple[str, str]] = []
+        for turn in retrieved:
+            cost = _tokens(_fmt(turn))
+            if cost > budget:
+                break
+            kept_retrieved.append(turn)
+            budget -= cost
+
+        block = ""
+        if kept_retrieved:
+            block = "Relevant earlier conversation:\n" + "\n\n".join(_fmt(t) for t in kept_retrieved)
+
+        if kept_recent or kept_retrieved:
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            print(f"[memory] {len(kept_recent)} останніх + {len(kept_retrieved)} знайдених ходів "
+                  f"(~{self.token_budget - budget} токенів, {elapsed_ms:.1f} мс)")
+        return kept_recent, block
+
+
+_memory = ConversationMemory()
+
+
+def get_memory() -> ConversationMemory:
+    return _memory
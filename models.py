@@ -0,0 +1,161 @@
+# models.py
+"""
+Реєстр важких моделей з лінивими проксі.
+
+- register(name, loader) повертає LazyModel: модуль (stt, translate, ...) тримає
+  його як звичайну глобальну змінну, але сама модель ще не завантажена;
+- load_all() запускає всі завантажувачі паралельно на пулі потоків —
+  hotkey-цикл стартує одразу, не чекаючи Whisper/Marian;
+- перше звернення до атрибута (whisper_model.transcribe(...)) чекає лише
+  на свою модель, і лише якщо вона ще не готова;
+- startup_phase()/startup_report() — час імпорту і завантаження по компонентах
+  (python assistant.py --profile-startup).
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable
+
+import config
+
+
+class LazyModel:
+    """
+    Проксі до моделі, яка вантажиться у фоні. Атрибути проксюються на
+    справжній об'єкт (з очікуванням завантаження за потреби).
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self._name = name
+        self._loader = loader
+        self._future: Future | None = None
+        self._lock = threading.Lock()
+        self.load_seconds: float | None = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def _load(self) -> Any:
+        print(f"[models] Завантажую {self._name}...")
+        t0 = time.perf_counter()
+        try:
+            return self._loader()
+        finally:
+            self.load_seconds = time.perf_counter() - t0
+            print(f"[models] {self._name}: {self.load_seconds:.2f} с")
+
+    def start(self, executor: ThreadPoolExecutor | None = None) -> Future:
+        """Запускає завантаження (на executor або в окремому потоці), якщо ще не запущено."""
+        with self._lock:
+            if self._future is None:
+                if executor is not None:
+                    self._future = executor.submit(self._load)
+                else:
+                    self._future = Future()
+                    threading.Thread(target=self._run_into, args=(self._future,), name=f"load-{self._name}",
+                                     daemon=True).start()
+            return self._future
+
+    def _run_into(self, future: Future) -> None:
+        try:
+            future.set_result(self._load())
+        except BaseException as e:
+            future.set_exception(e)
+
+    @property
+    def ready(self) -> bool:
+        return self._future is not None and self._future.done()
+
+    def get(self) -> Any:
+        """Справжній об'єкт моделі (чекає, якщо ще вантажиться)."""
+        future = self.start()
+        if not future.done():
+            print(f"[models] Чекаю на {self._name}...")
+        return future.result()
+
+    def __getattr__(self, attr: str) -> Any:
+        # викликається лише для атрибутів, яких немає в самого проксі
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.get()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "ready" if self.ready else ("loading" if self._future else "not loaded")
+        return f"<LazyModel {self._name} ({state})>"
+
+
+_registry: dict[str, LazyModel] = {}
+_registry_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+
+# (компонент, секунди) — імпорти, зафіксовані через startup_phase()
+_phases: list[tuple[str, float]] = []
+
+
+def register(name: str, loader: Callable[[], Any]) -> LazyModel:
+    """Реєструє модель під іменем (повторна реєстрація повертає вже існуючий проксі)."""
+    with _registry_lock:
+        model = _registry.get(name)
+        if model is None:
+            model = _registry[name] = LazyModel(name, loader)
+        return model
+
+
+def get_model(name: str) -> LazyModel:
+    return _registry[name]
+
+
+def load_all(names: list[str] | None = None, max_workers: int | None = None) -> dict[str, Future]:
+    """Запускає паралельне завантаження (усіх або вибраних) моделей, не чекаючи на них."""
+    global _executor
+    with _registry_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers or getattr(config, "MODELS_LOAD_WORKERS", 4),
+                thread_name_prefix="model-load",
+            )
+        models = [_registry[n] for n in names] if names else list(_registry.values())
+    return {m.name: m.start(_executor) for m in models}
+
+
+def wait_all(timeout: float | None = None) -> bool:
+    """Чекає на всі запущені завантаження. True — усе завантажено без помилок."""
+    ok = True
+    for model in list(_registry.values()):
+        future = model.start(_executor)
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ [models] {model.name} не завантажилась: {e}")
+            ok = False
+    return ok
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Міряє час блоку (наприклад, імпорту модуля) для startup_report()."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - t0))
+
+
+def startup_report() -> str:
+    """Таблиця: час імпорту по компонентах + час завантаження кожної моделі."""
+    lines = [f"{'компонент':<24} {'секунд':>8}", "-" * 33]
+    for name, seconds in _phases:
+        lines.append(f"{name:<24} {seconds:>8.2f}")
+    for model in _registry.values():
+        if model.load_seconds is None:
+            status = "завантажується" if model._future else "не завантажено"
+            lines.append(f"{'load ' + model.name:<24} {status:>8}")
+        else:
+            lines.append(f"{'load ' + model.name:<24} {model.load_seconds:>8.2f}")
+    return "\n".join(lines)
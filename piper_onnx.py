@@ -0,0 +1,140 @@
+# piper_onnx.py
+"""
+Piper без зовнішнього piper.exe: модель голосу (.onnx з MODELS_DIR) вантажиться
+напряму в onnxruntime, фонемізація — в процесі через piper_phonemize (espeak-ng).
+
+- працює і на Linux, і на Windows (pip install onnxruntime piper-phonemize);
+- кількість потоків ORT задається явно (TTS_ONNX_INTRA_THREADS / TTS_ONNX_INTER_THREADS),
+  щоб TTS не забирав усі ядра у Whisper та Ollama;
+- synthesize_stream() віддає аудіо по фонемних реченнях, щойно кожне готове.
+
+Інтерфейс такий самий, як у PiperWorker (model_path, name, sample_rate, synthesize).
+"""
+
+import json
+import os
+from typing import Iterator
+
+import numpy as np
+
+import config
+
+# спецсимволи Piper: початок, кінець, розділювач фонем
+_BOS = "^"
+_EOS = "$"
+_PAD = "_"
+
+
+class OnnxVoice:
+    def __init__(
+        self,
+        model_path: str,
+        intra_threads: int | None = None,
+        inter_threads: int | None = None,
+    ):
+        import onnxruntime as ort
+        from piper_phonemize import phonemize_espeak
+
+        self._phonemize_espeak = phonemize_espeak
+        self.model_path = model_path
+
+        with open(model_path + ".json", encoding="utf-8") as f:
+            voice_config = json.load(f)
+
+        self.sample_rate = int(voice_config["audio"]["sample_rate"])
+        self.espeak_voice = voice_config.get("espeak", {}).get("voice", "en-us")
+        self.phoneme_id_map: dict[str, list[int]] = voice_config["phoneme_id_map"]
+        self.num_speakers = int(voice_config.get("num_speakers", 1))
+
+        inference = voice_config.get("inference", {})
+        self.noise_scale = float(inference.get("noise_scale", 0.667))
+        self.length_scale = float(inference.get("length_scale", 1.0))
+        self.noise_w = float(inference.get("noise_w", 0.8))
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_threads or getattr(config, "TTS_ONNX_INTRA_THREADS", 2)
+        options.inter_op_num_threads = inter_threads or getattr(config, "TTS_ONNX_INTER_THREADS", 1)
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        print(
+            f"[TTS] Завантажую ONNX-голос {os.path.basename(model_path)} "
+            f"(intra={options.intra_op_num_threads}, inter={options.inter_op_num_threads})"
+        )
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.model_path)
+
+    def phoneme_ids(self, phonemes: list[str]) -> list[int]:
+        """Фонеми → id для моделі: ^ p1 _ p2 _ ... $ (як у piper)."""
+        id_map = self.phoneme_id_map
+        ids = list(id_map[_BOS])
+        for phoneme in phonemes:
+            if phoneme not in id_map:
+                continue  # невідома фонема — пропускаємо, як і piper
+            ids.extend(id_map[phoneme])
+            ids.extend(id_map[_PAD])
+        ids.extend(id_map[_EOS])
+        return ids
+
+    def _infer(self, ids: list[int]) -> np.ndarray:
+        inputs = {
+            "input": np.array([ids], dtype=np.int64),
+            "input_lengths": np.array([len(ids)], dtype=np.int64),
+            "scales": np.array([self.noise_scale, self.length_scale, self.noise_w], dtype=np.float32),
+        }
+        if self.num_speakers > 1:
+            inputs["sid"] = np.array([0], dtype=np.int64)
+
+        audio = self.session.run(None, inputs)[0].squeeze()
+        # нормалізація float → int16 (як audio_float_to_int16 у piper)
+        peak = max(0.01, float(np.max(np.abs(audio)))) if audio.size else 1.0
+        return np.clip(audio * (32767.0 / peak), -32768, 32767).astype(np.int16)
+
+    def synthesize_stream(self, text: str) -> Iterator[np.ndarray]:
+        """Віддає int16 PCM по реченнях (так, як їх ділить espeak), щойно кожне синтезоване."""
+        text = " ".join((text or "").split())
+        if not text:
+            return
+        for phonemes in self._phonemize_espeak(text, self.espeak_voice):
+            if phonemes:
+                yield self._infer(self.phoneme_ids(phonemes))
+
+    def synthesize(self, text: str) -> np.ndarray:
+        chunks = list(self.synthesize_stream(text))
+        if not chunks:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(chunks)
+
+    def start(self) -> None:
+        """Сесія вже завантажена в __init__ — окремий процес не потрібен."""
+
+    def stop(self) -> None:
+        pass
+
+    def is_alive(self) -> bool:
+        return True
+
+    def health_check(self) -> bool:
+        try:
+            self.synthesize(".")
+            return True
+        except Exception as e:
+            print(f"⚠️ ONNX-голос {self.name} не пройшов перевірку: {e}")
+            return False
+
+
+def onnx_available() -> bool:
+    """Чи встановлені onnxruntime і piper_phonemize."""
+    try:
+        import onnxruntime  # noqa: F401
+        import piper_phonemize  # noqa: F401
+    except ImportError:
+        return False
+    return True
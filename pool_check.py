@@ -0,0 +1,110 @@
+# pool_check.py
+"""
+Самоперевірка пулу з'єднань до Ollama на фейковому сервері (fake_ollama.py).
+
+- sync: router-виклик + потокова генерація основною моделлю мають піти
+  одним TCP-з'єднанням спільного httpx.Client (keep-alive);
+- async: два asyncio.run() поспіль — у кожному event loop свій AsyncClient,
+  всередині loop-а запити ділять одне з'єднання, другий run не падає
+  на клієнті, прив'язаному до вже закритого loop-а.
+
+Запуск (справжня Ollama не потрібна, порт вибирається вільний):
+    python pool_check.py
+Код виходу 0 — усе гаразд, 1 — якась перевірка не пройшла.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import config
+from fake_ollama import FakeOllamaServer
+
+_MESSAGES = [{"role": "user", "content": "Say hello."}]
+
+
+def _check(failures: list[str], name: str, ok: bool, detail: str) -> None:
+    print(f"[pool] {'✅' if ok else '❌'} {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+
+def check_sync(server: FakeOllamaServer, llm, failures: list[str]) -> None:
+    before = server.stats()
+    verdict = llm._classify_with_llm("What is the weather in Kyiv right now?", "en")
+    answer = "".join(llm._stream_ollama(_MESSAGES))
+    after = server.stats()
+
+    _check(failures, "sync router", verdict == (False, ""), f"вердикт {verdict!r}")
+    _check(failures, "sync stream", bool(answer.strip()), f"{len(answer)} символів")
+    connections = after["connections"] - before["connections"]
+    requests = after["requests"] - before["requests"]
+    _check(failures, "sync keep-alive", connections == 1 and requests == 2,
+           f"{requests} запити, {connections} з'єднань (очікую 2 і 1)")
+
+
+async def _async_turn(llm) -> tuple[str, object]:
+    client = llm.get_async_client()
+    reply = await llm._generate_ollama_async(_MESSAGES, model=llm.ROUTER_MODEL)
+    parts = [chunk async for chunk in llm._stream_ollama_async(_MESSAGES)]
+    same = llm.get_async_client() is client
+    await llm.aclose_async_client()
+    return (reply + "".join(parts) if same else ""), client
+
+
+def check_async(server: FakeOllamaServer, llm, failures: list[str]) -> None:
+    clients = []
+    for run in (1, 2):
+        before = server.stats()
+        try:
+            answer, client = asyncio.run(_async_turn(llm))
+        except Exception as e:
+            _check(failures, f"async run {run}", False, f"{type(e).__name__}: {e}")
+            continue
+        clients.append(client)
+        after = server.stats()
+        connections = after["connections"] - before["connections"]
+        requests = after["requests"] - before["requests"]
+        _check(failures, f"async run {run}", bool(answer.strip()) and connections == 1 and requests == 2,
+               f"{requests} запити, {connections} з'єднань (очікую 2 і 1)")
+        _check(failures, f"async aclose {run}", client.is_closed, "клієнт закрито разом зі своїм loop-ом")
+    _check(failures, "async per-loop", len(clients) == 2 and clients[0] is not clients[1],
+           "кожен asyncio.run() отримує власний AsyncClient")
+    _check(failures, "async cleanup", not llm._async_clients,
+           f"лишилось клієнтів: {len(llm._async_clients)}")
+
+
+def main() -> int:
+    router_model = getattr(config, "OLLAMA_ROUTER_MODEL", config.OLLAMA_MODEL)
+    server = FakeOllamaServer(
+        reply="Hello from the pool check. Second sentence.",
+        replies={router_model: '{"need_web": false, "search_query": ""}'},
+    ).start()
+
+    # усе налаштовуємо ДО імпорту llm — він читає config при імпорті
+    tmp_dir = tempfile.mkdtemp(prefix="assistant-pool-")
+    config.OLLAMA_BASE_URL = server.base_url
+    config.OLLAMA_PRELOAD = False
+    config.DB_PATH = os.path.join(tmp_dir, "pool.sqlite3")
+    config.TRACE_PATH = os.path.join(tmp_dir, "traces.jsonl")
+
+    import llm
+
+    failures: list[str] = []
+    try:
+        check_sync(server, llm, failures)
+        check_async(server, llm, failures)
+    finally:
+        llm.close_clients()
+        server.stop()
+
+    if failures:
+        print(f"[pool] Не пройшло: {', '.join(failures)}")
+        return 1
+    print("[pool] Усі перевірки пройшли.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
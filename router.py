@@ -0,0 +1,242 @@
+# router.py
+"""
+Багаторівневий router "чи потрібен веб-пошук":
+
+1) heuristic — регулярки + легкий лексичний класифікатор (ваги слів / основ), мікросекунди;
+2) cache     — LRU+TTL кеш вердиктів LLM, ключ — нормалізоване питання;
+3) llm       — router-модель (OLLAMA_ROUTER_MODEL), тільки якщо перші два не впевнені.
+
+Кожне рішення логується з назвою рівня, плюс накопичена статистика:
+частка fast-path рішень і скільки часу router-моделі зекономлено.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import config
+
+# вердикт router-а: (need_web, search_query)
+Verdict = tuple[bool, str]
+
+_PUNCT_RE = re.compile(r"[^\w\s+\-*/×÷^=%.,]", re.UNICODE)
+_SPACES_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# "what is 2+2", "скільки буде 15 * 3", "(7 - 2) / 5"
+_MATH_PREFIX_RE = re.compile(
+    r"^(what\s+is|what's|how\s+much\s+is|calculate|compute|solve|"
+    r"скільки\s+буде|скільки|чому\s+дорівнює|порахуй|обчисли)\s+"
+)
+_MATH_BODY_RE = re.compile(r"^[\d\s.,+\-*/×÷^()=x%]+$")
+_MATH_OP_RE = re.compile(r"[+\-*/×÷^=%x]")
+
+# коротка ввічливість / small talk — веб ніколи не потрібен
+_SMALL_TALK_RE = re.compile(
+    r"^(hi|hello|hey|thanks|thank you|good (morning|evening|night)|bye|"
+    r"привіт|вітаю|дякую|добрий (день|ранок|вечір)|бувай|на все добре)\b"
+)
+
+# Лексикон: точні слова і основи (укр. слова змінюються за відмінками → префікси).
+# Додатна вага — "тягне" до веб-пошуку, відʼємна — від нього.
+_EXACT_WEIGHTS: dict[str, float] = {
+    # en → web
+    "weather": 3.0, "forecast": 3.0, "temperature": 1.5, "news": 3.0, "headlines": 2.5,
+    "price": 2.5, "prices": 2.5, "cost": 1.0, "stock": 2.0, "stocks": 2.0,
+    "exchange": 1.5, "rate": 1.0, "bitcoin": 2.5, "crypto": 2.0, "score": 2.0,
+    "match": 1.0, "schedule": 2.0, "timetable": 2.5, "flight": 2.0, "flights": 2.0,
+    "today": 2.0, "tonight": 2.0, "tomorrow": 1.5, "yesterday": 1.5, "now": 1.0,
+    "currently": 1.5, "current": 1.5, "latest": 2.5, "recent": 2.0, "election": 2.5,
+    "war": 1.5, "released": 1.5, "open": 0.5,
+    # en → no web
+    "code": -2.5, "python": -3.0, "javascript": -3.0, "function": -2.0, "program": -2.0,
+    "bug": -2.0, "script": -2.0, "sql": -2.5, "explain": -1.5, "define": -1.5,
+    "meaning": -1.5, "why": -1.0, "joke": -3.0, "story": -2.5, "poem": -3.0,
+    "translate": -3.0, "calculate": -3.0, "math": -3.0, "equation": -3.0,
+    "plus": -2.0, "minus": -2.0, "divided": -2.0, "multiplied": -2.0,
+    "hello": -3.0, "hi": -3.0, "thanks": -3.0, "recipe": -1.0, "advice": -1.5,
+    # uk (короткі незмінні слова)
+    "курс": 2.0, "зараз": 1.0, "нині": 1.5, "сьогодні": 2.0, "завтра": 1.5,
+    "вчора": 1.5, "код": -2.5, "чому": -1.0, "плюс": -2.0, "мінус": -2.0,
+    "привіт": -3.0, "дякую": -3.0,
+}
+
+_PREFIX_WEIGHTS: list[tuple[str, float]] = [
+    # uk → web
+    ("погод", 3.0), ("прогноз", 3.0), ("температур", 1.5), ("новин", 3.0),
+    ("цін", 2.5), ("вартіст", 2.0), ("долар", 1.5), ("євро", 1.5), ("біткоїн", 2.5),
+    ("матч", 1.5), ("розклад", 2.5), ("рейс", 2.0), ("останн", 2.0), ("поточн", 1.5),
+    ("вибор", 2.5), ("війн", 1.5),
+    # uk → no web
+    ("пайтон", -3.0), ("функці", -2.0), ("програм", -2.0), ("помилк", -1.5),
+    ("поясн", -2.0), ("значенн", -1.5), ("жарт", -3.0), ("анекдот", -3.0),
+    ("вірш", -3.0), ("казк", -3.0), ("переклад", -3.0), ("переклади", -3.0),
+    ("порахуй", -3.0), ("обчисл", -3.0), ("рівнян", -3.0), ("помнож", -2.0),
+    ("поділ", -2.0), ("рецепт", -1.0), ("порад", -1.5),
+]
+
+# |score| від цього значення — класифікатор "впевнений"
+_LEXICAL_MARGIN = 2.5
+
+
+def normalize_question(text: str) -> str:
+    """Нижній регістр, без зайвої пунктуації й пробілів — ключ для кешу."""
+    text = (text or "").lower().strip()
+    text = _PUNCT_RE.sub(" ", text)
+    text = _SPACES_RE.sub(" ", text).strip(" .,")
+    return text
+
+
+def _is_math(norm: str) -> bool:
+    body = _MATH_PREFIX_RE.sub("", norm).rstrip("?").strip()
+    return bool(body) and bool(_MATH_BODY_RE.match(body)) \
+        and any(ch.isdigit() for ch in body) and bool(_MATH_OP_RE.search(body))
+
+
+def lexical_score(norm: str) -> float:
+    """Сума ваг слів питання (точні слова + основи)."""
+    score = 0.0
+    for word in _WORD_RE.findall(norm):
+        weight = _EXACT_WEIGHTS.get(word)
+        if weight is None:
+            for stem, w in _PREFIX_WEIGHTS:
+                if word.startswith(stem):
+                    weight = w
+                    break
+        if weight is not None:
+            score += weight
+    return score
+
+
+def heuristic_verdict(user_text: str) -> Verdict | None:
+    """
+    Дешевий рівень: регулярки + лексичний класифікатор.
+    Повертає вердикт або None, якщо не впевнений.
+    """
+    norm = normalize_question(user_text)
+    if not norm:
+        return False, ""
+
+    if _is_math(norm):
+        return False, ""
+
+    if _SMALL_TALK_RE.match(norm) and len(norm.split()) <= 4:
+        return False, ""
+
+    score = lexical_score(norm)
+    if score >= _LEXICAL_MARGIN:
+        # для веб-пошуку беремо сам текст користувача
+        return True, user_text.strip()
+    if score <= -_LEXICAL_MARGIN:
+        return False, ""
+
+    return None
+
+
+class VerdictCache:
+    """Потокобезпечний LRU-кеш із TTL для вердиктів router-а."""
+
+    def __init__(self, max_size: int = 512, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Verdict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Verdict | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, verdict = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return verdict
+
+    def put(self, key: str, verdict: Verdict) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, verdict)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class LayeredRouter:
+    """
+    heuristic → cache → llm.
+    llm_classify(user_text, user_lang) повертає вердикт або None (не вдалося розпарсити).
+    """
+
+    def __init__(
+        self,
+        llm_classify: Callable[[str, str | None], Verdict | None],
+        cache: VerdictCache | None = None,
+    ):
+        self.llm_classify = llm_classify
+        self.cache = cache or VerdictCache(
+            max_size=getattr(config, "ROUTER_CACHE_SIZE", 512),
+            ttl=getattr(config, "ROUTER_CACHE_TTL", 600.0),
+        )
+        self._lock = threading.Lock()
+        self.counts = {"heuristic": 0, "cache": 0, "llm": 0}
+        self.llm_seconds = 0.0
+
+    def route(self, user_text: str, user_lang: str | None) -> Verdict:
+        t0 = time.perf_counter()
+
+        verdict = heuristic_verdict(user_text)
+        layer = "heuristic"
+
+        if verdict is None:
+            key = normalize_question(user_text)
+            verdict = self.cache.get(key)
+            layer = "cache"
+
+            if verdict is None:
+                layer = "llm"
+                verdict = self.llm_classify(user_text, user_lang)
+                if verdict is None:
+                    # модель не повернула JSON — просто не робимо веб і не кешуємо
+                    verdict = (False, "")
+                else:
+                    self.cache.put(key, verdict)
+
+        elapsed = time.perf_counter() - t0
+        self._record(layer, elapsed)
+        self._log(layer, verdict, elapsed)
+        return verdict
+
+    def _record(self, layer: str, elapsed: float) -> None:
+        with self._lock:
+            self.counts[layer] += 1
+            if layer == "llm":
+                self.llm_seconds += elapsed
+
+    def stats(self) -> dict:
+        """Частка fast-path рішень і оцінка зекономленого часу router-моделі."""
+        with self._lock:
+            total = sum(self.counts.values())
+            fast = self.counts["heuristic"] + self.counts["cache"]
+            llm_calls = self.counts["llm"]
+            avg_llm = self.llm_seconds / llm_calls if llm_calls else 0.0
+            return {
+                **self.counts,
+                "total": total,
+                "fast_path_rate": fast / total if total else 0.0,
+                "avg_llm_seconds": avg_llm,
+                "saved_seconds": fast * avg_llm,
+            }
+
+    def _log(self, layer: str, verdict: Verdict, elapsed: float) -> None:
+        st = self.stats()
+        print(
+            f"[router] {layer}: need_web={verdict[0]} за {elapsed * 1000:.1f} мс | "
+            f"fast-path {st['total'] - st['llm']}/{st['total']} ({st['fast_path_rate']:.0%}), "
+            f"зекономлено ≈ {st['saved_seconds']:.2f} с"
+        )
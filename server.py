@@ -0,0 +1,609 @@
+# server.py
+"""
+Локальний API голосового конвеєра для кількох клієнтів одночасно.
+
+Моделі (Whisper, переклад, голоси Piper, Ollama) вантажаться один раз на процес
+(models.load_all) і спільні для всіх сесій; у кожної сесії — свій аудіобуфер,
+своя мова і своя пам'ять розмови (ConversationMemory без БД).
+
+- CPU-важкі етапи йдуть через обмежені пули: розпізнавання (SERVER_STT_WORKERS,
+  Whisper з num_workers) і синтез (SERVER_TTS_WORKERS);
+- admission control: одночасно обробляється SERVER_MAX_ACTIVE_TURNS ходів,
+  до SERVER_MAX_QUEUED_TURNS чекають; решта одразу отримує 503 + Retry-After,
+  а не росте черга і затримка для всіх;
+- відповідь ходу — NDJSON-стрім (як у Ollama): текст по реченнях і PCM по мірі
+  готовності; повільний клієнт гальмує лише свій хід (TCP backpressure);
+  якщо клієнт відключився — хід скасовується (CancelToken).
+
+Протокол (HTTP/1.1, JSON):
+    POST   /v1/sessions                 {"lang": "uk"}? → {"session_id": ...}
+    POST   /v1/sessions/<id>/audio      тіло — PCM моно SAMPLE_RATE: int16 LE (за замовчуванням)
+                                        або float32 (?format=f32) → {"buffered_seconds": ...}
+    POST   /v1/sessions/<id>/turn       {"text"?, "lang"?, "tts"?: true} → NDJSON-події:
+           {"type": "transcript", "text", "lang"}   — що розпізнано (якщо не передали text)
+           {"type": "sentence", "text"}             — чергове речення відповіді
+           {"type": "audio", "sample_rate", "pcm"}  — int16 PCM речення, base64
+           {"type": "done", "reply", "timings_ms"}  / {"type": "error", "error"}
+    DELETE /v1/sessions/<id>            — скасовує хід і закриває сесію
+    POST   /v1/translate                {"text", "src", "dst"} → {"text"}
+    GET    /v1/health                   — сесії, черга, відмови
+
+Запуск:
+    python server.py --port 8765
+"""
+
+import argparse
+import base64
+import json
+import select
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import config
+from llm import CancelToken, ask_ollama_smart_stream, pipeline_stats, preload_models
+from memory import ConversationMemory
+from models import load_all, register, wait_all
+from stt import normalize_lang, transcribe_audio
+from translate import translate
+
+_MAX_BODY_BYTES = 8 * 1024 * 1024
+
+
+class ClientGone(Exception):
+    """Клієнт закрив з'єднання посеред ходу — хід скасовано."""
+
+
+class Overloaded(Exception):
+    """Черга ходів переповнена — клієнту 503 + Retry-After."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"сервер перевантажений, спробуй через {retry_after:.0f} с")
+        self.retry_after = retry_after
+
+
+class Admission:
+    """
+    Скільки ходів обробляється одночасно (max_active) і скільки може чекати (max_queued).
+    Понад це — Overloaded одразу; хто чекає довше за timeout — теж Overloaded.
+    """
+
+    def __init__(self, max_active: int, max_queued: int, timeout: float):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_active)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._turn_seconds = 5.0  # ковзне середнє тривалості ходу — для Retry-After
+
+    def retry_after(self) -> float:
+        with self._lock:
+            waves = (self.queued + self.active) / self.max_active
+            return max(1.0, round(waves * self._turn_seconds))
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            if self.queued >= self.max_queued and self.active >= self.max_active:
+                self.rejected += 1
+                reject = True
+            else:
+                self.queued += 1
+                reject = False
+        if reject:
+            raise Overloaded(self.retry_after())
+
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._lock:
+            self.queued -= 1
+            if acquired:
+                self.active += 1
+                self.admitted += 1
+            else:
+                self.rejected += 1
+        if not acquired:
+            raise Overloaded(self.retry_after())
+
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.active -= 1
+                self._turn_seconds = 0.8 * self._turn_seconds + 0.2 * elapsed
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_turns": self.active,
+                "queued_turns": self.queued,
+                "max_active_turns": self.max_active,
+                "max_queued_turns": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+class Session:
+    """Стан одного клієнта: буфер аудіо, мова, пам'ять розмови, поточний хід."""
+
+    def __init__(self, lang: str | None = None):
+        self.id = uuid.uuid4().hex
+        self.lang = (lang or "").lower() or None
+        self.memory = ConversationMemory(persistent=False)
+        self.last_used = time.monotonic()
+        self.max_samples = int(config.SAMPLE_RATE * getattr(config, "MAX_RECORD_SECONDS", 20))
+
+        self._chunks: list[np.ndarray] = []
+        self._samples = 0
+        self._lock = threading.Lock()
+        self.turn_cancel: CancelToken | None = None
+
+    @property
+    def busy(self) -> bool:
+        return self.turn_cancel is not None
+
+    def append_audio(self, pcm: np.ndarray) -> float:
+        """Додає шматок аудіо. BufferError — якщо фраза довша за MAX_RECORD_SECONDS."""
+        with self._lock:
+            if self._samples + pcm.size > self.max_samples:
+                raise BufferError(f"аудіо довше за {self.max_samples / config.SAMPLE_RATE:.0f} с")
+            self._chunks.append(pcm)
+            self._samples += pcm.size
+            return self._samples / config.SAMPLE_RATE
+
+    def take_audio(self) -> np.ndarray:
+        with self._lock:
+            chunks, self._chunks, self._samples = self._chunks, [], 0
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype="float32")
+
+    def begin_turn(self) -> CancelToken | None:
+        """Новий хід (None — у сесії вже йде хід)."""
+        with self._lock:
+            if self.turn_cancel is not None:
+                return None
+            self.turn_cancel = CancelToken()
+            return self.turn_cancel
+
+    def end_turn(self) -> None:
+        with self._lock:
+            self.turn_cancel = None
+        self.last_used = time.monotonic()
+
+    def cancel(self) -> None:
+        token = self.turn_cancel
+        if token is not None:
+            token.cancel()
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def _reap(self) -> None:
+        """Закриває сесії без активності довше за ttl (під self._lock)."""
+        now = time.monotonic()
+        for sid, session in list(self._sessions.items()):
+            if not session.busy and now - session.last_used > self.ttl:
+                del self._sessions[sid]
+
+    def create(self, lang: str | None = None) -> Session | None:
+        with self._lock:
+            self._reap()
+            if len(self._sessions) >= self.max_sessions:
+                return None
+            session = Session(lang)
+            self._sessions[session.id] = session
+            return session
+
+    def get(self, sid: str) -> Session | None:
+        with self._lock:
+            session = self._sessions.get(sid)
+        if session is not None:
+            session.last_used = time.monotonic()
+        return session
+
+    def delete(self, sid: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+        if session is None:
+            return False
+        session.cancel()
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+def _synthesize(lang: str, sentence: str) -> tuple[int, np.ndarray]:
+    """Речення → (sample_rate, int16 PCM) голосом Piper (з кешем фраз)."""
+    from tts import get_voice, synthesize_chunks
+
+    voice = get_voice(lang)
+    chunks = [pcm for pcm in synthesize_chunks(voice, sentence) if pcm.size]
+    pcm = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+    return voice.sample_rate, pcm
+
+
+class VoiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int):
+        super().__init__((host, port), _Handler)
+        self.sessions = SessionStore(
+            max_sessions=getattr(config, "SERVER_MAX_SESSIONS", 32),
+            ttl=getattr(config, "SERVER_SESSION_TTL", 900),
+        )
+        self.admission = Admission(
+            max_active=getattr(config, "SERVER_MAX_ACTIVE_TURNS", 4),
+            max_queued=getattr(config, "SERVER_MAX_QUEUED_TURNS", 8),
+            timeout=getattr(config, "SERVER_QUEUE_TIMEOUT", 10.0),
+        )
+        self.stt_pool = ThreadPoolExecutor(getattr(config, "SERVER_STT_WORKERS", 2), thread_name_prefix="srv-stt")
+        self.tts_pool = ThreadPoolExecutor(getattr(config, "SERVER_TTS_WORKERS", 2), thread_name_prefix="srv-tts")
+
+    def stats(self) -> dict:
+        return {"sessions": len(self.sessions), **self.admission.stats(), **pipeline_stats()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: VoiceServer
+
+    def log_message(self, format, *args):  # тихо
+        pass
+
+    # ---------- відповіді ----------
+
+    def _send_json(self, data: dict, status: int = 200, headers: dict | None = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, headers: dict | None = None) -> None:
+        self._send_json({"error": message}, status=status, headers=headers)
+
+    def _start_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_event(self, data: dict, cancel: CancelToken | None = None) -> None:
+        line = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+        except OSError as e:
+            if cancel is not None:
+                cancel.cancel()
+            raise ClientGone(str(e)) from e
+
+    @contextmanager
+    def _watch_client(self, cancel: CancelToken):
+        """
+        Поки йде хід, стежимо за сокетом: клієнт нічого не шле, тож "можна читати"
+        і порожній peek означає, що він закрив з'єднання, — скасовуємо хід одразу,
+        а не коли наступний запис у сокет впаде.
+        """
+        done = threading.Event()
+
+        def _watch():
+            while not done.is_set() and not cancel.cancelled:
+                try:
+                    readable, _, _ = select.select([self.connection], [], [], 0.25)
+                    if not readable:
+                        continue
+                    if not self.connection.recv(1, socket.MSG_PEEK):
+                        cancel.cancel()
+                    return  # або пішов, або вже шле наступний запит — стежити нема чого
+                except (OSError, ValueError):
+                    cancel.cancel()
+                    return
+
+        watcher = threading.Thread(target=_watch, name="srv-watch", daemon=True)
+        watcher.start()
+        try:
+            yield
+        finally:
+            done.set()
+            watcher.join()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    # ---------- запити ----------
+
+    def _read_body(self) -> bytes | None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > _MAX_BODY_BYTES:
+            self._error(413, "занадто велике тіло запиту")
+            self.close_connection = True
+            return None
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self) -> dict | None:
+        body = self._read_body()
+        if body is None:
+            return None
+        try:
+            data = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            self._error(400, "тіло має бути JSON")
+            return None
+        if not isinstance(data, dict):
+            self._error(400, "тіло має бути JSON-об'єктом")
+            return None
+        return data
+
+    def _route(self) -> tuple[list[str], dict]:
+        url = urlsplit(self.path)
+        return [p for p in url.path.split("/") if p], parse_qs(url.query)
+
+    def do_GET(self):
+        parts, _ = self._route()
+        if parts == ["v1", "health"]:
+            self._send_json(self.server.stats())
+            return
+        self._error(404, "not found")
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) == 3 and parts[:2] == ["v1", "sessions"]:
+            if self.server.sessions.delete(parts[2]):
+                self._send_json({"deleted": parts[2]})
+            else:
+                self._error(404, "немає такої сесії")
+            return
+        self._error(404, "not found")
+
+    def do_POST(self):
+        parts, query = self._route()
+
+        if parts == ["v1", "sessions"]:
+            data = self._read_json()
+            if data is None:
+                return
+            session = self.server.sessions.create(data.get("lang"))
+            if session is None:
+                self._error(503, "забагато сесій", headers={"Retry-After": "30"})
+                return
+            self._send_json({"session_id": session.id, "sample_rate": config.SAMPLE_RATE})
+            return
+
+        if parts == ["v1", "translate"]:
+            data = self._read_json()
+            if data is None:
+                return
+            try:
+                text = translate(str(data.get("text") or ""), src=data.get("src", "uk"), dst=data.get("dst", "en"))
+            except Exception as e:
+                self._error(500, f"переклад не вдався: {e}")
+                return
+            self._send_json({"text": text})
+            return
+
+        if len(parts) == 4 and parts[:2] == ["v1", "sessions"]:
+            session = self.server.sessions.get(parts[2])
+            if session is None:
+                self._read_body()
+                self._error(404, "немає такої сесії")
+                return
+            if parts[3] == "audio":
+                self._post_audio(session, query)
+                return
+            if parts[3] == "turn":
+                self._post_turn(session)
+                return
+
+        self._read_body()
+        self._error(404, "not found")
+
+    def _post_audio(self, session: Session, query: dict) -> None:
+        body = self._read_body()
+        if body is None:
+            return
+        fmt = (query.get("format") or ["s16"])[0]
+        if fmt == "f32":
+            pcm = np.frombuffer(body[:len(body) - len(body) % 4], dtype="<f4").astype("float32")
+        else:
+            pcm = np.frombuffer(body[:len(body) - len(body) % 2], dtype="<i2").astype("float32") / 32768.0
+        try:
+            seconds = session.append_audio(pcm)
+        except BufferError as e:
+            self._error(413, str(e))
+            return
+        self._send_json({"buffered_seconds": round(seconds, 3)})
+
+    def _post_turn(self, session: Session) -> None:
+        data = self._read_json()
+        if data is None:
+            return
+
+        cancel = session.begin_turn()
+        if cancel is None:
+            self._error(409, "у сесії вже йде хід")
+            return
+        try:
+            with self._watch_client(cancel), self.server.admission.slot():
+                if cancel.cancelled:
+                    self.close_connection = True  # пішов, поки стояв у черзі
+                    return
+                self._run_turn(session, data, cancel)
+        except Overloaded as e:
+            self._error(503, str(e), headers={"Retry-After": str(int(e.retry_after))})
+        finally:
+            session.end_turn()
+
+    @staticmethod
+    def _result(future: Future, cancel: CancelToken):
+        """future.result(), але не довше, ніж живий хід (ще не почате завдання знімається з пулу)."""
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except FutureTimeout:
+                if cancel.cancelled:
+                    future.cancel()
+                    raise ClientGone("хід скасовано")
+
+    def _run_turn(self, session: Session, data: dict, cancel: CancelToken) -> None:
+        t0 = time.perf_counter()
+        timings: dict[str, float] = {}
+        pending: list[Future] = []  # синтез речень по порядку
+
+        def send(event: dict) -> None:
+            self._send_event(event, cancel)
+
+        self._start_stream()
+        try:
+            text = str(data.get("text") or "").strip()
+            lang = (data.get("lang") or session.lang or "").lower()
+            if not text:
+                audio = session.take_audio()
+                if audio.size == 0:
+                    send({"type": "error", "error": "немає ні аудіо, ні тексту"})
+                    self._end_stream()
+                    return
+                text, detected = self._result(self.server.stt_pool.submit(transcribe_audio, audio), cancel)
+                timings["stt"] = time.perf_counter() - t0
+                if not text:
+                    send({"type": "error", "error": "нічого не розпізнано"})
+                    self._end_stream()
+                    return
+                lang = lang or normalize_lang(text, detected)
+                send({"type": "transcript", "text": text, "lang": lang})
+            lang = lang or normalize_lang(text, "en")  # текстовий хід без мови: кирилиця → uk, інакше en
+            if cancel.cancelled:
+                raise ClientGone("хід скасовано")
+
+            want_audio = bool(data.get("tts", True)) and config.TTS_ENABLED
+
+            def _flush_audio(block: bool) -> None:
+                while pending and (block or pending[0].done()):
+                    future = pending.pop(0)
+                    try:
+                        sample_rate, pcm = self._result(future, cancel)
+                    except ClientGone:
+                        raise
+                    except Exception as e:
+                        print(f"⚠️ [server] Синтез не вдався: {e}")
+                        continue
+                    if pcm.size:
+                        timings.setdefault("first_audio", time.perf_counter() - t0)
+                        send({
+                            "type": "audio",
+                            "sample_rate": sample_rate,
+                            "pcm": base64.b64encode(pcm.astype("<i2").tobytes()).decode("ascii"),
+                        })
+
+            reply: list[str] = []
+            for sentence in ask_ollama_smart_stream(text, user_lang=lang, cancel=cancel, memory=session.memory):
+                timings.setdefault("first_sentence", time.perf_counter() - t0)
+                reply.append(sentence)
+                send({"type": "sentence", "text": sentence})
+                if want_audio:
+                    pending.append(self.server.tts_pool.submit(_synthesize, lang, sentence))
+                    _flush_audio(block=False)
+            if cancel.cancelled:
+                raise ClientGone("хід скасовано")
+            _flush_audio(block=True)
+
+            timings["total"] = time.perf_counter() - t0
+            send({
+                "type": "done",
+                "reply": " ".join(reply),
+                "lang": lang,
+                "timings_ms": {k: round(v * 1000, 1) for k, v in timings.items()},
+            })
+            self._end_stream()
+        except ClientGone:
+            # клієнт пішов — генерацію вже зупинено (CancelToken), несинтезоване знімаємо з пулу
+            for future in pending:
+                future.cancel()
+            print(f"[server] Клієнт сесії {session.id[:8]} відключився, хід скасовано")
+            self.close_connection = True
+        except Exception as e:
+            cancel.cancel()
+            for future in pending:
+                future.cancel()
+            print(f"❌ [server] Хід сесії {session.id[:8]} не вдався: {e}")
+            try:
+                send({"type": "error", "error": str(e)})
+                self._end_stream()
+            except (ClientGone, OSError):
+                self.close_connection = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальний API голосового асистента для кількох клієнтів.")
+    parser.add_argument("--host", default=getattr(config, "SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=getattr(config, "SERVER_PORT", 8765))
+    args = parser.parse_args()
+
+    # одна модель Whisper на всіх, але з кількома воркерами — розпізнавання йдуть паралельно
+    config.WHISPER_NUM_WORKERS = max(
+        getattr(config, "WHISPER_NUM_WORKERS", 1), getattr(config, "SERVER_STT_WORKERS", 2)
+    )
+    # router + переклад кожного активного ходу мають іти паралельно, а не в черзі за іншими сесіями
+    config.LLM_PIPELINE_WORKERS = max(
+        getattr(config, "LLM_PIPELINE_WORKERS", 4), 2 * getattr(config, "SERVER_MAX_ACTIVE_TURNS", 4)
+    )
+
+    if getattr(config, "OLLAMA_PRELOAD", True):
+        register("ollama", lambda: preload_models(background=False))
+    if config.TTS_ENABLED:
+        try:
+            from tts import prewarm_speech_cache, start_voices
+        except (ImportError, OSError) as e:
+            print(f"⚠️ [server] TTS недоступний ({e}), працюю без озвучки")
+            config.TTS_ENABLED = False
+
+    if config.TTS_ENABLED:
+        def _warm_tts():
+            start_voices()
+            prewarm_speech_cache()
+
+        register("tts", _warm_tts)
+
+    # на відміну від assistant.py чекаємо на всі моделі до першого запиту:
+    # інакше перші клієнти стоять у черзі за завантаженням
+    load_all()
+    wait_all()
+
+    server = VoiceServer(args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"[server] Слухаю на http://{host}:{port} (Ctrl+C — вихід)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[server] Статистика: {server.stats()}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
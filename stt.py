@@ -1,90 +1,69 @@
 # stt.py
 
+import threading
+import time
+from typing import Callable
+
 import numpy as np
-import sounddevice as sd
-from faster_whisper import WhisperModel
 
 import config
+import tracing
+from audio_capture import AudioCapture
+from models import register
+
 
-print(f"Завантажую модель faster-whisper ({config.WHISPER_MODEL_NAME})…")
+def _load_whisper():
+    from faster_whisper import WhisperModel
+
+    print(f"Завантажую модель faster-whisper ({config.WHISPER_MODEL_NAME})…")
+    return WhisperModel(
+        config.WHISPER_MODEL_NAME,
+        device=config.WHISPER_DEVICE,              # з config
+        compute_type=config.WHISPER_COMPUTE_TYPE,  # "int8" для швидкості
+        # >1 — паралельні transcribe() з різних потоків (server.py), модель одна
+        num_workers=getattr(config, "WHISPER_NUM_WORKERS", 1),
+    )
 
-whisper_model = WhisperModel(
-    config.WHISPER_MODEL_NAME,
-    device=config.WHISPER_DEVICE,              # з config
-    compute_type=config.WHISPER_COMPUTE_TYPE,  # "int8" для швидкості
-)
 
+# Лінивий проксі: модель вантажиться у фоні (models.load_all) або при першому виклику
+whisper_model = register("whisper", _load_whisper)
 
-def _rms(x: np.ndarray) -> float:
-    """Середньоквадратичне значення (грубо — гучність фрейму)."""
-    if x.size == 0:
-        return 0.0
-    return float(np.sqrt(np.mean(np.square(x), dtype=np.float64)))
 
+# Рушій запису (створюється при першому записі, буфер виділяється один раз)
+_capture: AudioCapture | None = None
 
-def record_audio() -> np.ndarray:
+
+def record_audio(
+    on_frame: Callable[[np.ndarray], None] | None = None,
+    source=None,
+    cancel: threading.Event | None = None,
+    preroll: np.ndarray | None = None,
+) -> np.ndarray:
     """
     Слухаємо мікрофон, поки:
     - не зʼявиться голос (гучність > VAD_THRESHOLD),
     - а потім не буде тиші VAD_SILENCE_SECONDS підряд.
 
     Так асистент сам розуміє, коли ти закінчив говорити.
-    """
-    sr = config.SAMPLE_RATE
-    FRAME_DURATION = 0.2  # тривалість одного фрейму в секундах
-    frame_samples = int(sr * FRAME_DURATION)
+    on_frame (якщо задано) отримує кожен записаний фрейм одразу —
+    так StreamingTranscriber розпізнає мову ще під час запису.
+    source — інше джерело звуку замість мікрофона (наприклад, ArraySource).
+    cancel — подія скасування (barge-in/вихід): запис обривається, результат порожній.
+    preroll — вже почутий початок фрази (barge-in голосом), див. BargeInMonitor.
 
-    vad_threshold = getattr(config, "VAD_THRESHOLD", 0.01)
-    vad_silence_seconds = getattr(config, "VAD_SILENCE_SECONDS", 0.8)
-    max_record_seconds = getattr(config, "MAX_RECORD_SECONDS", 20)
+    Повертає view на буфер запису (валідний до наступного record_audio()).
+    """
+    global _capture
 
     print("🎙 Слухаю мікрофон... Говори, і я зупинюся, коли буде пауза.")
 
-    audio_chunks: list[np.ndarray] = []
-    started = False
-    silence_time = 0.0
-    total_time = 0.0
-
-    with sd.InputStream(samplerate=sr, channels=1, dtype="float32") as stream:
-        while True:
-            frame, _ = stream.read(frame_samples)  # shape: (frame_samples, 1)
-            frame = frame.reshape(-1)
-            total_time += FRAME_DURATION
-
-            level = _rms(frame)
-
-            if not started:
-                # Чекаємо, поки зʼявиться голос
-                if level > vad_threshold:
-                    started = True
-                    print("🎙 Виявив голос, записую...")
-                    audio_chunks.append(frame.copy())
-                else:
-                    # ще тиша до початку — пропускаємо
-                    continue
-            else:
-                # вже записуємо
-                audio_chunks.append(frame.copy())
-
-                if level < vad_threshold:
-                    silence_time += FRAME_DURATION
-                    if silence_time >= vad_silence_seconds:
-                        print("⏹ Виявлено паузу, зупиняю запис.")
-                        break
-                else:
-                    # знову голос — обнуляємо таймер тиші
-                    silence_time = 0.0
-
-                if total_time >= max_record_seconds:
-                    print("⏹ Досягнуто MAX_RECORD_SECONDS, зупиняю запис.")
-                    break
-
-    if not audio_chunks:
-        print("⚠ Не отримав жодного звуку.")
-        return np.zeros(0, dtype="float32")
-
-    audio = np.concatenate(audio_chunks).astype("float32")
-    return audio
+    with tracing.span("record"):
+        if source is not None:
+            return AudioCapture(source=source).record(on_frame=on_frame, cancel=cancel, preroll=preroll)
+
+        if _capture is None:
+            _capture = AudioCapture()
+        return _capture.record(on_frame=on_frame, cancel=cancel, preroll=preroll)
 
 
 def transcribe_audio(audio: np.ndarray):
@@ -106,16 +85,234 @@ def transcribe_audio(audio: np.ndarray):
 
     print("🧠 Розпізнаю текст...")
 
-    segments, info = whisper_model.transcribe(
-        audio,
-        beam_size=3,
-        language=None,  # авто-визначення
-    )
-
-    text_chunks = [seg.text for seg in segments]
+    with tracing.span("transcribe"):
+        segments, info = whisper_model.transcribe(
+            audio,
+            beam_size=3,
+            language=None,  # авто-визначення
+        )
+        # segments — генератор: розпізнавання реально йде тут
+        text_chunks = [seg.text for seg in segments]
     text = " ".join(text_chunks).strip()
     lang = (info.language or "unknown").lower()
 
     print(f"📝 Розпізнаний текст: {text!r}")
     print(f"🌐 Визначена мова: {lang}")
     return text, lang
+
+
+def normalize_lang(text: str, detected_lang: str | None) -> str:
+    """
+    Нормалізуємо мову:
+    - якщо є кирилиця → 'uk'
+    - інакше використовуємо detected_lang або 'en'
+    """
+    text = text or ""
+    detected = (detected_lang or "").lower()
+
+    uk_chars = "абвгґдеєжзиіїйклмнопрстуфхцчшщьюяАБВГҐДЕЄЖЗИІЇЙКЛМНОПРСТУФХЦЧШЩЬЮЯ"
+    has_cyrillic = any(ch in uk_chars for ch in text)
+
+    if has_cyrillic:
+        if detected != "uk":
+            print(f"🔤 Whisper визначив мову як '{detected_lang}', але знайдена кирилиця → вважаю 'uk'.")
+        return "uk"
+
+    if not detected:
+        print("⚠ Whisper не повернув код мови, вважаю 'en'.")
+        return "en"
+
+    return detected
+
+
+def _norm_word(word: str) -> str:
+    """Слово для порівняння гіпотез: без пробілів, регістру й пунктуації по краях."""
+    return word.strip().lower().strip(".,!?…:;\"'«»()-")
+
+
+class StreamingTranscriber:
+    """
+    Потокове розпізнавання: поки триває запис, фоновий потік кожні
+    STT_STREAM_STEP_SECONDS розпізнає ще не зафіксовану частину буфера
+    (вікна перекриваються — кожне починається з останньої зафіксованої межі).
+
+    Стабільний префікс фіксується за правилом local agreement:
+    слова, які збіглися у двох послідовних гіпотезах, вважаються остаточними,
+    і межа зсувається на кінець останнього такого слова (за word timestamps).
+    Після кінця мовлення finish() доросповідає лише короткий хвіст.
+
+    Мова фіксується (language= у наступних проходах), лише коли Whisper упевнений
+    у ній на STT_LANG_LOCK_PROB; до того кожен прохід визначає її заново — перша
+    секунда коротка, а початок фрази буває іншою мовою. Якщо до кінця так і не
+    зафіксували — finish() визначає мову по всьому запису.
+    """
+
+    def __init__(self, step_seconds: float | None = None, beam_size: int = 1):
+        self.sr = config.SAMPLE_RATE
+        self.step_samples = int(self.sr * (step_seconds or getattr(config, "STT_STREAM_STEP_SECONDS", 1.0)))
+        self.beam_size = beam_size
+
+        self._chunks: list[np.ndarray] = []
+        self._n_samples = 0
+        self._lock = threading.Lock()
+        self._new_audio = threading.Event()
+        self._stop = threading.Event()
+
+        self._committed: list[str] = []      # зафіксовані слова (сирі, з пробілами Whisper)
+        self._committed_samples = 0          # межа зафіксованого аудіо
+        self._prev_hypothesis: list[str] = []  # нормалізовані незафіксовані слова попереднього проходу
+        self.lang: str | None = None
+        self.lang_probability = 0.0
+        self.lang_locked = False
+        self.lang_lock_prob = getattr(config, "STT_LANG_LOCK_PROB", 0.8)
+
+        self._thread = threading.Thread(target=tracing.bind(self._worker), name="stt-stream", daemon=True)
+        self._thread.start()
+
+    def feed(self, frame: np.ndarray) -> None:
+        """Додає новий фрейм (викликається з циклу запису)."""
+        frame = frame.reshape(-1).astype("float32", copy=False)
+        with self._lock:
+            self._chunks.append(frame)
+            self._n_samples += frame.size
+        self._new_audio.set()
+
+    def _snapshot(self) -> np.ndarray:
+        with self._lock:
+            if len(self._chunks) > 1:
+                self._chunks = [np.concatenate(self._chunks)]
+            return self._chunks[0] if self._chunks else np.zeros(0, dtype="float32")
+
+    def _transcribe_words(self, audio: np.ndarray, beam_size: int):
+        prompt = "".join(self._committed[-30:]).strip() or None
+        segments, info = whisper_model.transcribe(
+            audio,
+            beam_size=beam_size,
+            language=self.lang if self.lang_locked else None,
+            word_timestamps=True,
+            initial_prompt=prompt,
+            condition_on_previous_text=False,
+        )
+        words = [w for seg in segments for w in (seg.words or [])]
+        if not self.lang_locked and info.language:
+            self._update_lang(info.language, getattr(info, "language_probability", 0.0) or 0.0)
+        return words
+
+    def _update_lang(self, lang: str, probability: float) -> None:
+        """Найупевненіша здогадка досі; певна (>= lang_lock_prob) — фіксується."""
+        if probability >= self.lang_probability:
+            self.lang, self.lang_probability = lang.lower(), probability
+        if probability >= self.lang_lock_prob:
+            self.lang_locked = True
+
+    def _detect_lang(self, audio: np.ndarray) -> None:
+        """Мова по всьому запису (перші 30 с, як бачить Whisper), якщо проходи не були впевнені."""
+        detect = getattr(whisper_model, "detect_language", None)  # є в новіших faster-whisper
+        if detect is None:
+            return
+        try:
+            lang, probability, _ = detect(audio[: 30 * self.sr])
+        except Exception as e:
+            print(f"⚠️ Потокове розпізнавання: не вдалося визначити мову: {e}")
+            return
+        self._update_lang(lang, probability)
+        self.lang_locked = True  # хвіст розпізнаємо вже цією мовою
+
+    def _interim_pass(self) -> None:
+        audio = self._snapshot()
+        start = self._committed_samples
+        window = audio[start:]
+        if window.size < self.step_samples:
+            return
+
+        words = self._transcribe_words(window, self.beam_size)
+        current = [_norm_word(w.word) for w in words]
+
+        # local agreement: спільний префікс з попередньою гіпотезою
+        agreed = 0
+        for prev, cur in zip(self._prev_hypothesis, current):
+            if not cur or prev != cur:
+                break
+            agreed += 1
+
+        if agreed:
+            self._committed.extend(w.word for w in words[:agreed])
+            self._committed_samples = start + int(words[agreed - 1].end * self.sr)
+
+        self._prev_hypothesis = current[agreed:]
+
+    def _worker(self) -> None:
+        last_pass_at = 0
+        while not self._stop.is_set():
+            self._new_audio.wait(timeout=0.1)
+            self._new_audio.clear()
+            if self._stop.is_set():
+                break
+            if self._n_samples - last_pass_at < self.step_samples:
+                continue
+            last_pass_at = self._n_samples
+            try:
+                self._interim_pass()
+            except Exception as e:
+                print(f"⚠️ Потокове розпізнавання: помилка проміжного проходу: {e}")
+
+    def committed_text(self) -> str:
+        """Вже зафіксований текст (можна показувати ще до кінця фрази)."""
+        return "".join(self._committed).strip()
+
+    def cancel(self) -> None:
+        """Зупиняє фоновий потік без дорозпізнавання (не чекає поточного проходу)."""
+        self._stop.set()
+        self._new_audio.set()
+
+    def finish(self) -> tuple[str, str]:
+        """
+        Кінець мовлення: зупиняє фоновий потік і розпізнає тільки хвіст
+        після зафіксованої межі. Повертає (text, lang_code).
+        """
+        self._stop.set()
+        self._new_audio.set()
+        self._thread.join()
+
+        audio = self._snapshot()
+        if audio.size == 0:
+            return "", "unknown"
+
+        if not self.lang_locked:
+            self._detect_lang(audio)
+
+        tail = audio[self._committed_samples:]
+        tail_words = []
+        if tail.size >= int(0.1 * self.sr):
+            tail_words = self._transcribe_words(tail, beam_size=3)
+
+        text = ("".join(self._committed) + "".join(w.word for w in tail_words)).strip()
+        lang = (self.lang or "unknown").lower()
+        return text, lang
+
+
+def record_and_transcribe(
+    cancel: threading.Event | None = None,
+    preroll: np.ndarray | None = None,
+) -> tuple[np.ndarray, str, str]:
+    """
+    Запис + потокове розпізнавання паралельно.
+    Повертає (audio, text, lang_code) — як record_audio() + transcribe_audio(),
+    але після кінця фрази лишається розпізнати тільки короткий хвіст.
+    cancel / preroll — як у record_audio().
+    """
+    transcriber = StreamingTranscriber()
+    audio = record_audio(on_frame=transcriber.feed, cancel=cancel, preroll=preroll)
+    if cancel is not None and cancel.is_set():
+        transcriber.cancel()
+        return audio, "", "unknown"
+
+    t_end = time.perf_counter()
+    print("🧠 Дорозпізнаю хвіст фрази...")
+    with tracing.span("transcribe"):
+        text, lang = transcriber.finish()
+
+    print(f"⏱ Текст готовий через {time.perf_counter() - t_end:.2f} с після кінця запису")
+    print(f"📝 Розпізнаний текст: {text!r}")
+    print(f"🌐 Визначена мова: {lang}")
+    return audio, text, lang
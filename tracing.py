@@ -0,0 +1,282 @@
+# tracing.py
+"""
+Легке трасування ходу: скільки часу забрав кожен етап.
+
+Етапи (STAGES): record, vad_endpoint, transcribe, route, web_search, translate_in,
+generate_ttft (до першого токена), generate, prompt_eval / eval (з метаданих Ollama:
+обробка промпту і генерація на сервері), translate_out, first_token, first_audio, playback.
+
+- span("етап") — контекст-менеджер, час додається до етапу поточного ходу
+  (кілька span-ів одного етапу за хід сумуються, напр. translate_out по реченнях);
+- mark("подія") — момент часу; у звіті це затримка від кінця мовлення
+  (mark "speech_end"), тобто те, що реально відчуває користувач;
+- end_turn() дописує хід одним рядком у JSONL (TRACE_PATH).
+
+Поточний хід прив'язаний до потоку (ContextVar), а не глобальний:
+start_turn() / use(trace) задають його для свого потоку, а фонові потоки
+ходу (спекулятивна генерація, переклад, TTS) отримують його через
+bind(fn) у момент запуску. Тож перерваний (barge-in) хід, чиї потоки ще
+дорозпізнають чи доперекладають, пише лише у свою трасу, а після
+end_turn() / discard_turn() траса закрита і запізнілі span-и відкидаються.
+Якщо ходу немає — span/mark нічого не роблять.
+
+Звіт p50/p95/p99 по етапах:
+    python tracing.py --last 200
+"""
+
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+import numpy as np
+
+import config
+
+STAGES = [
+    "record",
+    "vad_endpoint",
+    "transcribe",
+    "route",
+    "web_search",
+    "translate_in",
+    "generate_ttft",
+    "generate",
+    "prompt_eval",
+    "eval",
+    "translate_out",
+    "first_token",
+    "first_audio",
+    "playback",
+    "total",
+]
+
+TRACE_PATH = getattr(config, "TRACE_PATH", "traces.jsonl")
+
+
+class Trace:
+    """Етапи (сума секунд) і позначки часу одного ходу."""
+
+    def __init__(self, **meta):
+        self.t0 = time.perf_counter()
+        self.ts = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        self.meta = meta
+        self.stages: dict[str, float] = {}
+        self.marks: dict[str, float] = {}
+        self.closed = False  # після end_turn/discard_turn запізнілі потоки нічого не додають
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            if not self.closed:
+                self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def mark(self, name: str, at: float | None = None) -> None:
+        """Позначка часу (перша перемагає: first_token, first_audio)."""
+        with self._lock:
+            if not self.closed:
+                self.marks.setdefault(name, at if at is not None else time.perf_counter())
+
+    def close(self) -> bool:
+        """Закриває трасу; False — вже була закрита."""
+        with self._lock:
+            was_open, self.closed = not self.closed, True
+            return was_open
+
+    def to_dict(self) -> dict:
+        """Етапи в мс; позначки перераховані в затримку від speech_end (або від старту ходу)."""
+        with self._lock:
+            stages = dict(self.stages)
+            marks = dict(self.marks)
+
+        ref = marks.pop("speech_end", self.t0)
+        for name, at in marks.items():
+            stages[name] = max(0.0, at - ref)
+        stages["total"] = time.perf_counter() - self.t0
+
+        return {
+            "ts": self.ts,
+            **self.meta,
+            "stages_ms": {k: round(v * 1000, 1) for k, v in stages.items()},
+        }
+
+
+_current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_write_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return getattr(config, "TRACE_ENABLED", True)
+
+
+def start_turn(**meta) -> Trace | None:
+    """Починає новий хід і робить його поточним у цьому потоці."""
+    trace = Trace(**meta) if enabled() else None
+    _current.set(trace)
+    return trace
+
+
+def current() -> Trace | None:
+    return _current.get()
+
+
+@contextmanager
+def use(trace: Trace | None):
+    """Робить trace поточним у цьому потоці на час блоку."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def bind(fn):
+    """fn, що виконується в трасі, поточній на момент bind() — для Thread(target=...) і submit()."""
+    trace = _current.get()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with use(trace):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+@contextmanager
+def span(stage: str):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - t0)
+
+
+def add(stage: str, seconds: float) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+def mark(name: str, at: float | None = None) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.mark(name, at)
+
+
+def set_meta(**meta) -> None:
+    trace = _current.get()
+    if trace is not None and not trace.closed:
+        trace.meta.update(meta)
+
+
+def _detach(trace: Trace) -> None:
+    if _current.get() is trace:
+        _current.set(None)
+
+
+def discard_turn(trace: Trace | None = None) -> None:
+    """Хід не відбувся (нічого не розпізнано) — нічого не пишемо."""
+    trace = trace or _current.get()
+    if trace is not None:
+        trace.close()
+        _detach(trace)
+
+
+def end_turn(path: str | None = None, trace: Trace | None = None) -> dict | None:
+    """
+    Завершує хід (за замовчуванням поточний) і дописує його в JSONL.
+    Повертає записаний словник (None — ходу немає або він уже завершений).
+    """
+    trace = trace or _current.get()
+    if trace is None:
+        return None
+    _detach(trace)
+
+    record = trace.to_dict()
+    if not trace.close():
+        return None
+    path = path or TRACE_PATH
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"⚠️ [trace] Не вдалося записати {path}: {e}")
+    return record
+
+
+def load_traces(path: str | None = None, last: int | None = None) -> list[dict]:
+    path = path or TRACE_PATH
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # недописаний рядок (процес убили посеред запису)
+    return records[-last:] if last else records
+
+
+def stage_percentiles(records: list[dict]) -> list[dict]:
+    """p50/p95/p99 (мс) по кожному етапу, в порядку STAGES (невідомі — в кінці)."""
+    values: dict[str, list[float]] = {}
+    for record in records:
+        for stage, ms in record.get("stages_ms", {}).items():
+            values.setdefault(stage, []).append(float(ms))
+
+    order = [s for s in STAGES if s in values] + sorted(s for s in values if s not in STAGES)
+    rows = []
+    for stage in order:
+        v = np.asarray(values[stage])
+        rows.append({
+            "stage": stage,
+            "n": int(v.size),
+            "p50": float(np.percentile(v, 50)),
+            "p95": float(np.percentile(v, 95)),
+            "p99": float(np.percentile(v, 99)),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Затримки по етапах ходу: p50/p95/p99 з історії трас.")
+    parser.add_argument("--path", default=TRACE_PATH)
+    parser.add_argument("--last", type=int, default=None, help="лише останні N ходів")
+    parser.add_argument("--lang", default=None, help="лише ходи з цією мовою (uk/en)")
+    args = parser.parse_args()
+
+    records = load_traces(args.path, None)
+    if args.lang:
+        records = [r for r in records if (r.get("lang") or "").startswith(args.lang)]
+    if args.last:
+        records = records[-args.last:]
+    if not records:
+        print(f"[trace] Немає записів у {args.path}")
+        return
+
+    print(f"[trace] {len(records)} ходів з {args.path} ({records[0]['ts']} … {records[-1]['ts']})\n")
+    header = f"{'stage':<14} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in stage_percentiles(records):
+        print(f"{row['stage']:<14} {row['n']:>5} {row['p50']:>9.0f} {row['p95']:>9.0f} {row['p99']:>9.0f}")
+    print("\n(first_token / first_audio — від кінця мовлення користувача)")
+
+
+if __name__ == "__main__":
+    main()
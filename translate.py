@@ -1,21 +1,68 @@
 # translate.py
+import importlib.util
+import os
+import re
+import threading
+from collections import OrderedDict
 from typing import Literal
 
-from transformers import MarianMTModel, MarianTokenizer
+import config
+from models import register
 
 # Моделі Helsinki-NLP для uk<->en
 UK_EN_MODEL_NAME = "Helsinki-NLP/opus-mt-uk-en"
 EN_UK_MODEL_NAME = "Helsinki-NLP/opus-mt-en-uk"
 
 
+# межа речення: .!?… + пробіл (перенос рядка обробляємо окремо, щоб зберегти абзаци)
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_sentences(text: str) -> list[str]:
+    """Ділить рядок на речення (порожні відкидає)."""
+    return [s.strip() for s in _SENTENCE_RE.split(text or "") if s.strip()]
+
+
 class MarianTranslator:
-    def __init__(self):
-        # Завантажуємо обидві моделі один раз при імпорті модуля
+    """
+    Переклад uk<->en моделями Marian:
+    - текст ділиться на речення (довгі відповіді не обрізаються по 512 токенах),
+    - речення сортуються за довжиною і йдуть батчами (мінімум padding-у),
+    - generate під torch.inference_mode з налаштовуваними beams/потоками,
+    - переклади речень кешуються (LRU окремо для кожного напрямку).
+    """
+
+    def __init__(
+        self,
+        num_beams: int | None = None,
+        num_threads: int | None = None,
+        batch_size: int | None = None,
+        cache_size: int | None = None,
+    ):
+        self.num_beams = num_beams or getattr(config, "MT_NUM_BEAMS", 2)
+        self.batch_size = batch_size or getattr(config, "MT_BATCH_SIZE", 8)
+        self.cache_size = cache_size or getattr(config, "MT_CACHE_SIZE", 2048)
+
+        self._load_models(num_threads or getattr(config, "MT_NUM_THREADS", 0))
+
+        self._caches: dict[str, OrderedDict[str, str]] = {"uk_en": OrderedDict(), "en_uk": OrderedDict()}
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _load_models(self, num_threads: int) -> None:
+        import torch
+        from transformers import MarianMTModel, MarianTokenizer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        # Завантажуємо обидві моделі один раз
         self.uk_en_tokenizer = MarianTokenizer.from_pretrained(UK_EN_MODEL_NAME)
-        self.uk_en_model = MarianMTModel.from_pretrained(UK_EN_MODEL_NAME)
+        self.uk_en_model = MarianMTModel.from_pretrained(UK_EN_MODEL_NAME).eval()
 
         self.en_uk_tokenizer = MarianTokenizer.from_pretrained(EN_UK_MODEL_NAME)
-        self.en_uk_model = MarianMTModel.from_pretrained(EN_UK_MODEL_NAME)
+        self.en_uk_model = MarianMTModel.from_pretrained(EN_UK_MODEL_NAME).eval()
 
     def _translate_batch(self, texts, direction: Literal["uk_en", "en_uk"]) -> list[str]:
         if direction == "uk_en":
@@ -25,27 +72,182 @@ class MarianTranslator:
             tok = self.en_uk_tokenizer
             model = self.en_uk_model
 
-        inputs = tok(texts, return_tensors="pt", padding=True, truncation=True)
-        outputs = model.generate(**inputs, max_length=512, num_beams=2)
+        import torch
+
+        inputs = tok(texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        with torch.inference_mode():
+            outputs = model.generate(**inputs, max_length=512, num_beams=self.num_beams)
         decoded = tok.batch_decode(outputs, skip_special_tokens=True)
         # Прибираємо зайві пробіли
         return [d.strip() for d in decoded]
 
-    def translate_uk_en(self, text: str) -> str:
+    def translate_sentences(self, sentences: list[str], direction: Literal["uk_en", "en_uk"]) -> list[str]:
+        """Переклад списку речень: кеш → батчі відсортованих за довжиною → кеш."""
+        cache = self._caches[direction]
+        results: dict[str, str] = {}
+
+        with self._cache_lock:
+            for sentence in sentences:
+                if sentence in cache:
+                    cache.move_to_end(sentence)
+                    results[sentence] = cache[sentence]
+            missing = sorted({s for s in sentences if s not in results}, key=len)
+            self.cache_hits += len(sentences) - sum(1 for s in sentences if s not in results)
+            self.cache_misses += len(missing)
+
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            for src, dst in zip(batch, self._translate_batch(batch, direction)):
+                results[src] = dst
+
+        with self._cache_lock:
+            for src in missing:
+                cache[src] = results[src]
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+        return [results[s] for s in sentences]
+
+    def cache_stats(self) -> dict:
+        with self._cache_lock:
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "uk_en": len(self._caches["uk_en"]),
+                "en_uk": len(self._caches["en_uk"]),
+            }
+
+    def translate_text(self, text: str, direction: Literal["uk_en", "en_uk"]) -> str:
+        """Переклад довільного тексту по реченнях, зі збереженням переносів рядків."""
         text = (text or "").strip()
         if not text:
             return ""
-        return self._translate_batch([text], "uk_en")[0]
+
+        lines = [split_sentences(line) for line in text.split("\n")]
+        flat = [s for line in lines for s in line]
+        translated = iter(self.translate_sentences(flat, direction))
+
+        return "\n".join(" ".join(next(translated) for _ in line) for line in lines)
+
+    def translate_uk_en(self, text: str) -> str:
+        return self.translate_text(text, "uk_en")
 
     def translate_en_uk(self, text: str) -> str:
-        text = (text or "").strip()
-        if not text:
-            return ""
-        return self._translate_batch([text], "en_uk")[0]
+        return self.translate_text(text, "en_uk")
+
+
+class CTranslate2Translator(MarianTranslator):
+    """
+    Ті самі opus-mt моделі, але через CTranslate2 з int8-вагами.
+    Конвертація робиться один раз і кешується на диску (MT_CT2_DIR),
+    токенізатори — ті самі MarianTokenizer, тож вихід сумісний з PyTorch-шляхом.
+    """
+
+    def _load_models(self, num_threads: int) -> None:
+        import ctranslate2
+        from transformers import MarianTokenizer
+
+        compute_type = getattr(config, "MT_CT2_COMPUTE_TYPE", "int8")
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        cache_dir = os.path.join(base_dir, getattr(config, "MT_CT2_DIR", "mt_ct2"))
+
+        self.uk_en_tokenizer = MarianTokenizer.from_pretrained(UK_EN_MODEL_NAME)
+        self.en_uk_tokenizer = MarianTokenizer.from_pretrained(EN_UK_MODEL_NAME)
+
+        self.uk_en_model = ctranslate2.Translator(
+            convert_to_ct2(UK_EN_MODEL_NAME, cache_dir, compute_type),
+            device="cpu",
+            compute_type=compute_type,
+            intra_threads=num_threads,
+        )
+        self.en_uk_model = ctranslate2.Translator(
+            convert_to_ct2(EN_UK_MODEL_NAME, cache_dir, compute_type),
+            device="cpu",
+            compute_type=compute_type,
+            intra_threads=num_threads,
+        )
 
+    def _translate_batch(self, texts, direction: Literal["uk_en", "en_uk"]) -> list[str]:
+        if direction == "uk_en":
+            tok = self.uk_en_tokenizer
+            model = self.uk_en_model
+        else:
+            tok = self.en_uk_tokenizer
+            model = self.en_uk_model
+
+        source = [tok.convert_ids_to_tokens(tok.encode(t, truncation=True, max_length=512)) for t in texts]
+        results = model.translate_batch(source, beam_size=self.num_beams, max_decoding_length=512)
 
-# Глобальний інстанс (завантажується один раз)
-translator = MarianTranslator()
+        decoded = []
+        for r in results:
+            ids = tok.convert_tokens_to_ids(r.hypotheses[0])
+            decoded.append(tok.decode(ids, skip_special_tokens=True).strip())
+        return decoded
+
+
+def convert_to_ct2(model_name: str, cache_dir: str, quantization: str = "int8") -> str:
+    """
+    Конвертує HF-модель у формат CTranslate2 (один раз), повертає шлях до неї.
+    Для конвертації потрібні transformers + torch, для роботи потім — лише ctranslate2.
+    """
+    out_dir = os.path.join(cache_dir, f"{model_name.replace('/', '--')}-{quantization}")
+    if os.path.exists(os.path.join(out_dir, "model.bin")):
+        return out_dir
+
+    from ctranslate2.converters import TransformersConverter
+
+    print(f"[MT] Конвертую {model_name} у CTranslate2 ({quantization}), це одноразово...")
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = out_dir + ".tmp"
+    TransformersConverter(model_name).convert(tmp_dir, quantization=quantization, force=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+MT_BACKENDS = {
+    "marian": MarianTranslator,
+    "ct2": CTranslate2Translator,
+}
+
+
+def create_translator(backend: str | None = None) -> MarianTranslator:
+    """
+    Створює перекладач за назвою бекенду (за замовчуванням config.MT_BACKEND):
+    "marian" — PyTorch, "ct2" — CTranslate2 int8, "auto" — ct2, якщо пакет встановлено.
+    """
+    backend = (backend or getattr(config, "MT_BACKEND", "auto")).lower()
+    if backend == "auto":
+        backend = "ct2" if importlib.util.find_spec("ctranslate2") else "marian"
+
+    cls = MT_BACKENDS.get(backend)
+    if cls is None:
+        print(f"⚠️ Невідомий MT_BACKEND={backend!r}, використовую marian.")
+        cls = MarianTranslator
+
+    try:
+        translator = cls()
+    except ImportError as e:
+        if cls is MarianTranslator:
+            raise
+        print(f"⚠️ MT-бекенд {backend!r} недоступний ({e}), використовую marian.")
+        translator = MarianTranslator()
+    print(f"[MT] Бекенд перекладу: {type(translator).__name__}")
+    return translator
+
+
+# Глобальний інстанс: лінивий проксі, моделі вантажаться у фоні (models.load_all) або при першому перекладі
+translator = register("translator", create_translator)
+
+
+def _direction(src: str, dst: str) -> Literal["uk_en", "en_uk"] | None:
+    s = (src or "").lower()
+    d = (dst or "").lower()
+
+    if s.startswith("uk") and d.startswith("en"):
+        return "uk_en"
+    if s.startswith("en") and d.startswith("uk"):
+        return "en_uk"
+    return None
 
 
 def translate(text: str, src: str, dst: str) -> str:
@@ -55,15 +257,20 @@ def translate(text: str, src: str, dst: str) -> str:
     - src='en', dst='uk' -> en->uk
     Інші варіанти наразі повертають text як є.
     """
-    s = (src or "").lower()
-    d = (dst or "").lower()
+    direction = _direction(src, dst)
+    if direction is not None:
+        return translator.translate_text(text, direction)
 
-    if s.startswith("uk") and d.startswith("en"):
-        return translator.translate_uk_en(text)
-    if s.startswith("en") and d.startswith("uk"):
-        return translator.translate_en_uk(text)
-    
     print(f"[MT] Unsupported direction {src}->{dst}, повертаю оригінал.")
 
     # Поки що тільки uk<->en підтримуємо
     return text
+
+
+def translate_sentences(sentences: list[str], src: str, dst: str) -> list[str]:
+    """Переклад списку вже розділених речень одним батчем (порядок зберігається)."""
+    direction = _direction(src, dst)
+    if direction is None:
+        print(f"[MT] Unsupported direction {src}->{dst}, повертаю оригінал.")
+        return list(sentences)
+    return translator.translate_sentences(sentences, direction)
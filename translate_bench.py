@@ -0,0 +1,202 @@
+# translate_bench.py
+"""
+Порівняння бекендів перекладу (MT_BACKEND): PyTorch MarianMT проти CTranslate2 int8.
+
+Кожен бекенд запускається в окремому процесі, щоб пам'ять міряти чесно:
+- load s     — час завантаження (для ct2 першого разу — разом з конвертацією);
+- RSS MB     — приріст пам'яті процесу після завантаження моделей;
+- p50/p95 ms — затримка перекладу одного речення (кеш вимкнено);
+- BLEU drift — BLEU виходу бекенду відносно виходу marian (100 = однаково);
+- BLEU ref   — BLEU відносно еталонних перекладів, якщо вони є у файлі.
+
+Корпус — TSV: речення<TAB>еталон (еталон необов'язковий). Без файлу — вбудований набір.
+
+Запуск:
+    python translate_bench.py --direction en_uk --backends marian ct2
+    python translate_bench.py corpus_uk_en.tsv --direction uk_en
+"""
+
+import argparse
+import math
+import multiprocessing as mp
+import time
+from collections import Counter
+
+import numpy as np
+
+import config
+
+_BUILTIN = {
+    "en_uk": [
+        "Hello! How can I help you today?",
+        "The weather in Kyiv will be sunny tomorrow, with temperatures around 18 degrees.",
+        "I could not find any information about that.",
+        "Python is a popular programming language for data science and automation.",
+        "Please repeat your question, I did not hear it clearly.",
+        "The meeting has been moved to Thursday at three o'clock.",
+        "Drink more water and try to get enough sleep.",
+        "The exchange rate of the dollar has slightly increased since yesterday.",
+    ],
+    "uk_en": [
+        "Привіт! Як у тебе справи?",
+        "Яка завтра буде погода у Львові?",
+        "Скільки коштує квиток на потяг до Одеси?",
+        "Розкажи мені коротко про історію Києва.",
+        "Постав, будь ласка, нагадування на восьму ранку.",
+        "Як приготувати борщ без м'яса?",
+        "Що нового в світі технологій цього тижня?",
+        "Переклади це речення англійською мовою.",
+    ],
+}
+
+
+def load_corpus(path: str | None, direction: str) -> tuple[list[str], list[str] | None]:
+    if not path:
+        return list(_BUILTIN[direction]), None
+
+    sources, refs = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            src, _, ref = line.partition("\t")
+            sources.append(src.strip())
+            refs.append(ref.strip())
+    return sources, refs if all(refs) else None
+
+
+def _rss_mb() -> float:
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+
+
+def _run_backend(backend: str, sentences: list[str], direction: str, repeat: int, queue) -> None:
+    """Тіло дочірнього процесу: завантажити один бекенд і прогнати корпус."""
+    try:
+        config.MT_BACKEND = backend
+        config.MT_CACHE_SIZE = 1  # кешу не даємо ховати реальну затримку
+
+        import translate
+
+        rss0 = _rss_mb()
+        t0 = time.perf_counter()
+        mt = translate.translator.get()
+        load_s = time.perf_counter() - t0
+        rss = _rss_mb() - rss0
+
+        # прогрів (перший виклик ініціалізує пул потоків / алокатор)
+        mt._translate_batch(sentences[:1], direction)
+
+        latencies: list[float] = []
+        outputs: list[str] = []
+        for r in range(repeat):
+            for sentence in sentences:
+                t = time.perf_counter()
+                out = mt._translate_batch([sentence], direction)[0]
+                latencies.append(time.perf_counter() - t)
+                if r == 0:
+                    outputs.append(out)
+
+        t = time.perf_counter()
+        mt.translate_sentences(sentences, direction)
+        batch_s = time.perf_counter() - t
+
+        queue.put({
+            "backend": type(mt).__name__,
+            "load_s": load_s,
+            "rss_mb": rss,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "batch_ms": batch_s * 1000,
+            "outputs": outputs,
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _tokens(text: str) -> list[str]:
+    return text.lower().replace(",", " ,").replace(".", " .").replace("!", " !").replace("?", " ?").split()
+
+
+def corpus_bleu(hypotheses: list[str], references: list[str], max_n: int = 4) -> float:
+    """Корпусний BLEU (0–100) зі згладжуванням +1, без зовнішніх пакетів."""
+    matches = [0] * max_n
+    totals = [0] * max_n
+    hyp_len = ref_len = 0
+
+    for hyp, ref in zip(hypotheses, references):
+        h, r = _tokens(hyp), _tokens(ref)
+        hyp_len += len(h)
+        ref_len += len(r)
+        for n in range(1, max_n + 1):
+            h_ngrams = Counter(tuple(h[i:i + n]) for i in range(len(h) - n + 1))
+            r_ngrams = Counter(tuple(r[i:i + n]) for i in range(len(r) - n + 1))
+            matches[n - 1] += sum((h_ngrams & r_ngrams).values())
+            totals[n - 1] += max(len(h) - n + 1, 0)
+
+    if hyp_len == 0:
+        return 0.0
+    log_precision = sum(math.log((m + 1) / (t + 1)) for m, t in zip(matches, totals)) / max_n
+    brevity = 1.0 if hyp_len > ref_len else math.exp(1 - ref_len / hyp_len)
+    return 100.0 * brevity * math.exp(log_precision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк перекладу: MarianMT (PyTorch) проти CTranslate2 int8.")
+    parser.add_argument("corpus", nargs="?", help="TSV: речення<TAB>еталон")
+    parser.add_argument("--direction", choices=["uk_en", "en_uk"], default="en_uk")
+    parser.add_argument("--backends", nargs="+", default=["marian", "ct2"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--show", action="store_true", help="надрукувати самі переклади")
+    args = parser.parse_args()
+
+    sentences, refs = load_corpus(args.corpus, args.direction)
+    print(f"[mt-bench] {len(sentences)} речень, напрямок {args.direction}, повторів {args.repeat}\n")
+
+    ctx = mp.get_context("spawn")
+    rows = []
+    for backend in args.backends:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_backend, args=(backend, sentences, args.direction, args.repeat, queue))
+        proc.start()
+        row = queue.get()
+        proc.join()
+        if "error" in row:
+            print(f"[mt-bench] {backend}: {row['error']}")
+            continue
+        row["name"] = backend
+        rows.append(row)
+
+    if not rows:
+        return
+
+    baseline = next((r["outputs"] for r in rows if r["name"] == "marian"), rows[0]["outputs"])
+
+    header = (f"{'backend':<8} {'load s':>7} {'RSS MB':>7} {'p50 ms':>7} {'p95 ms':>7} "
+              f"{'batch ms':>9} {'BLEU drift':>10} {'BLEU ref':>8}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        drift = corpus_bleu(row["outputs"], baseline)
+        ref = f"{corpus_bleu(row['outputs'], refs):>8.1f}" if refs else f"{'-':>8}"
+        print(
+            f"{row['name']:<8} {row['load_s']:>7.1f} {row['rss_mb']:>7.0f} {row['p50_ms']:>7.0f} "
+            f"{row['p95_ms']:>7.0f} {row['batch_ms']:>9.0f} {drift:>10.1f} {ref}"
+        )
+
+    if args.show:
+        for row in rows:
+            print(f"\n[{row['name']}]")
+            for src, out in zip(sentences, row["outputs"]):
+                print(f"  {src}\n    → {out}")
+
+
+if __name__ == "__main__":
+    main()
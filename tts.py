@@ -1,19 +1,26 @@
 # tts.py
+import atexit
+import json
 import os
+import queue
+import re
 import subprocess
-import tempfile
+import threading
+import time
+from typing import Iterator
 
-import sounddevice as sd
-import soundfile as sf
-import pyttsx3
+import numpy as np
 
 import config
+import tracing
+from piper_onnx import OnnxVoice, onnx_available
+from tts_cache import get_speech_cache
 
 # Папка, де лежить tts.py
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Шлях до piper.exe (аналогічно до piper_test.py, але відносно tts.py)
-PIPER_EXE = os.path.join(BASE_DIR, "piper", "piper.exe")
+PIPER_EXE = os.path.join(BASE_DIR, "piper", "piper.exe" if os.name == "nt" else "piper")
 
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 
@@ -41,80 +48,618 @@ def _get_piper_model(lang: str) -> str:
     return model_path
 
 
-def _speak_with_piper(text: str, lang: str = "uk") -> bool:
+def _read_sample_rate(model_path: str, default: int = 22050) -> int:
+    """Частота дискретизації голосу з <model>.onnx.json (audio.sample_rate)."""
+    try:
+        with open(model_path + ".json", encoding="utf-8") as f:
+            return int(json.load(f)["audio"]["sample_rate"])
+    except Exception:
+        return default
+
+
+class PiperWorker:
     """
-    Озвучка через Piper CLI (piper.exe), як у piper_test.py.
-    Повертає True, якщо все пройшло успішно.
+    Довгоживучий процес Piper для однієї моделі голосу.
+    Текст — рядком у stdin, сирий 16-бітний PCM — зі stdout (--output_raw),
+    тож ONNX-модель завантажується один раз, без тимчасових WAV-файлів.
+
+    Piper після кожного рядка пише в stderr "Real-time factor: ... audio=N sec" —
+    це маркер кінця репліки (і скільки аудіо чекати).
     """
-    text = (text or "").strip()
-    if not text:
-        return True  # нема що озвучувати, але й помилки немає
 
-    if not os.path.exists(PIPER_EXE):
-        print(f"❌ Piper не знайдено за шляхом: {PIPER_EXE}")
-        return False
+    # скільки тиші на stdout після маркера вважати кінцем PCM
+    _DRAIN_IDLE = 0.01
+    MAX_RESTARTS = 3
+    # замість маркера в _done: synthesize() перервано (barge-in)
+    _INTERRUPT = object()
 
-    try:
-        model_path = _get_piper_model(lang)
-    except FileNotFoundError as e:
-        print(f"⚠️ {e}")
-        return False
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.sample_rate = _read_sample_rate(model_path)
+        self._proc: subprocess.Popen | None = None
+        self._lock = threading.Lock()
+        self._pcm: queue.Queue[bytes] = queue.Queue()
+        self._done: queue.Queue[float] = queue.Queue()
+        self._failures = 0
+        self._owner: threading.Thread | None = None  # хто зараз синтезує
 
-    print(f"[TTS] Використовую Piper CLI, lang={lang}, model={os.path.basename(model_path)}")
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.model_path)
 
-    # Тимчасовий WAV-файл для виводу Piper
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        out_path = tmp.name
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
 
-    cmd = [
-        PIPER_EXE,
-        "--model", model_path,
-        "--output_file", out_path,
-    ]
+    def start(self) -> None:
+        if self.is_alive():
+            return
 
-    try:
-        # Запускаємо Piper і передаємо текст через stdin (як у piper_test.py)
-        process = subprocess.Popen(
-            cmd,
+        print(f"[TTS] Стартую Piper-воркер: {self.name}")
+        self._pcm = queue.Queue()
+        self._done = queue.Queue()
+        self._proc = subprocess.Popen(
+            [PIPER_EXE, "--model", self.model_path, "--output_raw"],
             stdin=subprocess.PIPE,
-            stdout=subprocess.DEVNULL,  # ховаємо зайвий вивід
+            stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
+            bufsize=0,
         )
+        threading.Thread(target=self._read_stdout, args=(self._proc, self._pcm), daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(self._proc, self._done), daemon=True).start()
+
+    def stop(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
 
-        _, stderr = process.communicate(input=text.encode("utf-8"))
+    def restart(self) -> None:
+        print(f"[TTS] Перезапускаю Piper-воркер: {self.name}")
+        self.stop()
+        self.start()
 
-        if process.returncode != 0:
-            print(f"❌ Помилка Piper: {stderr.decode('utf-8', errors='ignore')}")
+    def interrupt(self, owner: threading.Thread) -> None:
+        """
+        Barge-in: synthesize(), який зараз виконує owner, повертається одразу, не чекаючи
+        кінця репліки. Голос спільний, тож чужий синтез (інший потік) не чіпаємо.
+        """
+        done = self._done
+        if self._owner is owner:
+            done.put(self._INTERRUPT)
+
+    @staticmethod
+    def _read_stdout(proc: subprocess.Popen, out: queue.Queue) -> None:
+        fd = proc.stdout.fileno()
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            out.put(chunk)
+
+    @staticmethod
+    def _read_stderr(proc: subprocess.Popen, done: queue.Queue) -> None:
+        for line in proc.stderr:
+            text = line.decode("utf-8", errors="ignore")
+            if "Real-time factor" in text:
+                m = re.search(r"audio=([\d.]+)", text)
+                done.put(float(m.group(1)) if m else 0.0)
+
+    def synthesize(self, text: str, timeout: float = 30.0) -> np.ndarray:
+        """Текст → int16 PCM (моно, self.sample_rate). Кидає RuntimeError, якщо воркер не відповів."""
+        line = " ".join((text or "").split())
+        if not line:
+            return np.zeros(0, dtype=np.int16)
+
+        with self._lock:
+            if not self.is_alive():
+                if self._failures >= self.MAX_RESTARTS:
+                    raise RuntimeError(f"Piper-воркер {self.name} недоступний")
+                if self._proc is not None:
+                    # процес помер сам — рахуємо як збій і перезапускаємо
+                    self._failures += 1
+                    self.restart()
+                else:
+                    self.start()
+
+            # залишки попередньої (перерваної) репліки нам не потрібні
+            for q in (self._pcm, self._done):
+                while not q.empty():
+                    q.get_nowait()
+
+            self._owner = threading.current_thread()
+            try:
+                self._proc.stdin.write((line + "\n").encode("utf-8"))
+                self._proc.stdin.flush()
+
+                audio_seconds = self._done.get(timeout=timeout)
+            except (queue.Empty, OSError) as e:
+                self._failures += 1
+                self.restart()
+                raise RuntimeError(f"Piper-воркер {self.name} не відповів: {e}") from e
+            finally:
+                self._owner = None
+
+            if audio_seconds is self._INTERRUPT:
+                # процес ще дописує перервану репліку — її хвіст зіпсував би наступну;
+                # новий процес вантажить модель, поки користувач договорює
+                proc, self._proc = self._proc, None
+                proc.kill()
+                self.start()
+                return np.zeros(0, dtype=np.int16)
+
+            # добираємо PCM: до очікуваної довжини або поки stdout не затихне
+            expected = int(audio_seconds * self.sample_rate) * 2
+            chunks: list[bytes] = []
+            received = 0
+            while True:
+                try:
+                    chunk = self._pcm.get(timeout=self._DRAIN_IDLE if received >= expected else timeout)
+                except queue.Empty:
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+
+            self._failures = 0
+
+        data = b"".join(chunks)
+        return np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+
+    def health_check(self) -> bool:
+        """Живий процес і коротка фраза синтезується без помилок."""
+        try:
+            self.synthesize(".", timeout=10.0)
+            return self.is_alive()
+        except Exception as e:
+            print(f"⚠️ Piper-воркер {self.name} не пройшов перевірку: {e}")
             return False
 
-        # Читаємо готовий WAV і програємо
-        data, samplerate = sf.read(out_path, dtype="int16")
-        print(f"[TTS] Piper WAV shape={data.shape}, samplerate={samplerate}")
 
-        sd.play(data, samplerate)
-        sd.wait()
+# Голос = PiperWorker (piper.exe) або OnnxVoice (onnxruntime у процесі) — однаковий інтерфейс
+Voice = PiperWorker | OnnxVoice
 
-        print("[TTS] Piper: відтворення завершено.")
-        return True
+_voices: dict[str, Voice] = {}
+_voices_lock = threading.Lock()
+
+
+def tts_backend() -> str | None:
+    """
+    Який рушій використовувати (config.TTS_BACKEND):
+    - "onnx"      — onnxruntime у процесі;
+    - "piper_cli" — постійний процес piper.exe;
+    - "auto"      — onnx, якщо встановлені onnxruntime + piper_phonemize, інакше piper_cli.
+    None — жоден не доступний.
+    """
+    backend = getattr(config, "TTS_BACKEND", "auto")
+    if backend in ("auto", "onnx") and onnx_available():
+        return "onnx"
+    if backend in ("auto", "piper_cli") and os.path.exists(PIPER_EXE):
+        return "piper_cli"
+    return None
+
+
+def get_voice(lang: str) -> Voice:
+    """Один голос на модель (uk → lada, інакше → ryan), створюється при першому виклику."""
+    backend = tts_backend()
+    if backend is None:
+        raise FileNotFoundError(f"Немає рушія Piper: ні onnxruntime, ні {PIPER_EXE}")
+
+    model_path = _get_piper_model(lang)
+    with _voices_lock:
+        voice = _voices.get(model_path)
+        if voice is None:
+            if backend == "onnx":
+                voice = OnnxVoice(model_path)
+            else:
+                voice = PiperWorker(model_path)
+            _voices[model_path] = voice
+        return voice
+
+
+def start_voices(langs: tuple[str, ...] = ("uk", "en")) -> None:
+    """Піднімає голоси заздалегідь (щоб перша репліка не чекала)."""
+    if tts_backend() is None:
+        print(f"❌ Piper не знайдено: ні onnxruntime, ні {PIPER_EXE}")
+        return
+    for lang in langs:
+        try:
+            voice = get_voice(lang)
+            voice.start()
+            voice.health_check()
+        except Exception as e:
+            print(f"⚠️ Не вдалося підняти голос Piper для {lang}: {e}")
+
+
+def stop_voices() -> None:
+    with _voices_lock:
+        voices = list(_voices.values())
+        _voices.clear()
+    for voice in voices:
+        voice.stop()
+
+
+atexit.register(stop_voices)
+
+
+def synthesize_chunks(voice: Voice, text: str) -> Iterator[np.ndarray]:
+    """
+    Синтез з кешем: спершу шукаємо PCM за (модель, TTS_RATE, текст),
+    і тільки якщо немає — синтезуємо (ONNX-голос віддає шматки, щойно вони готові)
+    і кладемо результат у кеш. З дискового кешу повертається memory-mapped масив.
+    """
+    cache = get_speech_cache()
+    key = None
+    if cache is not None:
+        key = cache.key(voice.model_path, getattr(config, "TTS_RATE", None), text)
+        pcm = cache.get(key)
+        if pcm is not None:
+            yield pcm
+            return
+
+    if isinstance(voice, OnnxVoice):
+        chunks = []
+        for chunk in voice.synthesize_stream(text):
+            chunks.append(chunk)
+            yield chunk
+        pcm = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+    else:
+        pcm = voice.synthesize(text)
+        yield pcm
+
+    if cache is not None and pcm.size:
+        cache.put(key, pcm)
+
+
+def prewarm_speech_cache(phrases: dict[str, list[str]] | None = None) -> None:
+    """
+    Заздалегідь синтезує часті фрази в кеш ({"uk": [...], "en": [...]},
+    за замовчуванням — config.TTS_PREWARM_PHRASES). Вже закешовані пропускаються.
+    """
+    if get_speech_cache() is None or tts_backend() is None:
+        return
+
+    phrases = phrases if phrases is not None else getattr(config, "TTS_PREWARM_PHRASES", {})
+    count = 0
+    for lang, items in phrases.items():
+        try:
+            voice = get_voice(lang)
+        except FileNotFoundError as e:
+            print(f"⚠️ {e}")
+            continue
+        for phrase in items:
+            for sentence in _split_for_tts(phrase):
+                try:
+                    for _ in synthesize_chunks(voice, sentence):
+                        pass
+                    count += 1
+                except Exception as e:
+                    print(f"⚠️ [TTS cache] Не вдалося прогріти {sentence!r}: {e}")
+
+    print(f"[TTS cache] Прогріто фраз: {count}, {get_speech_cache().stats()}")
+
+
+# кінець речення для TTS: .!?… + пробіл або перенос рядка
+_TTS_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+_END = object()
+
+
+def _split_for_tts(text: str) -> list[str]:
+    return [s.strip() for s in _TTS_SENTENCE_RE.split(text or "") if s.strip()]
+
+
+class NullOutputStream:
+    """
+    "Колонки в нікуди": той самий інтерфейс, що й sd.OutputStream
+    (callback, finished_callback, start/stop/abort/close), але звук ніде не грає.
+    Callback викликається з потоку в темпі реального часу (speed=1) або швидше
+    (speed=0 — без пауз). Для бенчмарків і машин без аудіопристрою
+    (sounddevice тут не потрібен — стоп-сигнал callback-а свій, CallbackStop).
+    """
+
+    class CallbackStop(Exception):
+        """Аналог sd.CallbackStop."""
+
+    def __init__(self, samplerate, channels=1, dtype="int16", callback=None, finished_callback=None,
+                 blocksize: int = 1024, speed: float | None = None):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize or 1024
+        self.speed = getattr(config, "TTS_NULL_SPEED", 1.0) if speed is None else speed
+        self._callback = callback
+        self._finished_callback = finished_callback
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.frames_played = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="null-audio", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        out = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+        block_seconds = self.blocksize / self.samplerate / self.speed if self.speed else 0.0
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._callback(out, self.blocksize, None, None)
+                except self.CallbackStop:
+                    break
+                finally:
+                    self.frames_played += self.blocksize
+                if block_seconds:
+                    self._stop.wait(block_seconds)
+        finally:
+            if self._finished_callback is not None:
+                self._finished_callback()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def abort(self) -> None:
+        self._stop.set()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+def _sounddevice():
+    """
+    sounddevice імпортується лише тоді, коли справді треба грати звук:
+    на сервері без PortAudio (server.py) tts.py потрібен тільки для синтезу.
+    """
+    import sounddevice
+
+    return sounddevice
+
+
+def _open_output_stream(**kwargs):
+    """OutputStream на звуковий пристрій або NullOutputStream (TTS_OUTPUT = "null")."""
+    if getattr(config, "TTS_OUTPUT", "device") == "null":
+        return NullOutputStream(**kwargs)
+    return _sounddevice().OutputStream(**kwargs)
+
+
+def _callback_stop(stream) -> type[Exception]:
+    """Виняток, яким callback каже стріму "більше нічого не буде"."""
+    if isinstance(stream, NullOutputStream):
+        return NullOutputStream.CallbackStop
+    return _sounddevice().CallbackStop
+
+
+class SpeechPipeline:
+    """
+    Конвеєр озвучки: речення → потік синтезу (голос Piper) → черга PCM →
+    callback OutputStream, який грає шматки один за одним без пауз.
+    Поки грає речення N, речення N+1 уже синтезується.
+
+    say() можна викликати, поки ще йде генерація відповіді; close() — "тексту більше не буде";
+    wait() чекає кінця відтворення; stop() — миттєве переривання (barge-in).
+    """
+
+    def __init__(self, lang: str = "uk"):
+        self.lang = lang
+        self.voice = get_voice(lang)
+        self.sample_rate = self.voice.sample_rate
+
+        self._text_q: queue.Queue = queue.Queue()
+        self._audio_q: queue.Queue = queue.Queue()
+        self._current: np.ndarray | None = None
+        self._pos = 0
+
+        self._stream = None  # sd.OutputStream або NullOutputStream
+        self._stream_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._played = threading.Event()
+
+        self.synthesized = 0
+        self.errors = 0
+        self.output_failed = False  # не вдалося відкрити пристрій виводу
+        self.first_audio_at: float | None = None  # perf_counter першого зіграного шматка
+
+        self._thread = threading.Thread(target=self._synth_loop, name="tts-synth", daemon=True)
+        self._thread.start()
+
+    @property
+    def interrupted(self) -> bool:
+        return self._stopped.is_set()
+
+    def say(self, text: str) -> None:
+        """Додає текст (одне чи кілька речень) у чергу синтезу."""
+        if self._stopped.is_set():
+            return
+        for sentence in _split_for_tts(text):
+            self._text_q.put(sentence)
+
+    def close(self) -> None:
+        """Більше тексту не буде: після останнього шматка відтворення завершиться."""
+        self._text_q.put(_END)
+
+    def _synth_loop(self) -> None:
+        while not self._stopped.is_set():
+            item = self._text_q.get()
+            if item is _END or self._stopped.is_set():
+                break
+            try:
+                for pcm in synthesize_chunks(self.voice, item):
+                    if self._stopped.is_set():
+                        break
+                    if not pcm.size:
+                        continue
+                    self._ensure_stream()
+                    self.synthesized += 1
+                    self._audio_q.put(pcm)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Помилка Piper TTS: {e}")
+            if self.output_failed:
+                break  # без пристрою виводу далі синтезувати нема сенсу
+
+        self._audio_q.put(_END)
+        if not self.synthesized or self.output_failed:
+            # нічого не зіграли (порожньо / все з помилками / нема пристрою) — стрім не грає
+            self._played.set()
+
+    def _ensure_stream(self) -> None:
+        with self._stream_lock:
+            if self._stream is not None or self._stopped.is_set():
+                return
+            stream = None
+            try:
+                stream = _open_output_stream(
+                    samplerate=self.sample_rate,
+                    channels=1,
+                    dtype="int16",
+                    callback=self._callback,
+                    finished_callback=self._played.set,
+                )
+                stream.start()
+            except Exception:
+                self.output_failed = True
+                if stream is not None:
+                    stream.close()
+                raise
+            self._stream = stream
 
-    except FileNotFoundError:
-        print(f"❌ Piper не знайдено (FileNotFoundError): {PIPER_EXE}")
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        out = outdata[:, 0]
+        filled = 0
+        while filled < frames:
+            if self._current is None or self._pos >= self._current.size:
+                try:
+                    item = self._audio_q.get_nowait()
+                except queue.Empty:
+                    # синтез ще не встиг — тиша, стрім не зупиняємо
+                    out[filled:] = 0
+                    return
+                if item is _END:
+                    out[filled:] = 0
+                    raise _callback_stop(self._stream)
+                self._current, self._pos = item, 0
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.perf_counter()
+
+            n = min(frames - filled, self._current.size - self._pos)
+            out[filled:filled + n] = self._current[self._pos:self._pos + n]
+            filled += n
+            self._pos += n
+
+    def wait(self) -> bool:
+        """
+        Чекає кінця відтворення. True — щось було озвучено (або перервано),
+        False — синтез не вдався або не відкрився пристрій виводу.
+        """
+        # після stop() не чекаємо потік синтезу: він вийде сам, щойно голос поверне керування
+        while self._thread.is_alive() and not self._stopped.is_set():
+            self._thread.join(timeout=0.05)
+        self._played.wait()
+        with self._stream_lock:
+            stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.close()
+        if self.first_audio_at is not None:
+            tracing.mark("first_audio", self.first_audio_at)
+            tracing.add("playback", time.perf_counter() - self.first_audio_at)
+        if self.output_failed:
+            return False
+        return self.interrupted or self.synthesized > 0
+
+    def stop(self) -> None:
+        """Barge-in: миттєво зупиняє відтворення і викидає все, що ще в черзі."""
+        self._stopped.set()
+        for q in (self._text_q, self._audio_q):
+            while not q.empty():
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+        self._text_q.put(_END)
+        interrupt = getattr(self.voice, "interrupt", None)
+        if interrupt is not None:
+            interrupt(self._thread)
+        with self._stream_lock:
+            stream = self._stream
+        if stream is not None:
+            stream.abort()
+        self._played.set()
+
+
+# Поточний конвеєр (щоб F9 міг його перервати з іншого потоку)
+_active_pipeline: SpeechPipeline | None = None
+_active_lock = threading.Lock()
+
+
+def start_speech(lang: str = "uk") -> SpeechPipeline:
+    """Створює конвеєр озвучки і робить його "поточним" для stop_speaking()."""
+    global _active_pipeline
+    pipeline = SpeechPipeline(lang)
+    with _active_lock:
+        previous, _active_pipeline = _active_pipeline, pipeline
+    if previous is not None:
+        previous.stop()
+    return pipeline
+
+
+def stop_speaking() -> bool:
+    """Перериває поточну озвучку. Повертає True, якщо щось справді грало."""
+    global _active_pipeline
+    with _active_lock:
+        pipeline, _active_pipeline = _active_pipeline, None
+    if pipeline is None or pipeline.interrupted or pipeline._played.is_set():
+        return False
+    print("[TTS] ⏹ Озвучку перервано.")
+    pipeline.stop()
+    return True
+
+
+def _speak_with_piper(text: str, lang: str = "uk") -> bool:
+    """
+    Озвучка через голос Piper (ONNX у процесі або piper.exe) конвеєром по реченнях
+    (синтез наступного речення йде, поки грає попереднє).
+    Повертає True, якщо все пройшло успішно.
+    """
+    text = (text or "").strip()
+    if not text:
+        return True  # нема що озвучувати, але й помилки немає
+
+    if tts_backend() is None:
+        print(f"❌ Piper не знайдено: ні onnxruntime, ні {PIPER_EXE}")
+        return False
+
+    try:
+        pipeline = start_speech(lang)
+    except FileNotFoundError as e:
+        print(f"⚠️ {e}")
         return False
+
+    print(f"[TTS] Використовую Piper ({tts_backend()}), lang={lang}, model={pipeline.voice.name}")
+
+    try:
+        pipeline.say(text)
+        pipeline.close()
+        ok = pipeline.wait()
     except Exception as e:
         print(f"⚠️ Помилка Piper TTS: {e}")
+        pipeline.stop()
         return False
-    finally:
-        # Прибираємо тимчасовий файл
-        try:
-            os.remove(out_path)
-        except Exception:
-            pass
+
+    if ok:
+        print("[TTS] Piper: відтворення завершено.")
+    return ok
 
 
 def _speak_with_pyttsx3(text: str) -> None:
     """Резервний варіант — старий добрий pyttsx3/SAPI."""
     try:
         print("[TTS] Використовую pyttsx3...")
+        import pyttsx3
+
         engine = pyttsx3.init()
         engine.setProperty("rate", config.TTS_RATE)
         engine.setProperty("volume", 1.0)
@@ -129,7 +674,7 @@ def _speak_with_pyttsx3(text: str) -> None:
 def speak(text: str, lang: str = "uk") -> None:
     """
     Загальна функція TTS:
-    - спочатку пробуємо Piper через piper.exe (CLI),
+    - спочатку пробуємо Piper через постійний воркер piper.exe,
     - якщо не вийшло — fallback на pyttsx3.
     """
     if not getattr(config, "TTS_ENABLED", True):
@@ -139,7 +684,7 @@ def speak(text: str, lang: str = "uk") -> None:
     if not text:
         return
 
-    # Спочатку пробуємо Piper (CLI-рішення з piper_test.py)
+    # Спочатку пробуємо Piper (постійний воркер на голос)
     if _speak_with_piper(text, lang=lang):
         return
 
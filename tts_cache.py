@@ -0,0 +1,174 @@
+# tts_cache.py
+"""
+Кеш синтезованого мовлення, адресований вмістом.
+
+Ключ — sha256 від (модель голосу + її розмір/mtime, TTS_RATE, нормалізований текст),
+тож повторні фрази (привітання, типові відповіді, повідомлення про помилки)
+не синтезуються вдруге.
+
+- у пам'яті: LRU з лімітом у байтах;
+- на диску: <key>.npy (int16), читаються через np.load(mmap_mode="r") —
+  відтворення йде прямо зі сторінок файлу, без попереднього читання;
+- диск теж має ліміт: при переповненні видаляються найдавніше використані файли.
+"""
+
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC + схлопнуті пробіли (регістр і пунктуацію не чіпаємо — вони впливають на інтонацію)."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class SpeechCache:
+    def __init__(self, cache_dir: str, memory_bytes: int, disk_bytes: int):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._mem: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._mem_size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_size = sum(
+            e.stat().st_size for e in os.scandir(cache_dir) if e.name.endswith(".npy")
+        )
+
+    @staticmethod
+    def key(model_path: str, rate, text: str) -> str:
+        try:
+            st = os.stat(model_path)
+            model_id = f"{os.path.basename(model_path)}:{st.st_size}:{int(st.st_mtime)}"
+        except OSError:
+            model_id = os.path.basename(model_path)
+        payload = f"{model_id}\n{rate}\n{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def _remember(self, key: str, pcm: np.ndarray) -> None:
+        """Кладе в LRU пам'яті (під self._lock)."""
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            return
+        if pcm.nbytes > self.memory_bytes:
+            return
+        self._mem[key] = pcm
+        self._mem_size += pcm.nbytes
+        while self._mem_size > self.memory_bytes:
+            _, old = self._mem.popitem(last=False)
+            self._mem_size -= old.nbytes
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            pcm = self._mem.get(key)
+            if pcm is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return pcm
+
+        path = self._path(key)
+        try:
+            pcm = np.load(path, mmap_mode="r")
+            os.utime(path)  # mtime = час останнього використання (для LRU на диску)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(key, pcm)
+        return pcm
+
+    def put(self, key: str, pcm: np.ndarray) -> None:
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+        path = self._path(key)
+        # свій tmp на кожен потік: два промахи по одній фразі не пишуть в один файл
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, pcm)
+            with self._lock:
+                # той самий ключ міг уже записати інший потік — тоді файл лише перезаписується
+                try:
+                    old_size = os.path.getsize(path)
+                except OSError:
+                    old_size = 0
+                os.replace(tmp, path)
+                self._disk_size += os.path.getsize(path) - old_size
+        except OSError as e:
+            print(f"⚠️ [TTS cache] Не вдалося записати {path}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        else:
+            self._evict_disk()
+
+        with self._lock:
+            self._remember(key, pcm)
+
+    def _evict_disk(self) -> None:
+        with self._lock:
+            if self._disk_size <= self.disk_bytes:
+                return
+            entries = sorted(
+                (e for e in os.scandir(self.cache_dir) if e.name.endswith(".npy")),
+                key=lambda e: e.stat().st_mtime,
+            )
+            # лічильник — лише підказка, коли сканувати; видаляємо за фактичним розміром
+            self._disk_size = sum(e.stat().st_size for e in entries)
+            for entry in entries:
+                if self._disk_size <= self.disk_bytes:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self._disk_size -= size
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_items": len(self._mem),
+                "memory_bytes": self._mem_size,
+                "disk_bytes": self._disk_size,
+            }
+
+
+_cache: SpeechCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_speech_cache() -> SpeechCache | None:
+    """Глобальний кеш (None, якщо TTS_CACHE_ENABLED = False)."""
+    global _cache
+    if not getattr(config, "TTS_CACHE_ENABLED", True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                base_dir = os.path.dirname(os.path.abspath(__file__))
+                _cache = SpeechCache(
+                    cache_dir=os.path.join(base_dir, getattr(config, "TTS_CACHE_DIR", "tts_cache")),
+                    memory_bytes=int(getattr(config, "TTS_CACHE_MEMORY_MB", 64) * 1024 * 1024),
+                    disk_bytes=int(getattr(config, "TTS_CACHE_DISK_MB", 512) * 1024 * 1024),
+                )
+    return _cache
@@ -0,0 +1,236 @@
+# vad.py
+"""
+Детектори голосу (VAD) з єдиним інтерфейсом + Endpointer (кінець фрази).
+
+- EnergyVAD — NumPy, ознаки векторизовано по блоку фреймів: енергія + zero-crossing rate
+  + адаптивний поріг шуму (трекер рівня шуму: швидко вниз, повільно вгору);
+- SileroVAD — нейромережевий (потрібен пакет silero-vad + torch), опційно;
+- WebRtcVAD — класичний webrtcvad (пакет webrtcvad), опційно.
+
+Вибір через config.VAD_ENGINE ("energy" / "silero" / "webrtc").
+Порівняти рушії на WAV-фікстурах: python vad_bench.py <папка>.
+"""
+
+import math
+
+import numpy as np
+
+import config
+
+
+class VAD:
+    """
+    Базовий інтерфейс: is_speech() приймає блок фреймів форми (n, frame_samples)
+    і повертає bool-масив довжини n.
+    """
+
+    name = "base"
+
+    def __init__(self, sample_rate: int, frame_samples: int):
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+
+    @property
+    def frame_seconds(self) -> float:
+        return self.frame_samples / self.sample_rate
+
+    def reset(self) -> None:
+        """Скидає внутрішній стан перед новим записом."""
+
+    def is_speech(self, frames: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class EnergyVAD(VAD):
+    """
+    Векторизований детектор: для всього блоку одразу рахує лог-енергію і ZCR.
+
+    Поріг = рівень шуму + margin_db. Рівень шуму відстежується пофреймово:
+    вниз — одразу (тихіший фрейм і є новий рівень), вгору — повільно і майже
+    лише на фреймах без голосу (floor_rise_db дБ/с). На фреймах з голосом
+    рівень піднімається ще в ~10 разів повільніше — тільки щоб постійний гучний
+    шум (увімкнули вентилятор) колись перестав бути "голосом"; довге мовлення без
+    пауз поріг не з'їдає. Знизу поріг обмежений VAD_THRESHOLD, тож у тихій кімнаті
+    поведінка така сама, як у старого фіксованого порогу.
+    Шипіння/вентилятор (високий ZCR при слабкій енергії) голосом не вважається.
+    """
+
+    name = "energy"
+
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_ms: int | None = None,
+        threshold: float | None = None,
+        margin_db: float = 10.0,
+        zcr_max: float = 0.35,
+        floor_rise_db: float = 10.0,
+        speech_rise_db: float = 1.0,
+    ):
+        frame_ms = frame_ms or getattr(config, "VAD_FRAME_MS", 30)
+        super().__init__(sample_rate, int(sample_rate * frame_ms / 1000))
+
+        threshold = threshold or getattr(config, "VAD_THRESHOLD", 0.01)
+        self.margin_db = margin_db
+        self.zcr_max = zcr_max
+        self.min_floor_db = 20.0 * math.log10(threshold) - margin_db
+        # наскільки рівень шуму може піднятися за один фрейм (без голосу / з голосом)
+        self.floor_rise = floor_rise_db * self.frame_seconds
+        self.speech_rise = speech_rise_db * self.frame_seconds
+        self.reset()
+
+    def reset(self) -> None:
+        self.floor_db = self.min_floor_db
+
+    def features(self, frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(енергія в dB, zero-crossing rate) для кожного фрейму блоку."""
+        x = np.asarray(frames, dtype=np.float32)
+        energy = np.mean(np.square(x, dtype=np.float64), axis=1)
+        db = 10.0 * np.log10(energy + 1e-12)
+        signs = np.signbit(x)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        return db, zcr
+
+    def is_speech(self, frames: np.ndarray) -> np.ndarray:
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool)
+
+        db, zcr = self.features(frames)
+
+        # рішення залежить від рівня шуму, а рівень — від рішення, тож тут пофреймово
+        flags = np.zeros(len(db), dtype=bool)
+        floor = self.floor_db
+        for i, (level, rate) in enumerate(zip(db.tolist(), zcr.tolist())):
+            snr = level - floor
+            speech = snr > self.margin_db and (rate < self.zcr_max or snr > 2 * self.margin_db)
+            flags[i] = speech
+            if level < floor:
+                floor = level
+            else:
+                floor += min(level - floor, self.speech_rise if speech else self.floor_rise)
+            floor = max(self.min_floor_db, floor)
+        self.floor_db = floor
+        return flags
+
+
+class SileroVAD(VAD):
+    """Silero VAD (нейромережа). Фрейм фіксований: 512 семплів на 16 кГц."""
+
+    name = "silero"
+
+    def __init__(self, sample_rate: int, threshold: float = 0.5):
+        import torch
+        from silero_vad import load_silero_vad
+
+        super().__init__(sample_rate, 512 if sample_rate == 16000 else 256)
+        self._torch = torch
+        self.model = load_silero_vad()
+        self.threshold = threshold
+
+    def reset(self) -> None:
+        self.model.reset_states()
+
+    def is_speech(self, frames: np.ndarray) -> np.ndarray:
+        probs = [
+            self.model(self._torch.from_numpy(np.ascontiguousarray(f, dtype=np.float32)), self.sample_rate).item()
+            for f in frames
+        ]
+        return np.asarray(probs) > self.threshold
+
+
+class WebRtcVAD(VAD):
+    """webrtcvad: фрейми 10/20/30 мс, 16-бітний PCM."""
+
+    name = "webrtc"
+
+    def __init__(self, sample_rate: int, frame_ms: int | None = None, mode: int = 2):
+        import webrtcvad
+
+        frame_ms = frame_ms or getattr(config, "VAD_FRAME_MS", 30)
+        if frame_ms not in (10, 20, 30):
+            frame_ms = 30
+        super().__init__(sample_rate, int(sample_rate * frame_ms / 1000))
+        self._vad = webrtcvad.Vad(mode)
+
+    def is_speech(self, frames: np.ndarray) -> np.ndarray:
+        pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype("<i2")
+        return np.array([self._vad.is_speech(row.tobytes(), self.sample_rate) for row in pcm], dtype=bool)
+
+
+VAD_ENGINES = {
+    "energy": EnergyVAD,
+    "silero": SileroVAD,
+    "webrtc": WebRtcVAD,
+}
+
+
+def create_vad(name: str | None = None, sample_rate: int | None = None) -> VAD:
+    """
+    Створює VAD за назвою (за замовчуванням config.VAD_ENGINE).
+    Якщо опційний пакет не встановлено — fallback на EnergyVAD.
+    """
+    name = (name or getattr(config, "VAD_ENGINE", "energy")).lower()
+    sample_rate = sample_rate or config.SAMPLE_RATE
+
+    cls = VAD_ENGINES.get(name)
+    if cls is None:
+        print(f"⚠️ Невідомий VAD_ENGINE={name!r}, використовую energy.")
+        cls = EnergyVAD
+
+    try:
+        return cls(sample_rate)
+    except ImportError as e:
+        print(f"⚠️ VAD {name!r} недоступний ({e}), використовую energy.")
+        return EnergyVAD(sample_rate)
+
+
+class Endpointer:
+    """
+    Стан "чи почалась / чи закінчилась фраза" поверх потоку VAD-рішень.
+    Індекси фреймів абсолютні — від першого фрейму, переданого в update().
+    """
+
+    def __init__(self, frame_seconds: float, silence_seconds: float):
+        self.silence_frames = max(1, int(round(silence_seconds / frame_seconds)))
+        self.frames_seen = 0
+        self.start_frame: int | None = None
+        self.end_frame: int | None = None
+        self._silence_run = 0
+
+    @property
+    def started(self) -> bool:
+        return self.start_frame is not None
+
+    @property
+    def done(self) -> bool:
+        return self.end_frame is not None
+
+    def update(self, flags: np.ndarray) -> None:
+        base = self.frames_seen
+        self.frames_seen += len(flags)
+        if self.done:
+            return
+
+        offset = 0
+        if not self.started:
+            voiced = np.flatnonzero(flags)
+            if voiced.size == 0:
+                return
+            offset = int(voiced[0]) + 1
+            self.start_frame = base + offset - 1
+            self._silence_run = 0
+
+        rest = np.asarray(flags[offset:], dtype=bool)
+        if rest.size == 0:
+            return
+
+        # довжина поточної серії тиші на кожному фреймі (з урахуванням попереднього блоку)
+        pos = np.arange(rest.size)
+        last_voiced = np.maximum.accumulate(np.where(rest, pos, -1))
+        run = np.where(last_voiced >= 0, pos - last_voiced, pos + 1 + self._silence_run)
+
+        hit = np.flatnonzero(run >= self.silence_frames)
+        if hit.size:
+            self.end_frame = base + offset + int(hit[0]) + 1
+        else:
+            self._silence_run = int(run[-1])
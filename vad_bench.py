@@ -0,0 +1,153 @@
+# vad_bench.py
+"""
+Бенчмарк VAD-рушіїв на WAV-фікстурах: затримка кінця фрази і частка хибних зупинок.
+
+Фікстури — папка з WAV (моно, 16-біт) і розміткою поруч:
+    hello.wav + hello.json  →  {"speech_end": 2.35}
+де speech_end — секунда, на якій користувач реально договорив.
+Після мовлення у файлі має бути тиша/шум, довший за VAD_SILENCE_SECONDS.
+
+Запуск:
+    python vad_bench.py fixtures/vad --engines energy webrtc silero --block-frames 1
+"""
+
+import argparse
+import json
+import os
+import time
+import wave
+
+import numpy as np
+
+import config
+from vad import VAD_ENGINES, Endpointer
+
+
+def load_wav(path: str, sample_rate: int) -> np.ndarray:
+    """WAV (8/16/32-біт PCM) → float32 моно з потрібною частотою (лінійний ресемплінг)."""
+    with wave.open(path, "rb") as wf:
+        sr = wf.getframerate()
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        raw = wf.readframes(wf.getnframes())
+
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    audio = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+    if width == 1:
+        audio = (audio - 128.0) / 128.0
+    else:
+        audio /= float(np.iinfo(dtype).max)
+
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+
+    if sr != sample_rate:
+        n = int(round(audio.size * sample_rate / sr))
+        audio = np.interp(np.linspace(0, audio.size - 1, n), np.arange(audio.size), audio).astype(np.float32)
+
+    return audio
+
+
+def load_fixtures(folder: str, sample_rate: int) -> list[tuple[str, np.ndarray, float]]:
+    fixtures = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(".wav"):
+            continue
+        label_path = os.path.join(folder, os.path.splitext(name)[0] + ".json")
+        if not os.path.exists(label_path):
+            print(f"[vad-bench] Пропускаю {name}: немає розмітки {os.path.basename(label_path)}")
+            continue
+        with open(label_path, encoding="utf-8") as f:
+            speech_end = float(json.load(f)["speech_end"])
+        fixtures.append((name, load_wav(os.path.join(folder, name), sample_rate), speech_end))
+    return fixtures
+
+
+def run_endpointer(vad, audio: np.ndarray, silence_seconds: float, block_frames: int) -> float | None:
+    """Проганяє аудіо блоками по block_frames фреймів, повертає секунду зупинки або None."""
+    vad.reset()
+    frame = vad.frame_samples
+    endpointer = Endpointer(vad.frame_seconds, silence_seconds)
+
+    n_frames = audio.size // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+
+    for i in range(0, n_frames, block_frames):
+        endpointer.update(vad.is_speech(frames[i:i + block_frames]))
+        if endpointer.done:
+            return endpointer.end_frame * vad.frame_seconds
+    return None
+
+
+def bench_engine(name: str, fixtures, sample_rate: int, silence_seconds: float, block_frames: int) -> dict | None:
+    if name not in VAD_ENGINES:
+        print(f"[vad-bench] Невідомий рушій {name!r}")
+        return None
+    try:
+        vad = VAD_ENGINES[name](sample_rate)
+    except ImportError as e:
+        print(f"[vad-bench] {name}: недоступний ({e})")
+        return None
+
+    latencies: list[float] = []
+    false_stops = 0
+    no_stops = 0
+    audio_seconds = 0.0
+    t0 = time.perf_counter()
+
+    for _, audio, speech_end in fixtures:
+        audio_seconds += audio.size / sample_rate
+        stop = run_endpointer(vad, audio, silence_seconds, block_frames)
+        if stop is None:
+            no_stops += 1
+        elif stop < speech_end:
+            false_stops += 1
+        else:
+            latencies.append(stop - speech_end)
+
+    elapsed = time.perf_counter() - t0
+    n = len(fixtures)
+    lat = np.asarray(latencies) if latencies else np.asarray([np.nan])
+    return {
+        "engine": name,
+        "files": n,
+        "p50_ms": float(np.percentile(lat, 50) * 1000),
+        "p95_ms": float(np.percentile(lat, 95) * 1000),
+        "false_stop": false_stops / n if n else 0.0,
+        "no_stop": no_stops / n if n else 0.0,
+        "x_realtime": audio_seconds / elapsed if elapsed else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк VAD: затримка кінця фрази і хибні зупинки.")
+    parser.add_argument("fixtures", help="папка з .wav + .json (speech_end)")
+    parser.add_argument("--engines", nargs="+", default=list(VAD_ENGINES))
+    parser.add_argument("--silence", type=float, default=getattr(config, "VAD_SILENCE_SECONDS", 1.2))
+    parser.add_argument("--block-frames", type=int, default=1, help="1 = як із мікрофона, більше — блоками")
+    args = parser.parse_args()
+
+    sr = config.SAMPLE_RATE
+    fixtures = load_fixtures(args.fixtures, sr)
+    if not fixtures:
+        print("[vad-bench] Немає фікстур з розміткою.")
+        return
+
+    print(f"[vad-bench] {len(fixtures)} файлів, тиша для зупинки {args.silence:.2f} с, "
+          f"блок {args.block_frames} фр.\n")
+    header = f"{'engine':<8} {'files':>5} {'p50 ms':>8} {'p95 ms':>8} {'false stop':>10} {'no stop':>8} {'x RT':>8}"
+    print(header)
+    print("-" * len(header))
+    for name in args.engines:
+        row = bench_engine(name, fixtures, sr, args.silence, args.block_frames)
+        if row is None:
+            continue
+        print(
+            f"{row['engine']:<8} {row['files']:>5} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} "
+            f"{row['false_stop']:>10.1%} {row['no_stop']:>8.1%} {row['x_realtime']:>8.0f}"
+        )
+    print("\n(затримка = від реального кінця мовлення до зупинки запису, включно з паузою тиші)")
+
+
+if __name__ == "__main__":
+    main()
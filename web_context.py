@@ -0,0 +1,192 @@
+# web_context.py
+"""
+Стиснення результатів веб-пошуку перед промптом.
+
+format_results_for_llm вставляє всі заголовки, URL і сніпети як є — на CPU
+кожен зайвий токен промпту коштує часу до першого токена (prompt eval).
+Тут сніпети діляться на речення, і в промпт іде лише найкорисніше:
+
+- релевантність речення до запиту — BM25 (речення = документ);
+- речення з числами отримують буст (температура, курс, дати — саме їх
+  просять витягнути з результатів), особливо коли питання "числове";
+- майже однакові речення з різних сайтів відкидаються (Жаккар по словах);
+- результат вміщується у WEB_CONTEXT_TOKENS (~4 символи на токен);
+- вибрані речення групуються за джерелом у початковому порядку, з номером [i]
+  і доменом замість повного URL.
+
+WEB_CONTEXT_TOKENS = 0 вимикає стиснення (старий format_results_for_llm).
+"""
+
+import math
+import re
+from collections import Counter
+from urllib.parse import urlsplit
+
+import config
+from web_tools import format_results_for_llm
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\s+[|•·]\s+|\n+")
+_WORD_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d")
+
+# питання, на які відповідь — число
+_NUMERIC_QUERY_RE = re.compile(
+    r"\b(how (many|much)|price|cost|rate|temperature|weather|degrees?|percent|score|population|when|year"
+    r"|скільки|ціна|курс|температур\w*|погод\w*|градус\w*|відсот\w*|рахунок|коли|рік)\b",
+    re.IGNORECASE,
+)
+
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "was", "were", "be",
+    "it", "this", "that", "with", "as", "at", "by", "from", "what", "how", "which", "who", "now",
+    "і", "й", "та", "в", "у", "на", "з", "із", "до", "що", "як", "це", "для", "по", "не",
+}
+
+_CHARS_PER_TOKEN = 4
+
+
+def _words(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _domain(href: str) -> str:
+    try:
+        return urlsplit(href or "").netloc.lower().removeprefix("www.")
+    except ValueError:
+        return ""
+
+
+def _split_sentences(text: str) -> list[str]:
+    """
+    Речення сніпета. Короткі шматки між "|" / "•" ("12°C", "Humidity 80%") —
+    часто саме ті числа, що потрібні, тож вони не відкидаються, а приклеюються
+    до попереднього шматка (перший — до наступного).
+    """
+    pieces: list[str] = []
+    pending = ""
+    for piece in (p.strip(" \t|•·") for p in _SENTENCE_RE.split(text)):
+        if not _WORD_RE.search(piece):
+            continue
+        if pending:
+            piece, pending = f"{pending}, {piece}", ""
+        if len(piece) >= 15:
+            pieces.append(piece)
+        elif pieces:
+            sep = " " if pieces[-1][-1] in ".!?…:" else ", "
+            pieces[-1] = f"{pieces[-1]}{sep}{piece}"
+        else:
+            pending = piece
+    if pending:
+        pieces.append(pending)
+    return pieces
+
+
+def bm25_scores(query_words: list[str], docs: list[list[str]], k1: float = 1.2, b: float = 0.75) -> list[float]:
+    """Класичний BM25 кожного документа (списку слів) відносно запиту."""
+    n = len(docs)
+    if n == 0:
+        return []
+    avgdl = sum(len(d) for d in docs) / n or 1.0
+    df = Counter(w for d in docs for w in set(d))
+    query = set(query_words)
+    idf = {w: math.log(1 + (n - df[w] + 0.5) / (df[w] + 0.5)) for w in query if df[w]}
+
+    scores = []
+    for d in docs:
+        tf = Counter(d)
+        norm = k1 * (1 - b + b * len(d) / avgdl)
+        scores.append(sum(idf[w] * tf[w] * (k1 + 1) / (tf[w] + norm) for w in idf if tf[w]))
+    return scores
+
+
+def _near_duplicate(words: set[str], kept: list[set[str]], threshold: float) -> bool:
+    for other in kept:
+        union = len(words | other)
+        if union and len(words & other) / union >= threshold:
+            return True
+    return False
+
+
+def build_web_context(
+    query: str,
+    results: list[dict],
+    token_budget: int | None = None,
+    number_boost: float | None = None,
+    dedup_threshold: float = 0.7,
+) -> str:
+    """Стиснутий web_context для промпту: найрелевантніші речення в межах бюджету токенів."""
+    if token_budget is None:
+        token_budget = getattr(config, "WEB_CONTEXT_TOKENS", 350)
+    if token_budget <= 0:
+        return format_results_for_llm(results)
+    number_boost = number_boost if number_boost is not None else getattr(config, "WEB_CONTEXT_NUMBER_BOOST", 0.5)
+
+    # (номер джерела, позиція в ньому, речення)
+    candidates: list[tuple[int, int, str]] = []
+    for i, r in enumerate(results):
+        sentences = [(r.get("title") or "").strip(), *_split_sentences(r.get("body") or "")]
+        for pos, sentence in enumerate(sentences):
+            if len(sentence) >= 15 or (sentence and _NUMBER_RE.search(sentence)):
+                candidates.append((i, pos, sentence))
+    if not candidates:
+        return ""
+
+    query_words = _words(query)
+    docs = [_words(s) for _, _, s in candidates]
+    scores = bm25_scores(query_words, docs)
+
+    numeric_query = bool(_NUMERIC_QUERY_RE.search(query or ""))
+    has_number = [bool(_NUMBER_RE.search(s)) for _, _, s in candidates]
+    boosted = []
+    for score, number in zip(scores, has_number):
+        if number:
+            # число поруч зі словами запиту — майже напевно факт, який шукаємо
+            score = score * (1 + number_boost) + (number_boost if numeric_query else 0.0)
+        boosted.append(score)
+
+    ranked = []
+    for k, ((i, pos, sentence), score) in enumerate(zip(candidates, boosted)):
+        # речення одразу після релевантного часто його продовжує ("12°C. Cloudy with light rain.")
+        if k and candidates[k - 1][0] == i and scores[k - 1] > 0:
+            score += 0.3 * boosted[k - 1]
+        score /= 1 + 0.1 * i  # вищі результати пошуку трохи надійніші
+        ranked.append((score, i, pos, sentence, numeric_query and has_number[k]))
+    ranked.sort(key=lambda x: -x[0])
+
+    # зовсім слабкі збіги (реклама, "підпишіться" тощо) не беремо навіть якщо є місце;
+    # числа на "числове" питання лишаємо — це саме те, що модель має витягнути
+    min_score = 0.2 * ranked[0][0]
+
+    budget = token_budget
+    chosen: list[tuple[int, int, str]] = []
+    kept_words: list[set[str]] = []
+    for score, i, pos, sentence, numeric_fact in ranked:
+        if chosen and not numeric_fact and (score <= 0 or score < min_score):
+            continue
+        cost = _tokens(sentence) + 1
+        if cost > budget:
+            continue
+        words = set(_words(sentence))
+        if _near_duplicate(words, kept_words, dedup_threshold):
+            continue
+        kept_words.append(words)
+        chosen.append((i, pos, sentence))
+        budget -= cost
+
+    # групуємо за джерелом, зберігаючи порядок речень
+    chosen.sort()
+    blocks: list[str] = []
+    for i in sorted({i for i, _, _ in chosen}):
+        domain = _domain(results[i].get("href") or "")
+        lines = [s for j, _, s in chosen if j == i]
+        blocks.append(f"[{i + 1}] {domain}\n" + "\n".join(f"- {s}" for s in lines))
+
+    context = "\n\n".join(blocks)
+    raw_tokens = sum(_tokens(f"{r.get('title') or ''} {r.get('href') or ''} {r.get('body') or ''}") for r in results)
+    print(f"[web] Контекст стиснуто: ~{raw_tokens} → ~{_tokens(context)} токенів "
+          f"({len(chosen)} з {len(candidates)} речень)")
+    return context
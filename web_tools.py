@@ -1,20 +1,306 @@
 # web_tools.py
-from typing import List, Dict
-from ddgs import DDGS
+"""
+Веб-пошук для асистента.
 
+- бекенд підмінний: "ddgs" (DuckDuckGo, сесія DDGS живе між запитами)
+  або "fixture" (локальні детерміновані результати — тести, бенчмарки, офлайн);
+- TTL-кеш за нормалізованим запитом: у пам'яті (LRU) і в SQLite (таблиця web_cache),
+  тож повторні питання (погода, курс) не йдуть у мережу знову;
+- жорсткий дедлайн (WEB_SEARCH_DEADLINE): що встигло — те й повертаємо;
+  результати запитів, що запізнились, усе одно потрапляють у кеш;
+- кілька варіантів запиту (напр. запит router-а + фраза користувача) шукаються
+  паралельно, результати зливаються по черзі і дедуплікуються за href.
+"""
 
-def web_search(query: str, max_results: int = 5) -> List[Dict]:
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List, Dict
+from urllib.parse import urlsplit, urlunsplit
+
+import config
+
+# backend(query, max_results) -> список {title, href, body}
+SearchBackend = Callable[[str, int], List[Dict]]
+
+
+class DdgsBackend:
+    """Справжній пошук через DuckDuckGo (пакет ddgs). Одна сесія DDGS на потік."""
+
+    name = "ddgs"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            from ddgs import DDGS
+
+            client = self._local.client = DDGS(timeout=int(getattr(config, "WEB_SEARCH_DEADLINE", 3.0)) + 2)
+        return client
+
+    def __call__(self, query: str, max_results: int = 5) -> List[Dict]:
+        try:
+            return list(self._client().text(query, max_results=max_results))
+        except Exception:
+            self._local.client = None  # зіпсована сесія — наступного разу нова
+            raise
+
+
+class FixtureBackend:
+    """
+    Локальний бекенд без мережі.
+    path — JSON {"запит": [{title, href, body}, ...]} (ключі нормалізуються);
+    для невідомих запитів — стабільні синтетичні результати. delay імітує мережу.
+    """
+
+    name = "fixture"
+
+    def __init__(self, path: str | None = None, delay: float = 0.0):
+        self.delay = delay
+        self.fixtures: dict[str, list[dict]] = {}
+        path = path or getattr(config, "WEB_FIXTURE_PATH", None)
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.fixtures = {normalize_query(k): v for k, v in json.load(f).items()}
+
+    def __call__(self, query: str, max_results: int = 5) -> List[Dict]:
+        if self.delay:
+            time.sleep(self.delay)
+        known = self.fixtures.get(normalize_query(query))
+        if known is not None:
+            return known[:max_results]
+        bucket = zlib.crc32(query.encode("utf-8")) % 10_000
+        return [
+            {
+                "title": f"Result {i} for {query}",
+                "href": f"https://example.com/{bucket}/{i}",
+                "body": f"Snippet {i}: some facts about {query}. The value mentioned here is {i * 7}.",
+            }
+            for i in range(1, max_results + 1)
+        ]
+
+
+SEARCH_BACKENDS = {
+    "ddgs": DdgsBackend,
+    "fixture": FixtureBackend,
+}
+
+
+def create_backend(name: str | None = None) -> SearchBackend:
+    name = (name or getattr(config, "WEB_SEARCH_BACKEND", "ddgs")).lower()
+    cls = SEARCH_BACKENDS.get(name)
+    if cls is None:
+        print(f"⚠️ Невідомий WEB_SEARCH_BACKEND={name!r}, використовую ddgs.")
+        cls = DdgsBackend
+    return cls()
+
+
+def normalize_query(query: str) -> str:
+    """Ключ кешу: нижній регістр, без пунктуації, схлопнуті пробіли."""
+    return " ".join(re.findall(r"\w+", (query or "").lower()))
+
+
+def _normalize_href(href: str) -> str:
+    """Для дедуплікації: без фрагмента, без кінцевого '/', хост у нижньому регістрі."""
+    try:
+        parts = urlsplit(href or "")
+    except ValueError:
+        return href or ""
+    host = parts.netloc.lower().removeprefix("www.")
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/"), parts.query, ""))
+
+
+class SearchCache:
+    """TTL-кеш результатів: LRU у пам'яті + таблиця web_cache у SQLite (переживає перезапуск)."""
+
+    def __init__(self, ttl: float, max_items: int, persistent: bool = True):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.persistent = persistent
+        self._mem: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import db
+
+            conn = self._local.conn = db.connect()
+        return conn
+
+    def get(self, key: str) -> list[dict] | None:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None and now - item[0] < self.ttl:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return item[1]
+
+        if self.persistent:
+            try:
+                row = self._conn().execute(
+                    "SELECT ts, results FROM web_cache WHERE key = ? AND ts > ?", (key, now - self.ttl)
+                ).fetchone()
+            except Exception:
+                row = None
+            if row is not None:
+                results = json.loads(row[1])
+                self._remember(key, row[0], results)
+                with self._lock:
+                    self.hits += 1
+                return results
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, ts: float, results: list[dict]) -> None:
+        with self._lock:
+            self._mem[key] = (ts, results)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+
+    def put(self, key: str, results: list[dict]) -> None:
+        if not results:
+            return  # порожню відповідь не кешуємо — могла бути тимчасова помилка
+        now = time.time()
+        self._remember(key, now, results)
+        if self.persistent:
+            try:
+                conn = self._conn()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO web_cache (key, ts, results) VALUES (?, ?, ?)",
+                        (key, now, json.dumps(results, ensure_ascii=False)),
+                    )
+                    conn.execute("DELETE FROM web_cache WHERE ts < ?", (now - self.ttl,))
+            except Exception as e:
+                print(f"⚠️ [web] Не вдалося зберегти кеш пошуку: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_items": len(self._mem)}
+
+
+class SearchService:
+    def __init__(
+        self,
+        backend: SearchBackend | None = None,
+        deadline: float | None = None,
+        cache: SearchCache | None = None,
+        max_workers: int = 4,
+    ):
+        self.backend = backend or create_backend()
+        self.deadline = deadline if deadline is not None else getattr(config, "WEB_SEARCH_DEADLINE", 3.0)
+        self.cache = cache or SearchCache(
+            ttl=getattr(config, "WEB_CACHE_TTL", 900),
+            max_items=getattr(config, "WEB_CACHE_SIZE", 256),
+            persistent=getattr(config, "WEB_CACHE_PERSIST", True),
+        )
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+
+    def _key(self, query: str, max_results: int) -> str:
+        name = getattr(self.backend, "name", type(self.backend).__name__)
+        return f"{name}:{max_results}:{normalize_query(query)}"
+
+    def _fetch(self, query: str, max_results: int) -> list[dict]:
+        results = list(self.backend(query, max_results))
+        # навіть якщо дедлайн уже минув — результат стане в пригоді наступного разу
+        self.cache.put(self._key(query, max_results), results)
+        return results
+
+    def search(self, queries: list[str], max_results: int = 5) -> list[dict]:
+        # однакові після нормалізації варіанти шукаємо один раз
+        unique = list({normalize_query(q): q.strip() for q in queries if normalize_query(q)}.values())
+        if not unique:
+            return []
+
+        per_query: dict[str, list[dict]] = {}
+        pending = {}
+        for q in unique:
+            cached = self.cache.get(self._key(q, max_results))
+            if cached is not None:
+                print(f"[web] ⚡ З кешу: {q!r}")
+                per_query[q] = cached
+            else:
+                pending[self._pool.submit(self._fetch, q, max_results)] = q
+
+        if pending:
+            done, not_done = wait(pending, timeout=self.deadline)
+            for future in done:
+                q = pending[future]
+                try:
+                    per_query[q] = future.result()
+                except Exception as e:
+                    print(f"⚠️ [web] Пошук {q!r} не вдався: {e}")
+            if not_done:
+                late = ", ".join(repr(pending[f]) for f in not_done)
+                print(f"[web] ⏱ Дедлайн {self.deadline:.1f} с: не встигли {late}, віддаю часткові результати.")
+
+        return _merge([per_query[q] for q in unique if q in per_query], max_results)
+
+
+def _merge(result_lists: list[list[dict]], max_results: int) -> list[dict]:
+    """По черзі з кожного варіанта (щоб верхні результати кожного потрапили), без дублів href."""
+    merged: list[dict] = []
+    seen: set[str] = set()
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            r = results[rank]
+            href = _normalize_href(r.get("href") or "")
+            if href:  # без href дублікат не визначити — лишаємо
+                if href in seen:
+                    continue
+                seen.add(href)
+            merged.append(r)
+    return merged[:max_results]
+
+
+_service: SearchService | None = None
+_service_lock = threading.Lock()
+
+
+def get_search_service() -> SearchService:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SearchService()
+    return _service
+
+
+def set_search_backend(backend: SearchBackend | None) -> None:
+    """Підміняє джерело результатів (None — з config.WEB_SEARCH_BACKEND). Для бенчмарків/офлайн-роботи."""
+    service = get_search_service()
+    service.backend = backend or create_backend()
+
+
+def web_search(query: str, max_results: int = 5, variants: list[str] | None = None) -> List[Dict]:
     """
     Повертає список результатів пошуку.
     Кожен результат має ключі: title, href, body.
+    variants — додаткові формулювання, які шукаються паралельно з query.
     """
     query = (query or "").strip()
     if not query:
         return []
 
-    print(f"[web] ➜ Пошук: {query!r}")
-    with DDGS() as ddgs:
-        results = list(ddgs.text(query, max_results=max_results))
+    print(f"[web] ➜ Пошук: {query!r}" + (f" (+{len(variants)} варіант(и))" if variants else ""))
+    results = get_search_service().search([query, *(variants or [])], max_results=max_results)
 
     print(f"[web] ✓ Отримано результатів: {len(results)}")
     for i, r in enumerate(results[:3], 1):